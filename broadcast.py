@@ -0,0 +1,57 @@
+"""
+This file holds a helper for following a message sent to many recipients at once, so that the
+sender learns which of the recipients it could not be delivered to.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Generic, Sequence, TypeVar
+
+from hide_and_seek_exceptions import BroadcastException
+
+Recipient = TypeVar("Recipient")
+
+
+@dataclass
+class BroadcastResult(Generic[Recipient]):
+    """
+    What happened to each recipient of a broadcast. Every recipient is in exactly one of sent and
+    failures.
+    """
+
+    sent: list[tuple[Recipient, Any]] = field(default_factory=list)
+    failures: list[tuple[Recipient, BaseException]] = field(default_factory=list)
+
+    def raise_for_failures(self):
+        """
+        Raises BroadcastException if sending to any recipient failed.
+        """
+        if self.failures:
+            raise BroadcastException(self.failures)
+
+
+async def broadcast(
+    deliveries: Sequence[tuple[Recipient, Awaitable[Any]]],
+) -> BroadcastResult[Recipient]:
+    """
+    Waits for a message to be delivered to every recipient, all at once. A failed delivery does
+    not stop the others, and is reported in the result instead of raised.
+
+    :param deliveries: Each recipient with what resolves once the message is delivered to them,
+        such as the future that the outbound queue returns.
+    :type deliveries: Sequence[tuple[Recipient, Awaitable[Any]]]
+    :return: What was sent to each recipient, and what went wrong for the ones that failed.
+    :rtype: BroadcastResult[Recipient]
+    """
+    outcomes = await asyncio.gather(
+        *(delivery for _, delivery in deliveries), return_exceptions=True
+    )
+    result: BroadcastResult[Recipient] = BroadcastResult()
+    for (recipient, _), outcome in zip(deliveries, outcomes):
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        if isinstance(outcome, BaseException):
+            result.failures.append((recipient, outcome))
+        else:
+            result.sent.append((recipient, outcome))
+    return result
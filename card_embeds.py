@@ -0,0 +1,102 @@
+"""
+This file holds the cache of card embeds that the Discord frontends show cards with. A card's text
+never changes at runtime, so each distinct card's embed is only built once and then shared.
+"""
+
+from typing import Any, Callable, Hashable, Iterable
+
+import disnake
+
+from hide_and_seek_interfaces import Curse
+
+
+class FrozenEmbed(disnake.Embed):
+    """
+    An embed that cannot be changed once built, as it is shared by every message showing the
+    card. Use copy to get an embed that can be changed.
+    """
+
+    __slots__ = ("_frozen",)
+
+    def __setattr__(self, name: str, value: Any):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("Cached card embeds are shared and cannot be changed")
+        super().__setattr__(name, value)
+
+    def freeze(self) -> "FrozenEmbed":
+        self._frozen = True
+        return self
+
+    def copy(self) -> disnake.Embed:
+        return disnake.Embed.from_dict(self.to_dict())
+
+
+def render_card(card: Any) -> disnake.Embed:
+    """
+    Builds the embed of a card from this tree's hide_and_seek_cards.
+
+    :param card: Card to show.
+    :type card: Card
+    :return: The card's embed.
+    :rtype: disnake.Embed
+    """
+    embed = disnake.Embed(title=card.get_card_name())
+    if isinstance(card, Curse):
+        embed.add_field("Effect", card.get_effect_description(), inline=False)
+        embed.add_field("Cost", card.get_cost_description(), inline=False)
+    elif card.get_time_bonus() > 0:
+        embed.description = f"Adds {card.get_time_bonus() // 60} minutes to your hiding time."
+    return embed
+
+
+class CardEmbedCache:
+    """
+    Builds each distinct card's embed once, keyed by the card's type and parameters, and hands
+    out the same FrozenEmbed every time after that.
+    """
+
+    def __init__(self, render: Callable[[Any], disnake.Embed] = render_card):
+        """
+        :param render: Builds the embed of a card.
+        :type render: Callable[[Any], disnake.Embed]
+        """
+        self.render = render
+        self._embeds: dict[Hashable, FrozenEmbed] = {}
+
+    @staticmethod
+    def key(card: Any) -> Hashable:
+        """
+        :return: What tells the card's embed apart from others. Cards without get_params are
+            told apart by their name, which includes any parameters.
+        :rtype: Hashable
+        """
+        get_params = getattr(card, "get_params", None)
+        if get_params is not None:
+            return (type(card), get_params())
+        return (type(card), card.get_card_name())
+
+    def get(self, card: Any) -> FrozenEmbed:
+        """
+        :param card: Card to show.
+        :type card: Any
+        :return: The card's shared embed.
+        :rtype: FrozenEmbed
+        """
+        key = self.key(card)
+        embed = self._embeds.get(key)
+        if embed is None:
+            embed = FrozenEmbed.from_dict(self.render(card).to_dict()).freeze()
+            self._embeds[key] = embed
+        return embed
+
+    def get_many(self, cards: Iterable[Any]) -> list[FrozenEmbed]:
+        """
+        :param cards: Cards to show, such as a hand.
+        :type cards: Iterable[Any]
+        :return: The shared embed of each card, in order.
+        :rtype: list[FrozenEmbed]
+        """
+        return [self.get(card) for card in cards]
+
+    def __len__(self) -> int:
+        return len(self._embeds)
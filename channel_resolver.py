@@ -0,0 +1,149 @@
+"""
+This file holds a cache of the channels that users are messaged in, so that finding a user's DM
+channel does not cost a REST request every time. It is not aware of Discord: the frontend passes
+in how to fetch a channel and how to rebuild one from its ID.
+"""
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Protocol, TypeVar
+
+from clock import Clock, SystemClock
+
+
+class _HasId(Protocol):
+    id: int
+
+
+Channel = TypeVar("Channel", bound=_HasId)
+
+
+@dataclass
+class _Entry(Generic[Channel]):
+    channel: Channel
+    expires: float
+
+
+class ChannelResolver(Generic[Channel]):
+    """
+    Resolves user IDs to channels, keeping each channel for ttl seconds. Concurrent lookups of
+    the same user share one fetch. A channel that fails to send should be invalidated, so that
+    the next lookup fetches it again.
+
+    If cache_path is given, the channel ID of each user is stored there whenever a channel is
+    fetched, and load reads them back at startup. Loaded channels are rebuilt with
+    from_channel_id without any requests, and treated like any other cached channel.
+    """
+
+    def __init__(
+        self,
+        fetch_channel: Callable[[int], Awaitable[Channel]],
+        ttl: float = 3600,
+        clock: Clock | None = None,
+        cache_path: str | None = None,
+        from_channel_id: Callable[[int], Channel] | None = None,
+    ):
+        """
+        :param fetch_channel: Fetches the channel of a user ID from the server.
+        :type fetch_channel: Callable[[int], Awaitable[Channel]]
+        :param ttl: Seconds to keep a channel for.
+        :type ttl: float
+        :param clock: Source of the time, the system's by default.
+        :type clock: Clock | None
+        :param cache_path: File to store channel IDs in between runs, if any.
+        :type cache_path: str | None
+        :param from_channel_id: Rebuilds a channel from its ID. Needed to load cache_path.
+        :type from_channel_id: Callable[[int], Channel] | None
+        """
+        self.fetch_channel = fetch_channel
+        self.ttl = ttl
+        self.clock = clock if clock is not None else SystemClock()
+        self.cache_path = cache_path
+        self.from_channel_id = from_channel_id
+        self._entries: dict[int, _Entry[Channel]] = {}
+        self._pending: dict[int, asyncio.Future[Channel]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, user_id: int) -> Channel:
+        """
+        :param user_id: User to find the channel of.
+        :type user_id: int
+        :return: The user's channel, from the cache if it has not expired.
+        :rtype: Channel
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None and entry.expires > self.clock.time():
+            self.hits += 1
+            return entry.channel
+
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future: asyncio.Future[Channel] = asyncio.get_running_loop().create_future()
+        self._pending[user_id] = future
+        try:
+            channel = await self.fetch_channel(user_id)
+        except BaseException as error:
+            future.set_exception(error)
+            # Nobody else may be waiting, so the exception must not be left unretrieved
+            future.exception()
+            raise
+        else:
+            self._entries[user_id] = _Entry(channel, self.clock.time() + self.ttl)
+            future.set_result(channel)
+            self.save()
+            return channel
+        finally:
+            del self._pending[user_id]
+
+    def invalidate(self, user_id: int):
+        """
+        Forgets a user's channel, for example after sending to it failed.
+
+        :param user_id: User whose channel to forget.
+        :type user_id: int
+        """
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        """
+        Forgets every channel.
+        """
+        self._entries.clear()
+
+    def load(self) -> int:
+        """
+        Warms the cache from cache_path. Does nothing if there is no file yet.
+
+        :return: Number of channels loaded.
+        :rtype: int
+        """
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return 0
+        assert self.from_channel_id is not None
+        with open(self.cache_path) as file:
+            channel_ids: dict[str, int] = json.load(file)
+        expires = self.clock.time() + self.ttl
+        for user_id, channel_id in channel_ids.items():
+            self._entries[int(user_id)] = _Entry(self.from_channel_id(channel_id), expires)
+        return len(channel_ids)
+
+    def save(self):
+        """
+        Stores the ID of every cached channel in cache_path, replacing it atomically.
+        """
+        if self.cache_path is None:
+            return
+        channel_ids = {
+            str(user_id): entry.channel.id for user_id, entry in self._entries.items()
+        }
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(channel_ids, file)
+        os.replace(temp_path, self.cache_path)
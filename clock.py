@@ -0,0 +1,86 @@
+"""
+This file holds the clocks that the scheduler and game state read the time from. Using a
+VirtualClock lets a whole game be played without waiting in real time.
+"""
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+
+
+class Clock(ABC):
+    """
+    This is the abstract class that represents a source of epoch time.
+    """
+
+    @abstractmethod
+    def time(self) -> float:
+        """
+        :return: The current epoch time in seconds.
+        :rtype: float
+        """
+
+    @abstractmethod
+    async def wait_until(self, deadline: float | None, wakeup: asyncio.Event):
+        """
+        Waits until the deadline has passed or wakeup is set, whichever is first.
+
+        :param deadline: Epoch time to wait until, or None to wait only for wakeup.
+        :type deadline: float | None
+        :param wakeup: Event that ends the wait early when set.
+        :type wakeup: asyncio.Event
+        """
+
+
+class SystemClock(Clock):
+    """
+    The real wall clock.
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    async def wait_until(self, deadline: float | None, wakeup: asyncio.Event):
+        if deadline is None:
+            await wakeup.wait()
+            return
+
+        loop = asyncio.get_running_loop()
+        delay = max(0, deadline - self.time())
+        timer = loop.call_at(loop.time() + delay, wakeup.set)
+        try:
+            await wakeup.wait()
+        finally:
+            timer.cancel()
+
+
+class VirtualClock(Clock):
+    """
+    A clock that only moves when told to. Waiting on it gives every other coroutine a chance to
+    run, and then jumps straight to the deadline.
+    """
+
+    def __init__(self, start_time: float = 0):
+        self.now = start_time
+
+    def time(self) -> float:
+        return self.now
+
+    def advance_to(self, new_time: float):
+        """
+        Moves the clock forward. The clock never goes backwards, so earlier times are ignored.
+
+        :param new_time: Epoch time to move to.
+        :type new_time: float
+        """
+        self.now = max(self.now, new_time)
+
+    async def wait_until(self, deadline: float | None, wakeup: asyncio.Event):
+        await asyncio.sleep(0)
+        if deadline is None:
+            await wakeup.wait()
+        elif not wakeup.is_set():
+            self.advance_to(deadline)
+
+
+SYSTEM_CLOCK = SystemClock()
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from array import array
 from typing import TYPE_CHECKING
 
 import hide_and_seek_interfaces as interfaces
@@ -12,9 +13,13 @@ class TimeBonus(interfaces.Card):
     """
     Class for abstract time bonus cards
     """
-    def __init__(self, time_bonus_minute: int, game_state_inst: GameState):
-        super().__init__(game_state_inst)
-        self.time_bonus_minute = time_bonus_minute
+    __slots__ = ("time_bonus_minute",)
+
+    def __init__(self, time_bonus_minute: int):
+        object.__setattr__(self, "time_bonus_minute", time_bonus_minute)
+
+    def get_params(self) -> tuple:
+        return (self.time_bonus_minute,)
 
     def get_time_bonus(self) -> int:
         return self.time_bonus_minute * 60
@@ -24,13 +29,13 @@ class TimeBonus(interfaces.Card):
 
 
 class Randomise(interfaces.Powerup):
-    def _playable(self):
-        return self.game_state.conditions.has_condition(
+    def _playable(self, game_state: GameState):
+        return game_state.conditions.has_condition(
             Condition.ACTIVEQUESTION
-        ) and not self.game_state.conditions.has_condition(Condition.HAND_LOCK)
+        ) and not game_state.conditions.has_condition(Condition.HAND_LOCK)
 
-    async def play(self):
-        assert self._playable()
+    async def play(self, game_state: GameState):
+        assert self._playable(game_state)
         # TODO: Implement
 
     def get_card_name(self) -> str:
@@ -38,97 +43,103 @@ class Randomise(interfaces.Powerup):
 
 
 class Veto(interfaces.Powerup):
-    def _playable(self):
-        return self.game_state.conditions.has_condition(
+    def _playable(self, game_state: GameState):
+        return game_state.conditions.has_condition(
             Condition.ACTIVEQUESTION
-        ) and not self.game_state.conditions.has_condition(Condition.HAND_LOCK)
+        ) and not game_state.conditions.has_condition(Condition.HAND_LOCK)
 
-    async def play(self):
-        assert self._playable()
-        self.game_state.investigation_book.reward_mult(0, 1)
-        await self.game_state.answered_question("Vetoed.")
+    async def play(self, game_state: GameState):
+        assert self._playable(game_state)
+        game_state.investigation_book.reward_mult(0, 1)
+        await game_state.answered_question("Vetoed.")
 
     def get_card_name(self) -> str:
         return "Veto Question"
 
 
 class Duplicate(interfaces.Powerup):
-    def _playable(self):
+    def _playable(self, game_state: GameState):
         return (
-            self.game_state.hider_deck.get_hand_size() > 1
-            and not self.game_state.conditions.has_condition(Condition.HAND_LOCK)
+            game_state.hider_deck.get_hand_size() > 1
+            and not game_state.conditions.has_condition(Condition.HAND_LOCK)
         )
 
-    async def play(self):
-        assert self._playable()
-        contention = [x for x in self.game_state.hider_deck.hand if x != self]
+    async def play(self, game_state: GameState):
+        assert self._playable(game_state)
+        contention = [x for x in game_state.hider_deck.hand if x != self]
 
-        self.game_state.conditions.add_condition(Condition.HAND_LOCK)
-        result = await self.game_state.frontend.select_cards(contention, 1, "duplicate")
-        self.game_state.conditions.remove_condition(Condition.HAND_LOCK)
-        assert len(result) == 1
-        self.game_state.hider_deck.hand.append(result.pop().__class__(self.game_state))
+        game_state.conditions.add_condition(Condition.HAND_LOCK)
+        await game_state.request_selection(contention, 1, "duplicate", self)
+
+    async def selected(self, game_state: GameState, chosen: list[interfaces.Card]):
+        if game_state.conditions.has_condition(Condition.HAND_LOCK):
+            game_state.conditions.remove_condition(Condition.HAND_LOCK)
+        for card in chosen:
+            game_state.hider_deck.copy_card(card)
 
     def get_card_name(self) -> str:
         return "Duplicate Card"
 
 
 class DiscardDraw(interfaces.Powerup):
-    def __init__(
-        self,
-        discard_amount: int,
-        draw_amount: int,
-        game_state_inst: GameState,
-    ):
-        super().__init__(game_state_inst)
-        self.draw_amount = draw_amount
-        self.discard_amount = discard_amount
-
-    def _playable(self):
-        return self.game_state.hider_deck.get_hand_size() >= self.discard_amount + 1
-
-    async def play(self):
-        assert self._playable()
-        contention = [x for x in self.game_state.hider_deck.hand if x != self]
-
-        self.game_state.conditions.add_condition(Condition.HAND_LOCK)
-        result = await self.game_state.frontend.select_cards(
-            contention, self.discard_amount, "discard"
+    __slots__ = ("discard_amount", "draw_amount")
+
+    def __init__(self, discard_amount: int, draw_amount: int):
+        object.__setattr__(self, "discard_amount", discard_amount)
+        object.__setattr__(self, "draw_amount", draw_amount)
+
+    def get_params(self) -> tuple:
+        return (self.discard_amount, self.draw_amount)
+
+    def _playable(self, game_state: GameState):
+        return (
+            game_state.hider_deck.get_hand_size() >= self.discard_amount + 1
+            and not game_state.conditions.has_condition(Condition.HAND_LOCK)
         )
-        self.game_state.conditions.remove_condition(Condition.HAND_LOCK)
 
-        for card in result:
-            self.game_state.hider_deck.discard(card)
+    async def play(self, game_state: GameState):
+        assert self._playable(game_state)
+        contention = [x for x in game_state.hider_deck.hand if x != self]
+
+        game_state.conditions.add_condition(Condition.HAND_LOCK)
+        await game_state.request_selection(contention, self.discard_amount, "discard", self)
+
+    async def selected(self, game_state: GameState, chosen: list[interfaces.Card]):
+        if game_state.conditions.has_condition(Condition.HAND_LOCK):
+            game_state.conditions.remove_condition(Condition.HAND_LOCK)
+
+        for card in chosen:
+            game_state.hider_deck.discard(card)
 
         for i in range(self.draw_amount):
-            await self.game_state.hider_deck.draw()
+            await game_state.hider_deck.draw()
 
     def get_card_name(self) -> str:
         return f"Discard {self.discard_amount}, Draw {self.draw_amount}"
 
 
 class DrawExpand(interfaces.Powerup):
-    def __init__(
-        self,
-        draw_amount: int,
-        expand_amount: int,
-        game_state_inst: GameState,
-    ):
-        super().__init__(game_state_inst)
-        self.draw_amount = draw_amount
-        self.expand_amount = expand_amount
-
-    async def play(self):
-        await self.game_state.hider_deck.draw()
-        self.game_state.hider_deck.max_hand_size += 1
+    __slots__ = ("draw_amount", "expand_amount")
+
+    def __init__(self, draw_amount: int, expand_amount: int):
+        object.__setattr__(self, "draw_amount", draw_amount)
+        object.__setattr__(self, "expand_amount", expand_amount)
+
+    def get_params(self) -> tuple:
+        return (self.draw_amount, self.expand_amount)
+
+    async def play(self, game_state: GameState):
+        for i in range(self.draw_amount):
+            await game_state.hider_deck.draw()
+        game_state.hider_deck.expand_hand(self.expand_amount)
 
     def get_card_name(self) -> str:
         return f"Draw {self.draw_amount}, Expand Max Hand Size by {self.expand_amount}"
 
 
 class Zoologist(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Zoologist"
@@ -141,8 +152,8 @@ class Zoologist(interfaces.Curse):
 
 
 class UnguidedTourist(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Unguided Tourist"
@@ -155,8 +166,8 @@ class UnguidedTourist(interfaces.Curse):
 
 
 class EndlessTumble(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Endless Tumble"
@@ -169,8 +180,8 @@ class EndlessTumble(interfaces.Curse):
 
 
 class Hangman(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Hidden Hangman"
@@ -183,8 +194,8 @@ class Hangman(interfaces.Curse):
 
 
 class Chalice(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Overflowing Chalice"
@@ -197,8 +208,8 @@ class Chalice(interfaces.Curse):
 
 
 class MediocreTravelAgent(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Mediocre Travel Agent"
@@ -211,8 +222,8 @@ class MediocreTravelAgent(interfaces.Curse):
 
 
 class LuxuryCar(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Luxury Car"
@@ -225,8 +236,8 @@ class LuxuryCar(interfaces.Curse):
 
 
 class UTurn(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the U-Turn"
@@ -239,8 +250,8 @@ class UTurn(interfaces.Curse):
 
 
 class BridgeTroll(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Bridge Troll"
@@ -253,8 +264,8 @@ class BridgeTroll(interfaces.Curse):
 
 
 class Water(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Water Weight"
@@ -266,8 +277,8 @@ class Water(interfaces.Curse):
         return "Seekers must be within 300 meters of a body of water"
 
 class JammedDoor(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Jammed Door"
@@ -280,8 +291,8 @@ class JammedDoor(interfaces.Curse):
 
 
 class Cairn(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Cairn"
@@ -294,8 +305,8 @@ class Cairn(interfaces.Curse):
 
 
 class UrbanExplorer(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Urban Explorer"
@@ -308,8 +319,8 @@ class UrbanExplorer(interfaces.Curse):
 
 
 class DistantCuisine(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Distant Cuisine"
@@ -322,8 +333,8 @@ class DistantCuisine(interfaces.Curse):
 
 
 class RightTurn(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Right Turn"
@@ -336,8 +347,8 @@ class RightTurn(interfaces.Curse):
 
 
 class Labyrinth(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Labyrinth"
@@ -350,8 +361,8 @@ class Labyrinth(interfaces.Curse):
 
 
 class BirdGuide(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Bird Guide"
@@ -364,8 +375,8 @@ class BirdGuide(interfaces.Curse):
 
 
 class DrainedBrain(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Drained Brain"
@@ -378,8 +389,8 @@ class DrainedBrain(interfaces.Curse):
 
 
 class Ransom(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Ransom Note"
@@ -392,8 +403,8 @@ class Ransom(interfaces.Curse):
 
 
 class GamblersFeet(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Gambler's Feet"
@@ -406,8 +417,8 @@ class GamblersFeet(interfaces.Curse):
 
 
 class ProsperousHome(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Prosperous Home"
@@ -420,8 +431,8 @@ class ProsperousHome(interfaces.Curse):
 
 
 class Void(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Void"
@@ -434,8 +445,8 @@ class Void(interfaces.Curse):
 
 
 class ExpressTrain(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Express Train"
@@ -448,8 +459,8 @@ class ExpressTrain(interfaces.Curse):
 
 
 class ZippedLip(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Zipped Lip"
@@ -462,8 +473,8 @@ class ZippedLip(interfaces.Curse):
 
 
 class PlaguedWord(interfaces.Curse):
-    async def play(self):
-        await super().play()  # TODO: Implement
+    async def play(self, game_state: GameState):
+        await super().play(game_state)  # TODO: Implement
 
     def get_card_name(self) -> str:
         return "Curse of the Plagued Word"
@@ -473,3 +484,53 @@ class PlaguedWord(interfaces.Curse):
 
     def get_cost_description(self) -> str:
         return "Seeks must be at least 25km away from you."
+
+
+# Every distinct card in the hider deck, with how many copies the deck starts with. Cards are
+# registered here once, at import, and a card's ID is its index in CARDS.
+STARTING_DECK: tuple[tuple[interfaces.Card, int], ...] = (
+    (TimeBonus(3), 25),
+    (TimeBonus(6), 15),
+    (TimeBonus(9), 10),
+    (TimeBonus(12), 3),
+    (TimeBonus(18), 2),
+    (Randomise(), 4),
+    (Veto(), 4),
+    (Duplicate(), 2),
+    (DiscardDraw(1, 2), 4),
+    (DiscardDraw(2, 3), 4),
+    (DrawExpand(1, 1), 2),
+    (Zoologist(), 1),
+    (UnguidedTourist(), 1),
+    (EndlessTumble(), 1),
+    (Hangman(), 1),
+    (Chalice(), 1),
+    (MediocreTravelAgent(), 1),
+    (LuxuryCar(), 1),
+    (UTurn(), 1),
+    (BridgeTroll(), 1),
+    (Water(), 1),
+    (JammedDoor(), 1),
+    (Cairn(), 1),
+    (UrbanExplorer(), 1),
+    (DistantCuisine(), 1),
+    (RightTurn(), 1),
+    (Labyrinth(), 1),
+    (BirdGuide(), 1),
+    (DrainedBrain(), 1),
+    (Ransom(), 1),
+    (GamblersFeet(), 1),
+    (ProsperousHome(), 1),
+    (Void(), 1),
+    (ExpressTrain(), 1),
+    (ZippedLip(), 1),
+    (PlaguedWord(), 1),
+)
+
+CARDS: tuple[interfaces.Card, ...] = tuple(card for card, num in STARTING_DECK)
+CARD_IDS: dict[interfaces.Card, int] = {card: card_id for card_id, card in enumerate(CARDS)}
+
+# A full deck as card IDs, which each new round's deck is copied from
+DECK_TEMPLATE = array(
+    "B", [card_id for card_id, (card, num) in enumerate(STARTING_DECK) for i in range(num)]
+)
@@ -3,11 +3,8 @@ A file that manages all conditions (or status effects) that the game could have.
 """
 
 import enum
-import time
 from typing import Callable
-from task_scheduler import TaskScheduler
-
-scheduler = TaskScheduler()
+from task_scheduler import TaskScheduler, ScheduledTask, SchedulerScope
 
 class Condition(enum.Enum):
     """
@@ -22,10 +19,18 @@ class Condition(enum.Enum):
 
 class ConditionManager:
     """
-    Class that keeps track of all active conditions on the game.
+    Class that keeps track of all active conditions on the game. If on_change is given, it is
+    called with each condition and whether it was added or removed, after the change is made.
     """
-    def __init__(self):
+    def __init__(
+        self,
+        scheduler: TaskScheduler | SchedulerScope,
+        on_change: Callable[[Condition, bool], None] | None = None,
+    ):
+        self.scheduler = scheduler
+        self.on_change = on_change
         self.conditions: dict[Condition, Callable[[], None]] = {}
+        self.expiries: dict[Condition, ScheduledTask] = {}
 
     def add_condition(
         self,
@@ -47,9 +52,11 @@ class ConditionManager:
         assert condition not in self.conditions
         self.conditions[condition] = callback
         if duration is not None:
-            scheduler.add_function(
-                int(time.time() + duration), lambda: self.remove_condition(condition)
+            self.expiries[condition] = self.scheduler.add_function(
+                int(self.scheduler.clock.time() + duration), self.remove_condition, condition
             )
+        if self.on_change is not None:
+            self.on_change(condition, True)
 
     def has_condition(self, condition: Condition):
         """
@@ -68,4 +75,9 @@ class ConditionManager:
         :type condition: Condition
         """
         assert condition in self.conditions
-        self.conditions.pop(condition)()
+        if condition in self.expiries:
+            self.expiries.pop(condition).cancel()
+        callback = self.conditions.pop(condition)
+        if self.on_change is not None:
+            self.on_change(condition, False)
+        callback()
@@ -0,0 +1,284 @@
+"""
+This file models the hider deck economy for many independent trials at once with NumPy, so that
+balance questions such as "how much time bonus does the hider hold after five questions" can be
+answered interactively. It applies the same rules as HiderDeck.reward and
+InvestigationBook.question_answered: each reward draws some cards, keeps some of them and
+discards the rest, the discard pile is shuffled back in when the deck runs low, and a question
+pays out once per time it has been answered, times any reward multiplier.
+
+Each trial's deck, hand and discard pile are stored as counts per card ID, in (trials, card
+kinds) integer arrays, so every draw is a handful of array operations over all trials. The
+hider keeps the drawn cards with the biggest time bonuses, and discards the smallest when over
+the hand limit, like GreedyHider in hide_and_seek_simulator.
+
+NumPy is needed for this file only; the bot itself does not use it.
+
+Usage: python hide_and_seek_deck_model.py [--trials 1000000] [--questions Matching Radar Photo]
+"""
+
+import argparse
+import time
+from collections import Counter
+from typing import Any
+
+import numpy as np
+
+import hide_and_seek_cards as cards
+from hide_and_seek_game_state import DEFAULT_MAX_HAND_SIZE
+from hide_and_seek_questions import QuestionManager
+
+
+def starting_composition() -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    Reads the starting deck from the card registry, so that the model always matches the game.
+
+    :return: The name of each card kind, how many of each are in the deck, and the time bonus
+        in seconds of each.
+    :rtype: tuple[list[str], np.ndarray, np.ndarray]
+    """
+    return (
+        [card.get_card_name() for card in cards.CARDS],
+        np.array([num for card, num in cards.STARTING_DECK], dtype=np.int16),
+        np.array([card.get_time_bonus() for card in cards.CARDS], dtype=np.int64),
+    )
+
+
+def question_rewards() -> dict[str, tuple[int, int]]:
+    """
+    :return: The (draw, keep) reward of each question type, keyed by the type's name without
+        the "Question" suffix, for example "Matching".
+    :rtype: dict[str, tuple[int, int]]
+    """
+    return {
+        type(question).__name__.removesuffix("Question"): question.get_reward()
+        for question in QuestionManager().questions
+    }
+
+
+class DeckModel:
+    """
+    Many independent trials of a single round's hider deck, advanced together.
+    """
+
+    def __init__(
+        self,
+        trials: int,
+        seed: int | None = None,
+        max_hand_size: int = DEFAULT_MAX_HAND_SIZE,
+    ):
+        self.trials = trials
+        self.rng = np.random.default_rng(seed)
+        self.max_hand_size = max_hand_size
+        self.names, starting_counts, self.time_bonuses = starting_composition()
+        kinds = len(self.names)
+        # Kinds ordered from smallest to largest time bonus, for discarding
+        self.discard_order = np.argsort(self.time_bonuses, kind="stable")
+
+        self.deck = np.tile(starting_counts, (trials, 1))
+        self.hand = np.zeros((trials, kinds), dtype=np.int16)
+        self.discard_pile = np.zeros((trials, kinds), dtype=np.int16)
+        self.deck_size = np.full(trials, int(starting_counts.sum()), dtype=np.int64)
+        self.rows = np.arange(trials)
+
+        self.drawn_total = np.zeros(kinds, dtype=np.int64)
+        self.kept_total = np.zeros(kinds, dtype=np.int64)
+
+    def _draw_one(self, active: np.ndarray) -> np.ndarray:
+        """
+        Draws one card uniformly from the deck of every active trial.
+
+        :return: The kind drawn in each trial, or -1 for inactive trials.
+        :rtype: np.ndarray
+        """
+        position = (self.rng.random(self.trials) * self.deck_size).astype(np.int64)
+        cumulative = np.cumsum(self.deck, axis=1, dtype=np.int16)
+        kinds = (cumulative > position[:, None]).argmax(axis=1)
+        kinds = np.where(active, kinds, -1)
+        rows = self.rows[active]
+        self.deck[rows, kinds[active]] -= 1
+        self.deck_size -= active
+        return kinds
+
+    def _reshuffle(self, reshuffle: np.ndarray):
+        self.deck[reshuffle] += self.discard_pile[reshuffle]
+        self.deck_size[reshuffle] += self.discard_pile[reshuffle].sum(axis=1)
+        self.discard_pile[reshuffle] = 0
+
+    def reward(
+        self,
+        draw_num: int,
+        keep_num: int,
+        active: np.ndarray | None = None,
+        sets: int | np.ndarray = 1,
+    ):
+        """
+        Same as HiderDeck.reward, for every active trial. Every set is drawn before the hand
+        limit is enforced. If the deck runs out partway, it is reshuffled with the sets discarded
+        so far, as the game then gives the remaining rewards in another batch.
+
+        :param draw_num: Number of cards to draw for each set.
+        :type draw_num: int
+        :param keep_num: Number of the drawn cards to keep from each set.
+        :type keep_num: int
+        :param active: Which trials receive the reward, or None for all of them.
+        :type active: np.ndarray | None
+        :param sets: Number of rewards given at once, either for all trials or per trial.
+        :type sets: int | np.ndarray
+        """
+        if active is None:
+            active = np.ones(self.trials, dtype=bool)
+        sets = np.broadcast_to(sets, (self.trials,))
+
+        self._reshuffle(active & (self.deck_size <= draw_num * sets))
+        for i in range(int(sets[active].max(initial=0))):
+            in_set = active & (sets > i)
+            self._reshuffle(in_set & (self.deck_size < draw_num))
+            self._draw_set(draw_num, keep_num, in_set)
+
+        self._enforce_hand_limit()
+
+    def _draw_set(self, draw_num: int, keep_num: int, active: np.ndarray):
+        """
+        Draws draw_num cards in every active trial, keeping the keep_num with the biggest time
+        bonuses and discarding the rest.
+        """
+        drawn = np.stack([self._draw_one(active) for i in range(draw_num)], axis=1)
+        values = np.where(drawn >= 0, self.time_bonuses[drawn], -1)
+        ranked = np.take_along_axis(drawn, np.argsort(-values, axis=1, kind="stable"), axis=1)
+
+        for column in range(draw_num):
+            kinds = ranked[:, column]
+            valid = kinds >= 0
+            target = self.hand if column < keep_num else self.discard_pile
+            np.add.at(target, (self.rows[valid], kinds[valid]), 1)
+            totals = np.bincount(kinds[valid], minlength=len(self.names))
+            self.drawn_total += totals
+            if column < keep_num:
+                self.kept_total += totals
+
+    def _enforce_hand_limit(self):
+        """
+        Discards the card with the smallest time bonus from every oversized hand, until every
+        hand is legal.
+        """
+        while True:
+            over = self.hand.sum(axis=1) > self.max_hand_size
+            if not over.any():
+                return
+            rows = self.rows[over]
+            present = self.hand[rows][:, self.discard_order] > 0
+            kinds = self.discard_order[present.argmax(axis=1)]
+            self.hand[rows, kinds] -= 1
+            self.discard_pile[rows, kinds] += 1
+
+    def answer_question(
+        self,
+        draw_num: int,
+        keep_num: int,
+        times_answered: int | np.ndarray = 1,
+        multiplier: int | np.ndarray = 1,
+    ):
+        """
+        Same as InvestigationBook.question_answered. The hider receives the reward once per time
+        the question has now been answered, times the multiplier, with every reward drawn at once.
+
+        :param draw_num: Number of cards each reward draws.
+        :type draw_num: int
+        :param keep_num: Number of cards each reward keeps.
+        :type keep_num: int
+        :param times_answered: Times the question has been answered, including this time, either
+            for all trials or per trial.
+        :type times_answered: int | np.ndarray
+        :param multiplier: Reward multiplier, either for all trials or per trial. Zero models a
+            question that was answered late.
+        :type multiplier: int | np.ndarray
+        """
+        repeats = np.broadcast_to(np.asarray(times_answered) * multiplier, (self.trials,))
+        self.reward(draw_num, keep_num, repeats > 0, repeats)
+
+    def hand_value(self) -> np.ndarray:
+        """
+        :return: Seconds of time bonus held in each trial's hand.
+        :rtype: np.ndarray
+        """
+        return self.hand.astype(np.int64) @ self.time_bonuses
+
+    def hand_size(self) -> np.ndarray:
+        """
+        :return: Number of cards in each trial's hand.
+        :rtype: np.ndarray
+        """
+        return self.hand.sum(axis=1)
+
+    def summary(self) -> dict[str, Any]:
+        """
+        :return: The distributions of hand value and hand size over the trials, and how often
+            each card kind has been drawn and kept, as plain data.
+        :rtype: dict[str, Any]
+        """
+        hand_value = self.hand_value()
+        sizes, size_counts = np.unique(self.hand_size(), return_counts=True)
+        drawn = self.drawn_total.sum()
+        return {
+            "trials": self.trials,
+            "hand_value": {
+                "mean": float(hand_value.mean()),
+                "stdev": float(hand_value.std()),
+                **{
+                    f"p{percent}": float(value)
+                    for percent, value in zip(
+                        (10, 50, 90, 99), np.percentile(hand_value, [10, 50, 90, 99])
+                    )
+                },
+            },
+            "hand_size": {
+                int(size): int(count) / self.trials for size, count in zip(sizes, size_counts)
+            },
+            "draws": {
+                name: {
+                    "drawn": int(self.drawn_total[i]) / max(drawn, 1),
+                    "kept": int(self.kept_total[i]) / max(int(self.drawn_total[i]), 1),
+                }
+                for i, name in enumerate(self.names)
+            },
+        }
+
+
+def main():
+    rewards = question_rewards()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trials", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-hand-size", type=int, default=DEFAULT_MAX_HAND_SIZE)
+    parser.add_argument(
+        "--questions",
+        nargs="+",
+        default=["Matching", "Measuring", "Radar", "Photo", "Matching"],
+        choices=sorted(rewards),
+        help="Question types asked in order. Repeats count as the same question answered again",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = DeckModel(args.trials, args.seed, args.max_hand_size)
+    times_answered: Counter[str] = Counter()
+    for question in args.questions:
+        times_answered[question] += 1
+        model.answer_question(*rewards[question], times_answered[question])
+    elapsed = time.perf_counter() - start
+    summary = model.summary()
+
+    print(f"{args.trials:,} trials of {len(args.questions)} questions in {elapsed:.1f}s")
+    print("Time bonus in hand (s): " + ", ".join(
+        f"{name} {value:.0f}" for name, value in summary["hand_value"].items()
+    ))
+    print("Hand size:")
+    for size, share in summary["hand_size"].items():
+        print(f"  {size:>2} | {share:>6.1%}")
+    print(f"{'CARD':<45} | {'DRAWN':>6} | {'KEPT':>6}")
+    for name, draws in summary["draws"].items():
+        print(f"{name:<45} | {draws['drawn']:>6.1%} | {draws['kept']:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+"""
+This file holds the events that every change to a game is recorded as, and the log that they are
+kept in. A game can be rebuilt from its latest snapshot plus the events logged after it, and the
+whole log can be replayed from the start to see exactly how a game unfolded.
+"""
+
+import dataclasses
+import json
+import os
+import struct
+import typing
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+import hide_and_seek_questions as questions
+from hide_and_seek_conditions import Condition
+from hide_and_seek_interfaces import QuestionInstance
+from hide_and_seek_serialization import decode_snapshot, encode_snapshot
+
+# Sequence number of the last event a snapshot includes, and the log's length at that point
+_SNAPSHOT_POSITION = struct.Struct("<QQ")
+
+
+@dataclass(frozen=True)
+class GameEvent:
+    """
+    Base class of every event. Events only hold plain values, so that applying one never
+    depends on anything other than the game state it is applied to.
+    """
+
+
+@dataclass(frozen=True)
+class DeckEvent(GameEvent):
+    """
+    Base class of the events that change the HiderDeck.
+    """
+
+
+@dataclass(frozen=True)
+class BookEvent(GameEvent):
+    """
+    Base class of the events that change the InvestigationBook.
+    """
+
+
+@dataclass(frozen=True)
+class RoundStarted(GameEvent):
+    player: str
+
+
+@dataclass(frozen=True)
+class SeekersReleased(GameEvent):
+    time: int
+
+
+@dataclass(frozen=True)
+class QuestionExpired(GameEvent):
+    time: int
+
+
+@dataclass(frozen=True)
+class QuestionAnswered(GameEvent):
+    answer: str
+    penalty: int | None
+
+
+@dataclass(frozen=True)
+class HiderCaught(GameEvent):
+    time: int
+    time_bonus: int
+
+
+@dataclass(frozen=True)
+class NextPlayerChosen(GameEvent):
+    player: str
+
+
+@dataclass(frozen=True)
+class ConditionAdded(GameEvent):
+    condition: Condition
+
+
+@dataclass(frozen=True)
+class ConditionRemoved(GameEvent):
+    condition: Condition
+
+
+@dataclass(frozen=True)
+class SelectionRequested(GameEvent):
+    """
+    The hider was asked to select cards. Cards are stored as their IDs in the registry in
+    hide_and_seek_cards, with a source of -1 if no card asked for the selection.
+    """
+
+    selection_id: int
+    cards: tuple[int, ...]
+    num_select: int
+    reason: str
+    deadline: int
+    source: int
+    group_sizes: tuple[int, ...] = ()
+
+
+@dataclass(frozen=True)
+class SelectionMade(GameEvent):
+    """
+    The pending selection was made, or expired. The events after it record what was chosen.
+    """
+
+
+@dataclass(frozen=True)
+class DeckReshuffled(DeckEvent):
+    """
+    The discard pile was put back into the deck.
+    """
+
+
+@dataclass(frozen=True)
+class CardsDrawn(DeckEvent):
+    """
+    Cards were taken from the deck for the hider to choose between. Positions are the deck
+    indices popped, in order.
+    """
+
+    positions: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class CardsKept(DeckEvent):
+    """
+    The hider chose which of the drawn cards to keep, given as indices into the drawn cards. The
+    rest were discarded.
+    """
+
+    kept: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class CardDrawn(DeckEvent):
+    position: int
+
+
+@dataclass(frozen=True)
+class CardPlayed(DeckEvent):
+    hand_index: int
+
+
+@dataclass(frozen=True)
+class CardDiscarded(DeckEvent):
+    hand_index: int
+
+
+@dataclass(frozen=True)
+class CardCopied(DeckEvent):
+    hand_index: int
+
+
+@dataclass(frozen=True)
+class HandExpanded(DeckEvent):
+    amount: int
+
+
+@dataclass(frozen=True)
+class QuestionAsked(BookEvent):
+    question: QuestionInstance
+
+
+@dataclass(frozen=True)
+class RewardMultiplied(BookEvent):
+    multiplier: int
+    num_questions: int
+
+
+@dataclass(frozen=True)
+class RewardsEarned(BookEvent):
+    """
+    The current question was answered, so the hider is owed its rewards.
+    """
+
+
+@dataclass(frozen=True)
+class RewardTaken(BookEvent):
+    """
+    The hider was given some of the rewards owed for the current question, all at once.
+    """
+
+    count: int = 1
+
+
+@dataclass(frozen=True)
+class QuestionClosed(BookEvent):
+    """
+    The hider has received every reward for the current question.
+    """
+
+
+def _event_types(base: type[GameEvent]) -> Iterator[type[GameEvent]]:
+    for subclass in base.__subclasses__():
+        yield subclass
+        yield from _event_types(subclass)
+
+
+EVENT_TYPES: dict[str, type[GameEvent]] = {
+    event_type.__name__: event_type for event_type in _event_types(GameEvent)
+}
+
+
+def encode_question(question: QuestionInstance) -> dict[str, Any]:
+    """
+    :param question: Question to encode.
+    :type question: QuestionInstance
+    :return: The question as plain data.
+    :rtype: dict[str, Any]
+    """
+    return {"type": type(question).__name__, "fields": question.get_fields()}
+
+
+def decode_question(
+    data: dict[str, Any], interned: dict[str, QuestionInstance]
+) -> QuestionInstance:
+    """
+    Rebuilds a question without calling its constructor. Equal encodings decode to the same
+    object, so that a question keeps its identity across a snapshot and the events after it.
+
+    :param data: Question as returned by encode_question.
+    :type data: dict[str, Any]
+    :param interned: Questions already decoded for this game, keyed by their encoding.
+    :type interned: dict[str, QuestionInstance]
+    :return: The question.
+    :rtype: QuestionInstance
+    """
+    encoded = json.dumps(data, sort_keys=True)
+    question = interned.get(encoded)
+    if question is None:
+        question_type = getattr(questions, data["type"])
+        question = question_type.__new__(question_type)
+        vars(question).update(data["fields"])
+        interned[encoded] = question
+    return question
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, Condition):
+        return value.name
+    if isinstance(value, QuestionInstance):
+        return encode_question(value)
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+def _decode_value(field_type: Any, value: Any, interned: dict[str, QuestionInstance]) -> Any:
+    if field_type is Condition:
+        return Condition[value]
+    if field_type is QuestionInstance:
+        return decode_question(value, interned)
+    if typing.get_origin(field_type) is tuple:
+        return tuple(value)
+    return value
+
+
+def encode_event(event: GameEvent) -> dict[str, Any]:
+    """
+    :param event: Event to encode.
+    :type event: GameEvent
+    :return: The event as plain data.
+    :rtype: dict[str, Any]
+    """
+    record = {"type": type(event).__name__}
+    for field in dataclasses.fields(event):
+        record[field.name] = _encode_value(getattr(event, field.name))
+    return record
+
+
+def decode_event(
+    record: dict[str, Any], interned: dict[str, QuestionInstance]
+) -> GameEvent:
+    """
+    :param record: Event as returned by encode_event. Extra keys are ignored, and fields added to
+        an event since the record was written take their defaults.
+    :type record: dict[str, Any]
+    :param interned: Questions already decoded for this game, keyed by their encoding.
+    :type interned: dict[str, QuestionInstance]
+    :return: The event.
+    :rtype: GameEvent
+    """
+    event_type = EVENT_TYPES[record["type"]]
+    return event_type(
+        **{
+            field.name: _decode_value(field.type, record[field.name], interned)
+            for field in dataclasses.fields(event_type)
+            if field.name in record
+        }
+    )
+
+
+class EventLog:
+    """
+    An append-only log of one game's events, stored as one JSON record per line in
+    <path>.events. Every snapshot_interval events the game writes a snapshot of itself, which
+    is stored in <path>.snapshot in the binary encoding from hide_and_seek_serialization, along
+    with the position in the log that it was taken at. The
+    first snapshot of the game is also kept in <path>.initial, so the game can be replayed from
+    the start.
+
+    Loading a log reads the latest snapshot and only the events after it, so it takes the same
+    time however long the game has been running. Without a path, the log is kept in memory.
+    """
+
+    def __init__(self, path: str | None = None, snapshot_interval: int = 256):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.seq = 0
+        self.snapshot: dict[str, Any] | None = None
+        self.initial: dict[str, Any] | None = None
+        self.tail: list[dict[str, Any]] = []
+        self.records: list[tuple[int, float, GameEvent]] = []
+        self._snapshot_seq = 0
+        self._offset = 0
+        self.file = None
+        if path is not None:
+            self._load()
+            self.file = open(path + ".events", "ab")
+
+    def _load(self):
+        """
+        Reads the latest snapshot and the events after it. A partially written final event, left
+        by a crash, is cut off.
+        """
+        assert self.path is not None
+        for suffix, attribute in ((".snapshot", "snapshot"), (".initial", "initial")):
+            if os.path.exists(self.path + suffix):
+                with open(self.path + suffix, "rb") as file:
+                    data = file.read()
+                seq, offset = _SNAPSHOT_POSITION.unpack_from(data)
+                setattr(self, attribute, decode_snapshot(data[_SNAPSHOT_POSITION.size :]))
+                if attribute == "snapshot":
+                    self.seq = self._snapshot_seq = seq
+                    self._offset = offset
+
+        events_path = self.path + ".events"
+        if not os.path.exists(events_path):
+            return
+        with open(events_path, "rb") as file:
+            file.seek(self._offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.tail.append(record)
+                self.seq = record["seq"]
+                self._offset += len(line)
+        if self._offset != os.path.getsize(events_path):
+            with open(events_path, "r+b") as file:
+                file.truncate(self._offset)
+
+    def append(self, time: float, event: GameEvent):
+        """
+        Adds an event to the end of the log.
+
+        :param time: The epoch time that the event happened.
+        :type time: float
+        :param event: Event to add.
+        :type event: GameEvent
+        """
+        self.seq += 1
+        if self.path is None:
+            # Events kept in memory are only encoded if they are read back
+            self.records.append((self.seq, time, event))
+            return
+        assert self.file is not None
+        record = {"seq": self.seq, "time": time, **encode_event(event)}
+        self.tail.append(record)
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        self._offset += len(line)
+        self.file.write(line)
+        self.file.flush()
+
+    def needs_snapshot(self) -> bool:
+        """
+        :return: Whether enough events have been added since the latest snapshot that another
+            should be written.
+        :rtype: bool
+        """
+        return self.seq - self._snapshot_seq >= self.snapshot_interval
+
+    def write_snapshot(self, state: dict[str, Any]):
+        """
+        Stores a snapshot of the game as it is after the latest event. The snapshot is written
+        alongside the old one and swapped in atomically.
+
+        :param state: The game as plain data.
+        :type state: dict[str, Any]
+        """
+        self.snapshot = state
+        self.tail = []
+        self._snapshot_seq = self.seq
+        if self.initial is None:
+            self.initial = state
+        if self.path is None:
+            return
+
+        assert self.file is not None
+        os.fsync(self.file.fileno())
+        data = _SNAPSHOT_POSITION.pack(self.seq, self._offset) + encode_snapshot(state)
+        suffixes = [".snapshot"]
+        if not os.path.exists(self.path + ".initial"):
+            suffixes.append(".initial")
+        for suffix in suffixes:
+            temp_path = self.path + suffix + ".tmp"
+            with open(temp_path, "wb") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path + suffix)
+
+    def read_tail(self) -> Iterator[dict[str, Any]]:
+        """
+        :return: Every event after the latest snapshot as a record.
+        :rtype: Iterator[dict[str, Any]]
+        """
+        yield from self.tail
+        for seq, time, event in self.records:
+            if seq > self._snapshot_seq:
+                yield {"seq": seq, "time": time, **encode_event(event)}
+
+    def read_all(self) -> Iterator[dict[str, Any]]:
+        """
+        :return: Every event in the log as a record, from the start of the game.
+        :rtype: Iterator[dict[str, Any]]
+        """
+        if self.path is None:
+            for seq, time, event in self.records:
+                yield {"seq": seq, "time": time, **encode_event(event)}
+            return
+
+        if self.file is not None:
+            self.file.flush()
+        with open(self.path + ".events", "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                yield json.loads(line)
+
+    def close(self):
+        """
+        Writes every event to the disk and closes the log.
+        """
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+    def move(self, directory: str):
+        """
+        Closes the log and moves its files into another directory, for example once the game
+        has ended.
+
+        :param directory: Directory to move the files to.
+        :type directory: str
+        """
+        self.close()
+        if self.path is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        name = os.path.basename(self.path)
+        for suffix in (".events", ".snapshot", ".initial"):
+            if os.path.exists(self.path + suffix):
+                os.replace(self.path + suffix, os.path.join(directory, name + suffix))
+        self.path = os.path.join(directory, name)
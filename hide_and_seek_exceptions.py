@@ -11,7 +11,8 @@ class JetLagException(ABC, Exception):
 
 class QuestionActiveException(JetLagException):
     """
-    This is the exception that is raised if the seekers ask a question while one is already active.
+    This is the exception that is raised if the seekers ask a question while one is already active,
+    or while the hider is still being given the rewards for the last one.
     """
 
 class HandSizeExceededException(JetLagException):
@@ -24,3 +25,51 @@ class CardNotPlayableException(JetLagException):
     This is the exception that is raised if a card is played without satisfying the necessary
     conditions.
     """
+
+class GameNotFoundException(JetLagException):
+    """
+    This is the exception that is raised if a command is used where no game is being played.
+    """
+
+class GameAlreadyRunningException(JetLagException):
+    """
+    This is the exception that is raised if a game is started where one is already being played.
+    """
+
+class SnapshotFormatException(JetLagException):
+    """
+    This is the exception that is raised if a stored game snapshot cannot be read or written.
+    """
+
+class UnknownQuestionException(JetLagException):
+    """
+    This is the exception that is raised if a question is not in the question catalog.
+    """
+
+class BroadcastException(JetLagException):
+    """
+    This is the exception that is raised if a message could not be sent to some of its
+    recipients. failures holds each of those recipients with the error sending to it.
+    """
+
+    def __init__(self, failures: list):
+        super().__init__(f"Sending failed for {len(failures)} recipient(s)")
+        self.failures = failures
+
+class OutboundQueueFullException(JetLagException):
+    """
+    This is the exception that is raised if a message is queued for sending while the outbound
+    queue is full, or that a queued message fails with if a more urgent one pushes it out.
+    """
+
+class SelectionNotPendingException(JetLagException):
+    """
+    This is the exception that is raised if the hider selects cards for a selection that has
+    already been made or has expired.
+    """
+
+class InvalidSelectionException(JetLagException):
+    """
+    This is the exception that is raised if the hider selects the wrong number of cards, or
+    cards that cannot be selected.
+    """
@@ -1,19 +1,44 @@
 import asyncio
+import logging
+import re
 import time
 import os
 from dataclasses import dataclass
 import configparser
+from typing import Any, Sequence
 
 import disnake
-from disnake.ext import commands, tasks
+from disnake.ext import commands
 from dotenv import load_dotenv
 
-from hide_and_seek_game_state import GameState
-from hide_and_seek_interfaces import Card, Curse, Frontend, Question, QuestionInstance
-from hide_and_seek_questions import MatchingQuestion
+from broadcast import broadcast
+from card_embeds import CardEmbedCache
+from channel_resolver import ChannelResolver
+from hide_and_seek_exceptions import (
+    BroadcastException,
+    GameNotFoundException,
+    InvalidSelectionException,
+    OutboundQueueFullException,
+    SelectionNotPendingException,
+)
+from hide_and_seek_interfaces import (
+    Card,
+    Curse,
+    Frontend,
+    PendingSelection,
+    Question,
+    QuestionInstance,
+)
+from hide_and_seek_questions import MatchingQuestion, QuestionManager
+from hide_and_seek_registry import GameRegistry
+from outbound_queue import OutboundQueue, Priority
 from task_scheduler import TaskScheduler
+from scheduler_journal import SchedulerJournal
+from timer_queues import create_timer_queue
 
 
+logger = logging.getLogger(__name__)
+
 config = configparser.ConfigParser()
 config.read("hide_and_seek.cfg")
 
@@ -22,66 +47,232 @@ TOKEN = os.getenv("TOKEN")
 
 client = commands.InteractionBot()
 
+# Whoever a message can be sent to: a user by ID, or a channel
+Recipient = int | disnake.abc.Messageable
 
-class DiscordFrontend(Frontend):
-    async def select_cards(
-        self, cards: list[Card], num_select: int, reason: str
-    ) -> set[Card]:
-        assert client_data.hider_channel is not None
 
-        view = disnake.ui.View(timeout=300)
+async def fetch_dm(user_id: int) -> disnake.DMChannel:
+    return await (await client.fetch_user(user_id)).create_dm()
+
+
+# Shared by every game, so each user's DM channel is only fetched once
+channel_resolver: ChannelResolver[disnake.abc.Messageable] = ChannelResolver(
+    fetch_dm,
+    config.getint("MASTER", "CHANNEL_CACHE_TTL"),
+    cache_path=config.get("MASTER", "CHANNEL_CACHE"),
+    from_channel_id=lambda channel_id: client.get_partial_messageable(
+        channel_id, type=disnake.ChannelType.private
+    ),
+)
+
+
+async def deliver(recipient: Recipient, content: str | None, kwargs: dict[str, Any]) -> Any:
+    """
+    Sends a message from the outbound queue to a user, by ID, or to a channel. A user's channel
+    is forgotten if sending to it fails, so that it is looked up again next time.
+    """
+    if not isinstance(recipient, int):
+        return await recipient.send(content, **kwargs)
+    channel = await channel_resolver.resolve(recipient)
+    try:
+        return await channel.send(content, **kwargs)
+    except disnake.HTTPException:
+        channel_resolver.invalidate(recipient)
+        raise
+
+
+# Every message to Discord goes through here, so the game never waits on the network
+outbox = OutboundQueue(deliver)
+
+card_embeds = CardEmbedCache()
+
+# Discord allows this many embeds in a message
+MAX_EMBEDS = 10
+
+# Custom IDs of card selections start with this, followed by the game's key and selection's ID
+SELECTION_PREFIX = "selection"
+
 
-        async def card_callback(inter: disnake.MessageInteraction):
-            view.stop()
+def selection_custom_id(key: str, selection_id: int) -> str:
+    return f"{SELECTION_PREFIX}:{key}:{selection_id}"
 
-        item = disnake.ui.StringSelect(
+
+def parse_selection_custom_id(custom_id: str) -> tuple[str, int] | None:
+    """
+    :return: The game key and selection ID of a card selection's custom ID, or None if the custom
+        ID is not a card selection's.
+    :rtype: tuple[str, int] | None
+    """
+    prefix, _, rest = custom_id.partition(":")
+    key, _, selection_id = rest.rpartition(":")
+    if prefix != SELECTION_PREFIX or not key or not selection_id.isdigit():
+        return None
+    return key, int(selection_id)
+
+
+class DiscordFrontend(Frontend):
+    """
+    Reports a game to its players on Discord. Players are messaged by user ID, with their DM
+    channels looked up through a shared ChannelResolver, and spectators in guild channels.
+    Messages are handed to the outbound queue rather than sent, so there can be any number of
+    seekers and spectators without the game waiting on any of them. A recipient that cannot be
+    sent to is logged and skipped, rather than stopping the game, and broadcast collects which
+    of its recipients failed.
+
+    Card selections are sent as select menus whose custom ID names the game and selection, and
+    on_selection passes the hider's choice back to the game, so nothing waits on the hider.
+    """
+
+    # Discord allows this many options in a select menu
+    max_selection_size = 25
+
+    def __init__(
+        self,
+        outbox: OutboundQueue,
+        key: str,
+        hider_id: int,
+        seeker_ids: Sequence[int],
+        spectator_channels: Sequence[disnake.abc.Messageable] = (),
+    ):
+        self.outbox = outbox
+        self.key = key
+        self.hider_id = hider_id
+        self.seeker_ids = list(seeker_ids)
+        self.spectator_channels = list(spectator_channels)
+        # Kept so that broadcasts being followed are not garbage collected
+        self._broadcasts: set[asyncio.Task] = set()
+
+    def everyone(self) -> list[Recipient]:
+        return [self.hider_id, *self.seeker_ids, *self.spectator_channels]
+
+    def send(
+        self,
+        recipient: Recipient,
+        content: str | None = None,
+        priority: Priority = Priority.ANNOUNCEMENT,
+        **kwargs,
+    ) -> asyncio.Future | None:
+        """
+        Queues a message to a user, by ID, or to a channel. If the queue is full, the message is
+        logged and dropped.
+
+        :return: Resolves once the message is sent, or None if it was dropped.
+        :rtype: asyncio.Future | None
+        """
+        try:
+            return self.outbox.enqueue(recipient, content, priority, **kwargs)
+        except OutboundQueueFullException:
+            logger.warning("Outbound queue is full, dropping message to %s", recipient)
+            return None
+
+    def broadcast(
+        self,
+        recipients: Sequence[Recipient],
+        content: str | None,
+        priority: Priority = Priority.ANNOUNCEMENT,
+        **kwargs,
+    ) -> asyncio.Task:
+        """
+        Queues a message to every recipient, and follows their deliveries in the background. Once
+        they have all finished, the recipients it could not be delivered to are logged together.
+
+        :return: Resolves to the BroadcastResult once every delivery has finished, whose
+            raise_for_failures raises BroadcastException listing the failed recipients. The game
+            does not have to wait on it.
+        :rtype: asyncio.Task
+        """
+        deliveries = []
+        for recipient in dict.fromkeys(recipients):
+            try:
+                delivery = self.outbox.enqueue(recipient, content, priority, **kwargs)
+            except OutboundQueueFullException as error:
+                delivery = asyncio.get_running_loop().create_future()
+                delivery.set_exception(error)
+            deliveries.append((recipient, delivery))
+        task = asyncio.create_task(broadcast(deliveries))
+        self._broadcasts.add(task)
+        task.add_done_callback(self._broadcast_finished)
+        return task
+
+    def _broadcast_finished(self, task: asyncio.Task):
+        self._broadcasts.discard(task)
+        if task.cancelled():
+            return
+        try:
+            task.result().raise_for_failures()
+        except BroadcastException as error:
+            logger.warning(
+                "%s: %s",
+                error,
+                ", ".join(f"{recipient} ({failure!r})" for recipient, failure in error.failures),
+            )
+
+    async def request_selection(self, selection: PendingSelection):
+        groups = selection.get_groups()
+        num_select = selection.get_num_chosen()
+        if len(groups) == 1:
+            labels = [card.get_card_name() for card in selection.cards]
+            prompt = f"Select {num_select} cards to {selection.reason}"
+        else:
+            # Discord cannot limit choices per group, so the game checks them when they arrive
+            labels = [
+                f"Set {number}: {selection.cards[i].get_card_name()}"
+                for number, group in enumerate(groups, 1)
+                for i in group
+            ]
+            prompt = (
+                f"Select {selection.num_select} cards from each of these {len(groups)} sets "
+                f"to {selection.reason}"
+            )
+        menu = disnake.ui.StringSelect(
+            custom_id=selection_custom_id(self.key, selection.selection_id),
             placeholder="Click to choose cards:",
             min_values=num_select,
             max_values=num_select,
             options=[
-                disnake.SelectOption(label=y.get_card_name(), value=str(x))
-                for x, y in enumerate(cards)
+                disnake.SelectOption(label=label, value=str(i)) for i, label in enumerate(labels)
             ],
         )
-        item.callback = card_callback
-
-        view.add_item(item)
-
-        await client_data.hider_channel.send(
-            f"Select {num_select} cards to {reason}.", view=view
+        curses = card_embeds.get_many(
+            card for card in selection.cards if isinstance(card, Curse)
+        )
+        self.send(
+            self.hider_id,
+            f"{prompt} by <t:{selection.deadline}:t>.",
+            Priority.INTERACTION,
+            components=menu,
+            embeds=curses[:MAX_EMBEDS],
+        )
+        # The rest of the curses follow the menu, as the hider's messages are sent in order
+        for start in range(MAX_EMBEDS, len(curses), MAX_EMBEDS):
+            self.send(
+                self.hider_id,
+                None,
+                Priority.INTERACTION,
+                embeds=curses[start : start + MAX_EMBEDS],
+            )
+
+    async def selection_expired(self, selection: PendingSelection, chosen: list[Card]):
+        names = ", ".join(card.get_card_name() for card in chosen) or "nothing"
+        self.send(
+            self.hider_id,
+            f"Time ran out to select cards to {selection.reason}, so {names} was chosen.",
+            Priority.INTERACTION,
         )
-
-        if await view.wait():
-            return set([cards[int(x)] for x in item.values])
-        else:
-            # TODO Implement
-            raise NotImplementedError()
 
     async def announce_round_start(self, hiding_time_end: int):
-        assert client_data.hider_channel is not None
-        assert client_data.seeker_channel is not None
-        await client_data.hider_channel.send(
-            f"Round started! Hiding time ends <t:{hiding_time_end}:R>."
-        )
-        await client_data.seeker_channel.send(
-            f"Round started! Hiding time ends <t:{hiding_time_end}:R>."
+        self.broadcast(
+            self.everyone(), f"Round started! Hiding time ends <t:{hiding_time_end}:R>."
         )
 
     async def announce_seekers_released(self):
-        assert client_data.hider_channel is not None
-        assert client_data.seeker_channel is not None
-        await client_data.hider_channel.send(
-            "Hiding time over! Seekers are free to move."
-        )
-        await client_data.seeker_channel.send(
-            "Hiding time over! Seekers are free to move."
-        )
+        self.broadcast(self.everyone(), "Hiding time over! Seekers are free to move.")
 
     async def pose_question(self, question: QuestionInstance):
-        assert client_data.hider_channel is not None
-
-        await client_data.hider_channel.send(
-            f"Please answer the following question: {question.get_full_question()}. Use /answer to answer."
+        self.send(
+            self.hider_id,
+            f"Please answer the following question: {question.get_full_question()}. Use /answer to answer.",
+            Priority.QUESTION,
         )
 
     async def question_time_expired(self):
@@ -92,26 +283,27 @@ class DiscordFrontend(Frontend):
     ):
         assert penalty is None  # TODO: But what if it's not
 
-        assert client_data.seeker_channel is not None
-
-        await client_data.seeker_channel.send(
-            f"The answer to {question.get_full_question()} is '{answer}'."
+        self.broadcast(
+            [*self.seeker_ids, *self.spectator_channels],
+            f"The answer to {question.get_full_question()} is '{answer}'.",
+            Priority.QUESTION,
         )
 
     async def announce_next_player(
         self, next_player: str, last_result: int | None = None
     ):
         assert last_result is None  # TODO: But what if it's not
-        assert client_data.hider_channel is not None
-        assert client_data.seeker_channel is not None
-        await client_data.hider_channel.send(f"The next player will be {next_player}.")
-        await client_data.seeker_channel.send(f"The next player will be {next_player}.")
+        self.broadcast(self.everyone(), f"The next player will be {next_player}.")
 
     async def announce_seeking_time_expired(self):
         pass  # TODO: Implement
 
     async def announce_curse(self, card: Curse):
-        pass  # TODO: Implement
+        self.broadcast(
+            [*self.seeker_ids, *self.spectator_channels],
+            "The hider has played a curse!",
+            embed=card_embeds.get(card),
+        )
 
 
 # TODO: Call ask_question
@@ -123,10 +315,34 @@ class DiscordFrontend(Frontend):
 
 @dataclass
 class ClientData:
-    hider_channel: disnake.DMChannel | None = None
-    seeker_channel: disnake.DMChannel | None = None
-    game_state: GameState | None = None
+    registry: GameRegistry | None = None
     scheduler: TaskScheduler | None = None
+    scheduler_task: asyncio.Task | None = None
+
+
+def game_key(inter: disnake.Interaction) -> str:
+    """
+    Games are keyed by the guild they are played in, or by the channel for DMs. Keys are strings
+    so that they match the keys of games restored from storage.
+    """
+    return str(inter.guild_id if inter.guild_id is not None else inter.channel_id)
+
+
+async def restore_frontend(key: str, metadata: dict) -> DiscordFrontend:
+    """
+    Rebuilds the frontend of a game restored from storage, from the players it was started with.
+    Games stored before there could be several seekers have a single seeker_id.
+    """
+    seeker_ids = metadata.get("seeker_ids", [metadata.get("seeker_id")])
+    spectator_channels = []
+    for channel_id in metadata.get("spectator_channel_ids", []):
+        channel = client.get_channel(channel_id)
+        if channel is None:
+            channel = await client.fetch_channel(channel_id)
+        spectator_channels.append(channel)
+    return DiscordFrontend(
+        outbox, key, metadata["hider_id"], seeker_ids, spectator_channels
+    )
 
 
 # async def autocomp_order_sets(
@@ -211,12 +427,6 @@ class ClientData:
 #     await cacheContractItems(20)
 
 
-@tasks.loop(seconds=1)
-async def update():
-    assert client_data.scheduler is not None
-    await client_data.scheduler.check_tasks()
-
-
 # async def clearDMs():
 #     assert clientData.dmchannel is not None
 #     async for msg in clientData.dmchannel.history(limit=None):
@@ -226,22 +436,24 @@ async def update():
 
 @client.event
 async def on_ready():
-    user = await client.fetch_user(560022746973601792)
-    client_data.hider_channel = await user.create_dm()
-    client_data.seeker_channel = await (
-        await client.fetch_user(852468100503044096)
-    ).create_dm()
-
     print("Connected to Discord")
 
-    client_data.scheduler = TaskScheduler()
+    if client_data.scheduler is not None:
+        # on_ready fires again after every reconnect
+        return
 
-    client_data.game_state = GameState(
-        int(time.time()) + 5, ["Ben", "Adam"], DiscordFrontend(), client_data.scheduler
+    channel_resolver.load()
+    outbox.start()
+    client_data.scheduler = TaskScheduler(
+        queue=create_timer_queue(config.get("MASTER", "SCHEDULER_BACKEND")),
+        journal=SchedulerJournal(config.get("MASTER", "SCHEDULER_JOURNAL")),
+    )
+    client_data.registry = GameRegistry(
+        client_data.scheduler, config.get("MASTER", "GAME_STORAGE")
     )
+    await client_data.registry.restore_games(restore_frontend)
 
-    # await client_data.game_state.answered_question("Yes")
-    update.start()
+    client_data.scheduler_task = asyncio.create_task(client_data.scheduler.run())
 
     await asyncio.sleep(15)
 
@@ -327,14 +539,97 @@ async def on_ready():
 
 
 client_data = ClientData()
+question_manager = QuestionManager()
 
-@client.slash_command()
+
+@client.slash_command(description="Starts a game in this server.")
+async def start_game(
+    ctx: disnake.ApplicationCommandInteraction,
+    hider: disnake.User,
+    seeker: disnake.User,
+    players: str,
+    other_seekers: str = commands.Param(
+        default="", description="Mentions of any other seekers"
+    ),
+    spectators: disnake.TextChannel | None = commands.Param(
+        default=None, description="Channel that follows the game"
+    ),
+):
+    assert client_data.registry is not None
+    await ctx.response.defer()
+    seeker_ids = list(
+        dict.fromkeys([seeker.id, *(int(x) for x in re.findall(r"\d{15,20}", other_seekers))])
+    )
+    spectator_channels = [] if spectators is None else [spectators]
+    key = game_key(ctx)
+    frontend = DiscordFrontend(outbox, key, hider.id, seeker_ids, spectator_channels)
+    client_data.registry.create_game(
+        key,
+        int(time.time()) + 5,
+        [x.strip() for x in players.split(",")],
+        frontend,
+        {
+            "hider_id": hider.id,
+            "seeker_ids": seeker_ids,
+            "spectator_channel_ids": [channel.id for channel in spectator_channels],
+        },
+    )
+    await ctx.followup.send("Game started.")
+
+
+def question_param(question_type: type[Question], description: str) -> Any:
+    """
+    Builds a slash command option for choosing a question of a type, from the catalog's prebuilt
+    choices. If the type has more questions than Discord allows choices for, they are offered
+    through autocomplete instead.
+    """
+    if question_manager.get_num_choice_pages(question_type) == 1:
+        return commands.Param(
+            description=description, choices=question_manager.get_choices(question_type)
+        )
+
+    async def autocomplete(inter: disnake.ApplicationCommandInteraction, user_input: str):
+        return question_manager.autocomplete(question_type, user_input)
+
+    return commands.Param(description=description, autocomplete=autocomplete)
+
+
+@client.slash_command(description="Asks the hider a matching question.")
 async def ask_matching(
     ctx: disnake.ApplicationCommandInteraction,
-    question: MatchingQuestion = commands.Param(choices=client_data.game_state.get_matching_question()),
+    question: str = question_param(MatchingQuestion, "What to match"),
+    closest: str = commands.Param(description="The seekers' closest one"),
 ):
-    assert client_data.game_state is not None
-    await client_data.game_state.ask_question(question)
+    assert client_data.registry is not None
+    await client_data.registry.get_game(game_key(ctx)).ask_question(
+        question_manager.get_question(int(question)).to_instance(closest)
+    )
+    await ctx.response.send_message("Question asked.")
+
+
+@client.listen("on_dropdown")
+async def on_selection(inter: disnake.MessageInteraction):
+    """
+    Resumes a game with the hider's choice of cards. The game and selection are found from the
+    menu's custom ID, so this works for menus sent before a restart too.
+    """
+    parsed = parse_selection_custom_id(inter.component.custom_id or "")
+    if parsed is None:
+        return
+    key, selection_id = parsed
+    assert client_data.registry is not None
+    try:
+        game = client_data.registry.get_game(key)
+        await game.resolve_selection(selection_id, [int(value) for value in inter.values])
+    except (GameNotFoundException, SelectionNotPendingException):
+        await inter.response.send_message("This selection has already been made or has expired.")
+        return
+    except InvalidSelectionException:
+        await inter.response.send_message(
+            "Those cards cannot be selected. Choose the right number from each set."
+        )
+        return
+    await inter.response.edit_message(content="Selection made.", components=None)
 
 
 client.run(TOKEN)
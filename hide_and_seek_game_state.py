@@ -6,20 +6,28 @@ the player's actual locations) about the game and enforcing as many of the rules
 rules that are enforced by the system are in enforceable_rules.txt
 """
 
-import time
 import enum
-import random
+from array import array
+from collections import Counter
 import configparser
+from typing import Any, Callable, Iterator, Sequence
+
+import hide_and_seek_events as events
 
 import hide_and_seek_cards as cards
-from task_scheduler import TaskScheduler
+from hide_and_seek_events import EventLog
+from task_scheduler import TaskScheduler, ScheduledTask, SchedulerScope
 from hide_and_seek_conditions import Condition, ConditionManager
+from hide_and_seek_questions import QUESTIONS, get_question_id
+from hide_and_seek_rng import RandomStream, new_seed
 from hide_and_seek_exceptions import (
     CardNotPlayableException,
     QuestionActiveException,
     HandSizeExceededException,
+    InvalidSelectionException,
+    SelectionNotPendingException,
 )
-from hide_and_seek_interfaces import Question, Card, QuestionInstance
+from hide_and_seek_interfaces import Question, Card, QuestionInstance, PendingSelection
 from hide_and_seek_interfaces import Frontend
 
 par = configparser.ConfigParser()
@@ -29,63 +37,32 @@ HIDING_TIME = par.getint("MASTER", "HIDING_TIME")
 PLANNING_TIME = par.getint("MASTER", "PLANNING_TIME")
 MAX_SEEKING_TIME = par.getint("MASTER", "MAX_SEEKING_TIME")
 DEFAULT_MAX_HAND_SIZE = par.getint("MASTER", "DEFAULT_MAX_HAND_SIZE")
+SELECTION_TIME = par.getint("MASTER", "SELECTION_TIME")
 
 
 class HiderDeck:
     """
     This is a class to keep track of which cards are in the discard, which cards are in the hand
     and which can still be drawn.
+
+    Cards are shared flyweights from the registry in hide_and_seek_cards, and the deck and
+    discard pile are byte arrays of card IDs, with a new deck copied from the registry's
+    template. Cards are drawn by swapping a random position with the end of the
+    deck and popping it, so drawing is O(1) and reshuffling the discard pile back in is O(n). The
+    hand keeps a count of each card kind it holds, so checking whether a card is in it is O(1).
     """
 
+    card_kinds = cards.CARDS
+    card_ids = cards.CARD_IDS
+
     def __init__(self, game_state, frontend: Frontend):
         self.hand: list[Card] = []
-        self.deck: list[Card] = []
-
         self.max_hand_size = DEFAULT_MAX_HAND_SIZE
-
-        starting_deck: list[tuple[Card, int]] = [
-            (cards.TimeBonus(3, game_state), 25),
-            (cards.TimeBonus(6, game_state), 15),
-            (cards.TimeBonus(9, game_state), 10),
-            (cards.TimeBonus(12, game_state), 3),
-            (cards.TimeBonus(18, game_state), 2),
-            (cards.Randomise(game_state), 4),
-            (cards.Veto(game_state), 4),
-            (cards.Duplicate(game_state), 2),
-            (cards.DiscardDraw(1, 2, game_state), 4),
-            (cards.DiscardDraw(2, 3, game_state), 4),
-            (cards.DrawExpand(1, 1, game_state), 2),
-            (cards.Zoologist(game_state), 1),
-            (cards.UnguidedTourist(game_state), 1),
-            (cards.EndlessTumble(game_state), 1),
-            (cards.Hangman(game_state), 1),
-            (cards.Chalice(game_state), 1),
-            (cards.MediocreTravelAgent(game_state), 1),
-            (cards.LuxuryCar(game_state), 1),
-            (cards.UTurn(game_state), 1),
-            (cards.BridgeTroll(game_state), 1),
-            (cards.Water(game_state), 1),
-            (cards.JammedDoor(game_state), 1),
-            (cards.Cairn(game_state), 1),
-            (cards.UrbanExplorer(game_state), 1),
-            (cards.DistantCuisine(game_state), 1),
-            (cards.RightTurn(game_state), 1),
-            (cards.Labyrinth(game_state), 1),
-            (cards.BirdGuide(game_state), 1),
-            (cards.DrainedBrain(game_state), 1),
-            (cards.Ransom(game_state), 1),
-            (cards.GamblersFeet(game_state), 1),
-            (cards.ProsperousHome(game_state), 1),
-            (cards.Void(game_state), 1),
-            (cards.ExpressTrain(game_state), 1),
-            (cards.ZippedLip(game_state), 1),
-            (cards.PlaguedWord(game_state), 1),
-        ]
-
-        for card, num in starting_deck:
-            for i in range(num):
-                self.deck.append(card)
-        self.discard_pile: list[Card] = []
+        self.deck = cards.DECK_TEMPLATE[:]
+        self.discard_pile = array("B")
+        self.hand_counts = [0] * len(self.card_kinds)
+        self.drawn: list[Card] = []
+        self.game_state = game_state
         self.frontend = frontend
 
     def count_time_bonuses(self) -> int:
@@ -104,26 +81,55 @@ class HiderDeck:
         """
         return len(self.hand)
 
-    async def reward(self, draw_num: int, keep_num: int):
+    async def reward(self, draw_num: int, keep_num: int, sets: int = 1):
         """
-        Function that handles the hider drawing x cards and keeping y of them
+        Function that handles the hider drawing x cards and keeping y of them, for one or more
+        rewards at once. Every set of cards is drawn up front, and the hider is asked which to
+        keep from each set in a single selection. This does not wait for them, and keep is called
+        once they have chosen. If fewer than draw_num cards are left, which reward_sets only
+        allows for a single set, every card left is drawn.
         """
-        if len(self.deck) <= draw_num:
-            while len(self.discard_pile) > 0:
-                self.deck.append(self.discard_pile.pop(0))
-        draw = [
-            self.deck.pop(random.randint(0, len(self.deck) - 1))
-            for x in range(draw_num)
-        ]
+        draw_num = min(draw_num, len(self.deck) + len(self.discard_pile))
+        if len(self.deck) <= draw_num * sets:
+            self.game_state.emit(events.DeckReshuffled())
+        rng = self.game_state.random_stream("deck")
+        positions = tuple(
+            rng.randint(0, len(self.deck) - 1 - x) for x in range(draw_num * sets)
+        )
+        self.game_state.emit(events.CardsDrawn(positions))
+        await self.game_state.request_selection(
+            self.drawn, keep_num, "keep", group_sizes=(draw_num,) * sets
+        )
 
-        keeping: set[Card] = await self.frontend.select_cards(draw, keep_num, "keep")
-        assert len(keeping) <= keep_num
+    def reward_sets(self, draw_num: int, wanted: int) -> int:
+        """
+        Works out how many rewards can be drawn at once. That is no more than the deck and the
+        discard pile hold, or than the frontend can offer in one selection, but at least one
+        while any cards are left, even if fewer than draw_num.
+
+        :param draw_num: Number of cards each reward draws
+        :type draw_num: int
+        :param wanted: Number of rewards owed
+        :type wanted: int
+        :return: Number of rewards to draw now, or 0 if there are no cards left to draw
+        :rtype: int
+        """
+        available = len(self.deck) + len(self.discard_pile)
+        if available == 0:
+            return 0
+        sets = min(wanted, available // draw_num)
+        if self.frontend.max_selection_size is not None:
+            sets = min(sets, self.frontend.max_selection_size // draw_num)
+        return max(sets, 1)
+
+    def keep(self, kept: Sequence[int]):
+        """
+        Adds some of the drawn cards to the hider's hand and discards the rest
 
-        for i in range(draw_num):
-            if i in keeping:
-                self.hand.append(draw[i])
-            else:
-                self.discard_pile.append(draw[i])
+        :param kept: Indices of the drawn cards to keep
+        :type kept: Sequence[int]
+        """
+        self.game_state.emit(events.CardsKept(tuple(sorted(kept))))
 
     async def play(self, card: Card):
         """
@@ -134,18 +140,16 @@ class HiderDeck:
         :type card: Card
         """
 
-        if not card in self.hand:
+        if not self.in_hand(card):
             raise CardNotPlayableException()
 
-        await card.play()
-        self.hand.remove(card)
-
-        self.discard_pile.append(card)
+        await card.play(self.game_state)
+        self.game_state.emit(events.CardPlayed(self.hand.index(card)))
 
-        if not self.is_legal_hand() and not card.game_state.conditions.has_condition(
+        if not self.is_legal_hand() and not self.game_state.conditions.has_condition(
             Condition.HAND_LOCK
         ):
-            card.game_state.conditions.add_condition(Condition.HAND_LOCK)
+            self.game_state.conditions.add_condition(Condition.HAND_LOCK)
 
     def discard(self, card: Card):
         """
@@ -154,32 +158,154 @@ class HiderDeck:
         :param card: Card to discard
         :type card: Card
         """
-        self.hand.remove(card)
-        card.discard()
-        self.discard_pile.append(card)
+        card.discard(self.game_state)
+        self.game_state.emit(events.CardDiscarded(self.hand.index(card)))
+
+        if self.is_legal_hand() and self.game_state.conditions.has_condition(
+            Condition.HAND_LOCK
+        ):
+            self.game_state.conditions.remove_condition(Condition.HAND_LOCK)
 
     async def draw(self):
         """
         Draws a card and adds it to the hider's hand
         """
-        self.hand.append(self.deck.pop(random.randint(0, len(self.deck) - 1)))
+        rng = self.game_state.random_stream("deck")
+        self.game_state.emit(events.CardDrawn(rng.randint(0, len(self.deck) - 1)))
 
-    async def is_legal_hand(self):
+    def copy_card(self, card: Card):
+        """
+        Adds another copy of a card in the hider's hand to the hand
+
+        :param card: Card to copy
+        :type card: Card
+        """
+        self.game_state.emit(events.CardCopied(self.hand.index(card)))
+
+    def expand_hand(self, amount: int):
+        """
+        Increases the maximum hand size
+
+        :param amount: Number of extra cards the hider may hold
+        :type amount: int
+        """
+        self.game_state.emit(events.HandExpanded(amount))
+
+    def is_legal_hand(self) -> bool:
         """
         Checks that the hider's hand is within the legal hand size
         """
         return len(self.hand) <= self.max_hand_size
 
+    def holds(self, wanted: Sequence[Card]) -> bool:
+        """
+        Checks whether the hider's hand has all of these cards, counting repeats
+
+        :param wanted: Cards to look for
+        :type wanted: Sequence[Card]
+        """
+        needed = Counter(self.card_ids.get(card) for card in wanted)
+        return all(
+            card_id is not None and self.hand_counts[card_id] >= count
+            for card_id, count in needed.items()
+        )
+
+    def in_hand(self, card: Card) -> bool:
+        """
+        Checks whether the hider holds a card of this kind
+
+        :param card: Card to look for
+        :type card: Card
+        """
+        card_id = self.card_ids.get(card)
+        return card_id is not None and self.hand_counts[card_id] > 0
+
+    def _take(self, position: int) -> Card:
+        """
+        Removes the card at a position in the deck, by moving the last card into its place.
+        """
+        card_id = self.deck[position]
+        self.deck[position] = self.deck[-1]
+        self.deck.pop()
+        return self.card_kinds[card_id]
+
+    def _add_to_hand(self, card: Card):
+        self.hand.append(card)
+        self.hand_counts[self.card_ids[card]] += 1
+
+    def _remove_from_hand(self, hand_index: int) -> Card:
+        card = self.hand.pop(hand_index)
+        self.hand_counts[self.card_ids[card]] -= 1
+        return card
+
+    def apply(self, event: events.DeckEvent):
+        """
+        Makes the change that an event records. This is the only place the deck is changed.
+
+        :param event: Event to apply
+        :type event: events.DeckEvent
+        """
+        if isinstance(event, events.DeckReshuffled):
+            self.deck.extend(self.discard_pile)
+            self.discard_pile = array("B")
+        elif isinstance(event, events.CardsDrawn):
+            self.drawn = [self._take(position) for position in event.positions]
+        elif isinstance(event, events.CardsKept):
+            for i, card in enumerate(self.drawn):
+                if i in event.kept:
+                    self._add_to_hand(card)
+                else:
+                    self.discard_pile.append(self.card_ids[card])
+            self.drawn = []
+        elif isinstance(event, events.CardDrawn):
+            self._add_to_hand(self._take(event.position))
+        elif isinstance(event, (events.CardPlayed, events.CardDiscarded)):
+            self.discard_pile.append(self.card_ids[self._remove_from_hand(event.hand_index)])
+        elif isinstance(event, events.CardCopied):
+            self._add_to_hand(self.hand[event.hand_index])
+        elif isinstance(event, events.HandExpanded):
+            self.max_hand_size += event.amount
+
+    def to_snapshot(self) -> dict[str, Any]:
+        """
+        :return: The deck as plain data, with each card stored as its index in card_kinds.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "hand": [self.card_ids[card] for card in self.hand],
+            "deck": list(self.deck),
+            "discard_pile": list(self.discard_pile),
+            "drawn": [self.card_ids[card] for card in self.drawn],
+            "max_hand_size": self.max_hand_size,
+        }
+
+    def load_snapshot(self, data: dict[str, Any]):
+        """
+        :param data: Deck as returned by to_snapshot.
+        :type data: dict[str, Any]
+        """
+        self.hand = []
+        self.hand_counts = [0] * len(self.card_kinds)
+        for card_id in data["hand"]:
+            self._add_to_hand(self.card_kinds[card_id])
+        self.deck = array("B", data["deck"])
+        self.discard_pile = array("B", data["discard_pile"])
+        self.drawn = [self.card_kinds[card_id] for card_id in data["drawn"]]
+        self.max_hand_size = data["max_hand_size"]
+
 
 class InvestigationBook:
     """
     This is a class to keep track of questions that the seekers have asked.
     """
 
-    def __init__(self):
+    def __init__(self, emit: Callable[[events.GameEvent], None]):
         self.current_question = None
-        self.times_answered: dict[Question, int] = {}
+        # Times each question in the catalog has been answered, indexed by question ID
+        self.times_answered = array("H", bytes(2 * len(QUESTIONS)))
         self.rewards: list[int] = []
+        self.reward_count = 0
+        self.emit = emit
 
     def get_times_answered(self, question: Question) -> int:
         """
@@ -191,7 +317,7 @@ class InvestigationBook:
         :return: Number of times the question has been asked.
         :rtype: int
         """
-        return self.times_answered.get(question, 0)
+        return self.times_answered[get_question_id(question)]
 
     def set_current_question(self, question: QuestionInstance):
         """
@@ -201,7 +327,7 @@ class InvestigationBook:
         :param question: Question that was just asked
         :type question: QuestionInstance
         """
-        self.current_question = question
+        self.emit(events.QuestionAsked(question))
 
     def reward_mult(self, multiplier: int, num_questions: int):
         """
@@ -213,34 +339,113 @@ class InvestigationBook:
         :param num_questions: Number of questions extra reward applies to
         :type num_questions: int
         """
-        for i in range(num_questions):
-            if i >= len(self.rewards):
-                self.rewards.append(multiplier)
-            else:
-                self.rewards *= multiplier
+        self.emit(events.RewardMultiplied(multiplier, num_questions))
 
-    async def question_answered(self, hider_deck: HiderDeck):
+    async def question_answered(self, hider_deck: HiderDeck) -> bool:
         """
-        Called whenever a question is asked to handle the seeker receiving rewards
+        Called whenever a question is asked to handle the seeker receiving rewards. Only the
+        first reward is given here, see next_reward.
 
         :param hider_deck: The current hider deck
         :type hider_deck: HiderDeck
+        :return: Whether no rewards were owed, so the question was closed.
+        :rtype: bool
         """
 
         assert self.current_question is not None
 
-        self.times_answered[self.current_question] += self.get_times_answered(
-            self.current_question
-        )
+        self.emit(events.RewardsEarned())
+        return await self.next_reward(hider_deck)
 
-        if len(self.rewards) > 0:
-            mult = self.rewards.pop(0)
-        else:
-            mult = 1
+    async def next_reward(self, hider_deck: HiderDeck) -> bool:
+        """
+        Gives the hider every reward owed for the current question that can be given at once,
+        which asks them to choose which cards to keep. Called again once they have chosen, until
+        the question is closed. The question is also closed if there are no cards left to give.
 
-        for number in range(self.times_answered[self.current_question] * mult):
-            await hider_deck.reward(*self.current_question.get_reward())
-        self.current_question = None
+        :param hider_deck: The current hider deck
+        :type hider_deck: HiderDeck
+        :return: Whether every reward had already been given, or no more could be, so the
+            question was closed.
+        :rtype: bool
+        """
+        assert self.current_question is not None
+
+        if self.reward_count > 0:
+            draw_num, keep_num = self.current_question.get_reward()
+            sets = hider_deck.reward_sets(draw_num, self.reward_count)
+            if sets > 0:
+                self.emit(events.RewardTaken(sets))
+                await hider_deck.reward(draw_num, keep_num, sets)
+                return False
+        self.emit(events.QuestionClosed())
+        return True
+
+    def apply(self, event: events.BookEvent):
+        """
+        Makes the change that an event records. This is the only place the book is changed.
+
+        :param event: Event to apply
+        :type event: events.BookEvent
+        """
+        if isinstance(event, events.QuestionAsked):
+            self.current_question = event.question
+        elif isinstance(event, events.RewardMultiplied):
+            for i in range(event.num_questions):
+                if i >= len(self.rewards):
+                    self.rewards.append(event.multiplier)
+                else:
+                    self.rewards[i] *= event.multiplier
+        elif isinstance(event, events.RewardsEarned):
+            assert self.current_question is not None
+            question_id = get_question_id(self.current_question)
+            self.times_answered[question_id] += 1
+            mult = self.rewards.pop(0) if len(self.rewards) > 0 else 1
+            self.reward_count = self.times_answered[question_id] * mult
+        elif isinstance(event, events.RewardTaken):
+            self.reward_count -= event.count
+        elif isinstance(event, events.QuestionClosed):
+            self.current_question = None
+            self.reward_count = 0
+
+    def to_snapshot(self) -> dict[str, Any]:
+        """
+        :return: The book as plain data.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "current_question": (
+                None
+                if self.current_question is None
+                else events.encode_question(self.current_question)
+            ),
+            "times_answered": [
+                [events.encode_question(QUESTIONS[question_id]), times]
+                for question_id, times in enumerate(self.times_answered)
+                if times > 0
+            ],
+            "rewards": self.rewards,
+            "reward_count": self.reward_count,
+        }
+
+    def load_snapshot(self, data: dict[str, Any], interned: dict[str, QuestionInstance]):
+        """
+        :param data: Book as returned by to_snapshot.
+        :type data: dict[str, Any]
+        :param interned: Questions already decoded for this game, keyed by their encoding.
+        :type interned: dict[str, QuestionInstance]
+        """
+        self.current_question = (
+            None
+            if data["current_question"] is None
+            else events.decode_question(data["current_question"], interned)
+        )
+        self.times_answered = array("H", bytes(2 * len(QUESTIONS)))
+        for question, times in data["times_answered"]:
+            question_id = get_question_id(events.decode_question(question, interned))
+            self.times_answered[question_id] += times
+        self.rewards = list(data["rewards"])
+        self.reward_count = data["reward_count"]
 
 
 class State(enum.Enum):
@@ -257,6 +462,19 @@ class State(enum.Enum):
 class GameState:
     """
     This is the main game state interface that the frontend will interact with.
+
+    Every change to the game is made by emitting an event, which is applied to the game and then
+    added to its EventLog. The log is periodically given a snapshot of the game, so a game can be
+    rebuilt with restore from its latest snapshot and the events since, or stepped through from
+    the start with replay.
+
+    Every game draws its random numbers from its own RandomStream, seeded with a seed that is
+    recorded in its snapshots, so games never disturb each other's sequences and a game can be
+    reproduced exactly from its seed.
+
+    Nothing waits on the hider to select cards. The game records a PendingSelection and returns,
+    and carries on from resolve_selection when the frontend passes on the hider's choice, or from
+    a random choice if the selection expires first.
     """
 
     def __init__(
@@ -264,28 +482,305 @@ class GameState:
         start_time: int,
         players: list[str],
         frontend: Frontend,
-        scheduler: TaskScheduler,
+        scheduler: TaskScheduler | SchedulerScope,
+        event_log: EventLog | None = None,
+        metadata: dict[str, Any] | None = None,
+        seed: int | None = None,
     ):
+        self._setup(frontend, scheduler, event_log)
+        self.seed = seed if seed is not None else new_seed()
+        self.rng = RandomStream(self.seed)
         self.state = State.INACTIVE
         self.start_time = start_time
         self.players = players
         self.curr_player = ""
-        self.investigation_book = InvestigationBook()
-        self.hider_deck = HiderDeck(self, frontend)
-        self.conditions = ConditionManager()
+        self.metadata = metadata if metadata is not None else {}
         self.times: dict[str, int] = {}
         self.hide_time_start: int = 0
         self.delay_start: int = 0
         self.hider_time_bonus: int = 0
-        self.scheduler = scheduler
-        scheduler.add_task(start_time, self.start_round())
+        self._start_round_task = scheduler.add_task(
+            start_time, self.start_round, key="start_round"
+        )
         self.next_player = self._get_next_player()
-        self.frontend = frontend
+        self.event_log.write_snapshot(self.to_snapshot())
 
         scheduler.add_task(
-            int(time.time()) + 1, frontend.announce_next_player(self.next_player)
+            int(self.clock.time()) + 1, frontend.announce_next_player, self.next_player
         )
 
+    def _setup(
+        self,
+        frontend: Frontend,
+        scheduler: TaskScheduler | SchedulerScope,
+        event_log: EventLog | None,
+    ):
+        """
+        Sets up everything that is not part of the game's recorded state.
+        """
+        self.clock = scheduler.clock
+        self.scheduler = scheduler
+        self.frontend = frontend
+        self.event_log = event_log if event_log is not None else EventLog()
+        self.investigation_book = InvestigationBook(self.emit)
+        self.hider_deck = HiderDeck(self, frontend)
+        self.conditions = ConditionManager(scheduler, self._condition_changed)
+        self._start_round_task: ScheduledTask | None = None
+        self._max_hiding_time_task: ScheduledTask | None = None
+        self._question_task: ScheduledTask | None = None
+        self._selection_task: ScheduledTask | None = None
+        self.pending_selection: PendingSelection | None = None
+        self._replaying = False
+        self._questions: dict[str, QuestionInstance] = {}
+
+    def random_stream(self, name: str) -> RandomStream:
+        """
+        Returns the random numbers to decide the next event with. The stream is keyed by the
+        event's sequence number, so a game restored from its log draws the same numbers that it
+        would have drawn had it never stopped.
+
+        :param name: What the numbers are for, which keeps different uses independent.
+        :type name: str
+        :return: The stream.
+        :rtype: RandomStream
+        """
+        return self.rng.spawn(name, self.event_log.seq + 1)
+
+    def emit(self, event: events.GameEvent):
+        """
+        Applies an event to the game and records it in the event log.
+
+        :param event: Event to emit
+        :type event: events.GameEvent
+        """
+        self.apply(event)
+        self._record(event)
+
+    def _record(self, event: events.GameEvent):
+        if self._replaying:
+            return
+        self.event_log.append(self.clock.time(), event)
+        if self.event_log.needs_snapshot():
+            self.event_log.write_snapshot(self.to_snapshot())
+
+    def _condition_changed(self, condition: Condition, added: bool):
+        # The condition manager has already made the change, so it only needs recording
+        if added:
+            self._record(events.ConditionAdded(condition))
+        else:
+            self._record(events.ConditionRemoved(condition))
+
+    def apply(self, event: events.GameEvent):
+        """
+        Makes the change that an event records. Applying the same events to the same snapshot
+        always gives the same game.
+
+        :param event: Event to apply
+        :type event: events.GameEvent
+        """
+        if isinstance(event, events.DeckEvent):
+            self.hider_deck.apply(event)
+        elif isinstance(event, events.BookEvent):
+            self.investigation_book.apply(event)
+        elif isinstance(event, events.ConditionAdded):
+            self.conditions.add_condition(event.condition)
+        elif isinstance(event, events.ConditionRemoved):
+            self.conditions.remove_condition(event.condition)
+        elif isinstance(event, events.SelectionRequested):
+            self.pending_selection = PendingSelection(
+                event.selection_id,
+                tuple(HiderDeck.card_kinds[card_id] for card_id in event.cards),
+                event.num_select,
+                event.reason,
+                event.deadline,
+                None if event.source == -1 else HiderDeck.card_kinds[event.source],
+                event.group_sizes,
+            )
+        elif isinstance(event, events.SelectionMade):
+            self.pending_selection = None
+        elif isinstance(event, events.RoundStarted):
+            self.state = State.HIDERPHASE
+            self.pending_selection = None
+            self.investigation_book = InvestigationBook(self.emit)
+            self.hider_deck = HiderDeck(self, self.frontend)
+            self.conditions = ConditionManager(self.scheduler, self._condition_changed)
+            self.curr_player = event.player
+        elif isinstance(event, events.SeekersReleased):
+            self.state = State.SEEKERPHASE
+            self.hide_time_start = event.time
+            self.hider_time_bonus = 0
+        elif isinstance(event, events.QuestionExpired):
+            self.state = State.HIDERDELAY
+            self.delay_start = event.time
+        elif isinstance(event, events.QuestionAnswered):
+            if event.penalty is not None:
+                self.state = State.SEEKERPHASE
+                self.hider_time_bonus -= event.penalty
+        elif isinstance(event, events.HiderCaught):
+            self.state = State.INACTIVE
+            self.hider_time_bonus += event.time_bonus
+            self.times[self.curr_player] = max(
+                event.time - self.hide_time_start + self.hider_time_bonus,
+                self.times.get(self.curr_player, 0),
+            )
+        elif isinstance(event, events.NextPlayerChosen):
+            self.next_player = event.player
+
+    def to_snapshot(self) -> dict[str, Any]:
+        """
+        :return: Everything about the game that its events change, as plain data.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "state": self.state.name,
+            "seed": self.seed,
+            "start_time": self.start_time,
+            "players": self.players,
+            "curr_player": self.curr_player,
+            "next_player": self.next_player,
+            "metadata": self.metadata,
+            "times": self.times,
+            "hide_time_start": self.hide_time_start,
+            "delay_start": self.delay_start,
+            "hider_time_bonus": self.hider_time_bonus,
+            "conditions": [condition.name for condition in self.conditions.conditions],
+            "investigation_book": self.investigation_book.to_snapshot(),
+            "hider_deck": self.hider_deck.to_snapshot(),
+            "pending_selection": self._selection_to_snapshot(),
+        }
+
+    def _selection_to_snapshot(self) -> dict[str, Any] | None:
+        selection = self.pending_selection
+        if selection is None:
+            return None
+        card_ids = HiderDeck.card_ids
+        return {
+            "selection_id": selection.selection_id,
+            "cards": [card_ids[card] for card in selection.cards],
+            "num_select": selection.num_select,
+            "reason": selection.reason,
+            "deadline": selection.deadline,
+            "source": -1 if selection.source is None else card_ids[selection.source],
+            "group_sizes": list(selection.group_sizes),
+        }
+
+    def load_snapshot(self, data: dict[str, Any]):
+        """
+        Replaces the game's state with a snapshot. Conditions are restored without their
+        callbacks or durations. Snapshots from before seeds were recorded are given a new seed.
+
+        :param data: Game as returned by to_snapshot
+        :type data: dict[str, Any]
+        """
+        self.state = State[data["state"]]
+        self.seed = data["seed"] if data.get("seed") is not None else new_seed()
+        self.rng = RandomStream(self.seed)
+        self.start_time = data["start_time"]
+        self.players = list(data["players"])
+        self.curr_player = data["curr_player"]
+        self.next_player = data["next_player"]
+        self.metadata = data["metadata"]
+        self.times = dict(data["times"])
+        self.hide_time_start = data["hide_time_start"]
+        self.delay_start = data["delay_start"]
+        self.hider_time_bonus = data["hider_time_bonus"]
+        self.conditions = ConditionManager(self.scheduler, self._condition_changed)
+        self.conditions.conditions = {
+            Condition[name]: lambda: None for name in data["conditions"]
+        }
+        self.investigation_book = InvestigationBook(self.emit)
+        self.investigation_book.load_snapshot(data["investigation_book"], self._questions)
+        self.hider_deck = HiderDeck(self, self.frontend)
+        self.hider_deck.load_snapshot(data["hider_deck"])
+        self.pending_selection = None
+        selection = data.get("pending_selection")
+        if selection is not None:
+            selection = {
+                **selection,
+                "cards": tuple(selection["cards"]),
+                "group_sizes": tuple(selection.get("group_sizes", ())),
+            }
+            self.apply(events.SelectionRequested(**selection))
+
+    @classmethod
+    def restore(
+        cls,
+        event_log: EventLog,
+        frontend: Frontend,
+        scheduler: TaskScheduler | SchedulerScope,
+    ) -> "GameState":
+        """
+        Rebuilds a game from the latest snapshot in its event log and the events after it. No
+        timers are scheduled, as those are recovered by the TaskScheduler and handed back with
+        adopt_task.
+
+        :param event_log: Log of the game
+        :type event_log: EventLog
+        :param frontend: Frontend that the game reports to
+        :type frontend: Frontend
+        :param scheduler: Scheduler for the game's timers
+        :type scheduler: TaskScheduler | SchedulerScope
+        :return: The game
+        :rtype: GameState
+        """
+        assert event_log.snapshot is not None
+        game = cls.__new__(cls)
+        game._setup(frontend, scheduler, event_log)
+        game.load_snapshot(event_log.snapshot)
+        game._replaying = True
+        for record in event_log.read_tail():
+            game.apply(events.decode_event(record, game._questions))
+        game._replaying = False
+        return game
+
+    @classmethod
+    def replay(
+        cls,
+        event_log: EventLog,
+        frontend: Frontend,
+        scheduler: TaskScheduler | SchedulerScope,
+    ) -> Iterator[tuple[dict[str, Any], "GameState"]]:
+        """
+        Steps through a game from its first snapshot, for example to settle a dispute. Nothing is
+        scheduled or recorded while replaying.
+
+        :param event_log: Log of the game
+        :type event_log: EventLog
+        :param frontend: Frontend that the game would report to
+        :type frontend: Frontend
+        :param scheduler: Scheduler the game would use
+        :type scheduler: TaskScheduler | SchedulerScope
+        :return: Each event's record, including its sequence number and time, together with the
+            game as it was straight after the event. The same game object is yielded each time.
+        :rtype: Iterator[tuple[dict[str, Any], GameState]]
+        """
+        assert event_log.initial is not None
+        game = cls.__new__(cls)
+        game._setup(frontend, scheduler, event_log)
+        game.load_snapshot(event_log.initial)
+        game._replaying = True
+        for record in event_log.read_all():
+            game.apply(events.decode_event(record, game._questions))
+            yield record, game
+
+    def adopt_task(self, key: str, task: ScheduledTask):
+        """
+        Takes back a timer that was recovered after a restart, so that it can be cancelled.
+
+        :param key: Key the task was scheduled with
+        :type key: str
+        :param task: The recovered task
+        :type task: ScheduledTask
+        """
+        if key == "start_round":
+            self._start_round_task = task
+        elif key == "max_hiding_time_reached":
+            self._max_hiding_time_task = task
+        elif key == "check_question_answered":
+            self._question_task = task
+        elif key == "selection_expired":
+            self._selection_task = task
+
     async def start_round(self):
         """
         Converts the game state from inactive to the hiding phase. Resets the investigation book,
@@ -293,18 +788,18 @@ class GameState:
         seeking phase in due course.
         """
         if self.state == State.INACTIVE:
-            self.scheduler.remove_task(self.start_round())
-            self.state = State.HIDERPHASE
-            self.investigation_book = InvestigationBook()
-            self.hider_deck = HiderDeck(self, self.frontend)
-            self.conditions = ConditionManager()
-            self.curr_player = self.next_player
+            if self._start_round_task is not None:
+                self._start_round_task.cancel()
+            self.emit(events.RoundStarted(self.next_player))
             self.scheduler.add_task(
-                int(time.time() + HIDING_TIME), self._release_seekers()
+                int(self.clock.time() + HIDING_TIME),
+                self._release_seekers,
+                key="release_seekers",
             )
             self.scheduler.add_task(
-                int(time.time()),
-                self.frontend.announce_round_start(int(time.time() + HIDING_TIME)),
+                int(self.clock.time()),
+                self.frontend.announce_round_start,
+                int(self.clock.time() + HIDING_TIME),
             )
 
     async def _release_seekers(self):
@@ -312,19 +807,20 @@ class GameState:
         Function is called when the hiding time is up and the seekers are released.
         The frontend is called to let both the seekers and hider know.
         """
-        self.state = State.SEEKERPHASE
-        self.hide_time_start = int(time.time())
-        self.scheduler.add_task(
-            int(time.time() + MAX_SEEKING_TIME), self._max_hiding_time_reached()
+        self.emit(events.SeekersReleased(int(self.clock.time())))
+        self._max_hiding_time_task = self.scheduler.add_task(
+            int(self.clock.time() + MAX_SEEKING_TIME),
+            self._max_hiding_time_reached,
+            key="max_hiding_time_reached",
         )
-        self.hider_time_bonus = 0
         await self.frontend.announce_seekers_released()
 
     async def ask_question(self, question: QuestionInstance):
         """
         Called when the hiders ask a specific question. Can raise QuestionActiveException, if
-        there is already a question been asked. If valid, the frontend is called so the hider can
-        be informed.
+        there is already a question been asked, or the hider is still being given the rewards for
+        the last one or choosing cards. If valid, the frontend is called so the hider can be
+        informed.
 
         :param question: Question that is being asked, assumed to not be a thermometer
         :type question: QuestionInstance
@@ -332,32 +828,37 @@ class GameState:
 
         # TODO: But what if not a thermometer
 
-        if self.conditions.has_condition(Condition.ACTIVEQUESTION):
+        if (
+            self.conditions.has_condition(Condition.ACTIVEQUESTION)
+            or self.pending_selection is not None
+            or self.investigation_book.reward_count > 0
+        ):
             raise QuestionActiveException()
-        self.scheduler.add_task(
-            int(time.time() + question.get_allocated_time()),
-            self._check_question_answered(
-                question, self.investigation_book.get_times_answered(question) + 1
-            ),
+        self.investigation_book.set_current_question(question)
+        self._question_task = self.scheduler.add_task(
+            int(self.clock.time() + question.get_allocated_time()),
+            self._check_question_answered,
+            self.investigation_book.get_times_answered(question) + 1,
+            key="check_question_answered",
         )
         self.conditions.add_condition(Condition.ACTIVEQUESTION)
         await self.frontend.pose_question(question)
 
-    async def _check_question_answered(self, question: QuestionInstance, times_answered: int):
+    async def _check_question_answered(self, times_answered: int):
         """
-        Called once the time limit has been expired
+        Called once the time limit for the current question has been expired
 
-        :param question: Question that must have been answered
-        :type question: Question
-        :param times_answered: Number of times this question must have been answered by the time
-            this function is called
+        :param times_answered: Number of times the current question must have been answered by
+            the time this function is called
         :type times_answered: int
         """
-        if self.investigation_book.get_times_answered(question) < times_answered:
-            self.state = State.HIDERDELAY
+        question = self.investigation_book.current_question
+        if (
+            question is not None
+            and self.investigation_book.get_times_answered(question) < times_answered
+        ):
+            self.emit(events.QuestionExpired(int(self.clock.time())))
             self.investigation_book.reward_mult(0, 1)
-            self.delay_start = int(time.time())
-            self.investigation_book.set_current_question(question)
             await self.frontend.question_time_expired()
 
     async def answered_question(self, answer: str):
@@ -373,46 +874,171 @@ class GameState:
             raise HandSizeExceededException()
 
         self.conditions.remove_condition(Condition.ACTIVEQUESTION)
+        if self._question_task is not None:
+            self._question_task.cancel()
         penalty = None
         if self.state == State.HIDERDELAY:
-            self.state = State.SEEKERPHASE
-            penalty = int(time.time() - self.delay_start)
-            self.hider_time_bonus -= penalty
-        
+            penalty = int(self.clock.time() - self.delay_start)
+        self.emit(events.QuestionAnswered(answer, penalty))
+
         assert self.investigation_book.current_question is not None
 
         await self.frontend.reveal_answer(self.investigation_book.current_question, answer, penalty)
 
         self.conditions.add_condition(Condition.HAND_LOCK)
-        await self.investigation_book.question_answered(self.hider_deck)
-        if self.hider_deck.is_legal_hand():
+        if await self.investigation_book.question_answered(self.hider_deck):
+            self._rewards_given()
+
+    def _rewards_given(self):
+        """
+        Lets the hider act again once every reward for a question has been given, unless their
+        hand is over the limit.
+        """
+        if self.hider_deck.is_legal_hand() and self.conditions.has_condition(
+            Condition.HAND_LOCK
+        ):
             self.conditions.remove_condition(Condition.HAND_LOCK)
 
+    async def request_selection(
+        self,
+        cards: Sequence[Card],
+        num_select: int,
+        reason: str,
+        source: Card | None = None,
+        group_sizes: tuple[int, ...] = (),
+    ):
+        """
+        Asks the hider to select cards, and returns without waiting for them. If they have not
+        chosen after SELECTION_TIME seconds, a random choice is made for them.
+
+        :param cards: Cards the hider can choose from
+        :type cards: Sequence[Card]
+        :param num_select: Number of cards the hider must choose
+        :type num_select: int
+        :param reason: What the chosen cards are for
+        :type reason: str
+        :param source: Card being played whose selected method is to be called with the choice,
+            which must be from the hider's hand. If None, the chosen cards are kept as a reward.
+        :type source: Card | None
+        :param group_sizes: Sizes of the consecutive groups of cards that num_select cards are
+            chosen from separately, or empty if all the cards are one group
+        :type group_sizes: tuple[int, ...]
+        """
+        assert self.pending_selection is None
+        card_ids = HiderDeck.card_ids
+        selection_id = self.event_log.seq + 1
+        deadline = int(self.clock.time() + SELECTION_TIME)
+        self.emit(
+            events.SelectionRequested(
+                selection_id,
+                tuple(card_ids[card] for card in cards),
+                num_select,
+                reason,
+                deadline,
+                -1 if source is None else card_ids[source],
+                group_sizes,
+            )
+        )
+        assert self.pending_selection is not None
+        if not cards:
+            # There is nothing to choose, so the hider is not asked
+            await self._finish_selection(self.pending_selection, [])
+            return
+        self._selection_task = self.scheduler.add_task(
+            deadline, self._selection_expired, selection_id, key="selection_expired"
+        )
+        await self.frontend.request_selection(self.pending_selection)
+
+    async def resolve_selection(self, selection_id: int, chosen: Sequence[int]):
+        """
+        Carries on the game with the hider's choice for the pending selection. Raises
+        SelectionNotPendingException if the selection has already been made or has expired, and
+        InvalidSelectionException if the choice is not allowed.
+
+        :param selection_id: ID of the selection being made
+        :type selection_id: int
+        :param chosen: Indices of the chosen cards in the selection's cards
+        :type chosen: Sequence[int]
+        """
+        selection = self.pending_selection
+        if selection is None or selection.selection_id != selection_id:
+            raise SelectionNotPendingException()
+        chosen_set = set(chosen)
+        if (
+            len(chosen_set) != len(chosen)
+            or not all(0 <= i < len(selection.cards) for i in chosen)
+            or any(
+                len(chosen_set.intersection(group)) != min(selection.num_select, len(group))
+                for group in selection.get_groups()
+            )
+        ):
+            raise InvalidSelectionException()
+        if selection.source is not None and not self.hider_deck.holds(
+            [selection.cards[i] for i in chosen]
+        ):
+            raise InvalidSelectionException()
+        await self._finish_selection(selection, chosen)
+
+    async def _selection_expired(self, selection_id: int):
+        """
+        Called once the hider has run out of time to make a selection, which is then made for them
+        at random from the cards they can still choose in each group
+        """
+        selection = self.pending_selection
+        if selection is None or selection.selection_id != selection_id:
+            return
+        held = Counter(self.hider_deck.hand)
+        rng = self.random_stream("selection")
+        chosen = []
+        for group in selection.get_groups():
+            candidates = []
+            for i in group:
+                card = selection.cards[i]
+                if selection.source is None or held[card] > 0:
+                    held[card] -= 1
+                    candidates.append(i)
+            chosen.extend(rng.sample(candidates, min(selection.num_select, len(candidates))))
+        await self.frontend.selection_expired(selection, [selection.cards[i] for i in chosen])
+        await self._finish_selection(selection, chosen)
+
+    async def _finish_selection(self, selection: PendingSelection, chosen: Sequence[int]):
+        if self._selection_task is not None:
+            self._selection_task.cancel()
+            self._selection_task = None
+        self.emit(events.SelectionMade())
+        if selection.source is None:
+            self.hider_deck.keep(chosen)
+            if await self.investigation_book.next_reward(self.hider_deck):
+                self._rewards_given()
+        else:
+            await selection.source.selected(self, [selection.cards[i] for i in chosen])
+
     async def hider_caught(self):
         """
         Called when the hider is caught. Tallies the hider's time, and sets the next player.
         """
-        self.state = State.INACTIVE
-        self.hider_time_bonus += self.hider_deck.count_time_bonuses()
-        self.times[self.curr_player] = max(
-            (int(time.time()) - self.hide_time_start + self.hider_time_bonus),
-            self.times.get(self.curr_player, 0),
+        self.emit(
+            events.HiderCaught(int(self.clock.time()), self.hider_deck.count_time_bonuses())
+        )
+        self.emit(events.NextPlayerChosen(self._get_next_player()))
+        if self._max_hiding_time_task is not None:
+            self._max_hiding_time_task.cancel()
+        self._start_round_task = self.scheduler.add_task(
+            int(self.clock.time() + PLANNING_TIME), self.start_round, key="start_round"
         )
-        self.next_player = self._get_next_player()
-        self.scheduler.remove_task(self._max_hiding_time_reached())
-        self.scheduler.add_task(int(time.time() + PLANNING_TIME), self.start_round())
         await self.frontend.announce_next_player(
             self.next_player,
-            (int(time.time()) - self.hide_time_start + self.hider_time_bonus),
+            (int(self.clock.time()) - self.hide_time_start + self.hider_time_bonus),
         )
 
     async def play_card(self, card: Card):
         await self.hider_deck.play(card)
 
     def _get_next_player(self) -> str:
+        rng = self.random_stream("players")
         unattempted = [x for x in self.players if x not in self.times]
         if len(unattempted) == 0:
-            return random.choice(
+            return rng.choice(
                 [
                     x
                     for x, y in self.times.items()
@@ -420,13 +1046,30 @@ class GameState:
                 ]
             )
         else:
-            return random.choice(unattempted)
+            return rng.choice(unattempted)
 
     async def _max_hiding_time_reached(self):
         await self.frontend.announce_seeking_time_expired()
         # TODO: Add condition on player until location is shared
         # TODO: Work out how to do this
 
+    def resolve_task(self, key: str):
+        """
+        Looks up the method that a journalled scheduler task should call, so that the game's
+        timers can be recovered after a restart.
+
+        :param key: Key the task was scheduled with
+        :type key: str
+        :return: The method to call, or None if the key is not one of this game's tasks.
+        """
+        return {
+            "start_round": self.start_round,
+            "release_seekers": self._release_seekers,
+            "max_hiding_time_reached": self._max_hiding_time_reached,
+            "check_question_answered": self._check_question_answered,
+            "selection_expired": self._selection_expired,
+        }.get(key)
+
     def get_times(self) -> dict[str, int]:
         """
         Gets times for the end of the game
@@ -3,9 +3,11 @@ This file is for any custom interfaces that have to exist.
 """
 
 from __future__ import annotations
-from typing import TYPE_CHECKING
-from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any
+from abc import ABC, ABCMeta, abstractmethod
+from dataclasses import dataclass
 import configparser
+import functools
 
 if TYPE_CHECKING:
     from hide_and_seek_game_state import GameState
@@ -18,43 +20,73 @@ DEFAULT_ALLOCATED_QUESTION_TIME = par.getint(
 )
 
 
-class Card(ABC):
+class CardMeta(ABCMeta):
+    """
+    Metaclass of every card. Card classes that do not declare __slots__ are given empty ones, so
+    that no card carries an instance __dict__.
+    """
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        namespace.setdefault("__slots__", ())
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class Card(metaclass=CardMeta):
     """
     This is an abstract class that represents a card. Each card type will have its own
     implementation.
+
+    Cards are immutable flyweights. Each distinct card is created once, in the registry in
+    hide_and_seek_cards, and shared by every game, so the game state is passed in to anything
+    that acts on a game. Cards are equal if they are the same type with the same parameters.
     """
 
-    def __init__(self, game_state_inst: GameState):
-        self.game_state = game_state_inst
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} cards are immutable")
+
+    def get_params(self) -> tuple:
+        """
+        Returns the parameters the card was created with
+        """
+        return ()
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.get_params() == other.get_params()
 
-    async def play(self):
+    def __hash__(self) -> int:
+        return hash((type(self), self.get_params()))
+
+    async def play(self, game_state: GameState):
         """
         Plays a card
         """
 
-    def discard(self):
+    def discard(self, game_state: GameState):
         """
         Discards a card
         """
 
+    async def selected(self, game_state: GameState, chosen: list[Card]):
+        """
+        Finishes playing a card that asked the hider to select cards from their hand, once they
+        have chosen
+
+        :param chosen: Cards the hider selected
+        :type chosen: list[Card]
+        """
+
     def get_time_bonus(self) -> int:
         """
         Gets number of seconds of time bonuses
         """
         return 0
 
-    def _playable(self) -> bool:
+    def _playable(self, game_state: GameState) -> bool:
         """
         Returns whether the card is playable
         """
         return True
 
-    def get_game_state(self) -> GameState:
-        """
-        Returns the game state the card belongs to
-        """
-        return self.game_state
-
     @abstractmethod
     def get_card_name(self) -> str:
         """
@@ -68,8 +100,8 @@ class Curse(Card):
     """
 
     @abstractmethod
-    async def play(self):
-        await self.get_game_state().frontend.announce_curse(self)
+    async def play(self, game_state: GameState):
+        await game_state.frontend.announce_curse(self)
 
     @abstractmethod
     def get_cost_description(self) -> str:
@@ -134,12 +166,69 @@ class Question(ABC):
     def to_instance(self, user_input:str) -> QuestionInstance:
         pass
 
+    def get_params(self) -> tuple:
+        """
+        :return: What tells this question apart from others of its type, for example its location
+        :rtype: tuple
+        """
+        return ()
+
+    # A question's parameters never change once made, so its key, identity and hash are only
+    # worked out once. The catalog in hide_and_seek_questions does so for its questions when it
+    # is built, and sets their question_id. Other questions cache theirs when first looked up.
+    question_id: int | None = None
+    _key: tuple | None = None
+    _identity: tuple | None = None
+    _hash: int | None = None
+    _CACHED_FIELDS = frozenset(("question_id", "_key", "_identity", "_hash"))
+
+    def get_fields(self) -> dict[str, Any]:
+        """
+        :return: The attributes the question was made with, without anything cached on it
+        :rtype: dict[str, Any]
+        """
+        return {
+            name: value for name, value in vars(self).items() if name not in self._CACHED_FIELDS
+        }
+
+    def get_key(self) -> tuple:
+        """
+        A QuestionInstance has the same key as the question it was made from, whatever the user
+        input, so the key identifies the question in the catalog in hide_and_seek_questions.
+
+        :return: The question's type, without the instance, and its parameters
+        :rtype: tuple
+        """
+        if self._key is None:
+            self._key = (base_question_type(type(self)), self.get_params())
+        return self._key
+
+    def _make_identity(self) -> tuple:
+        return (type(self), self.get_params())
+
+    def _get_identity(self) -> tuple:
+        if self._identity is None:
+            self._identity = self._make_identity()
+            self._hash = hash(self._identity)
+        return self._identity
+
     def __eq__(self, other) -> bool:
-        # TODO: Implement
-        return str(self) == str(other)
+        if self is other:
+            return True
+        if not isinstance(other, Question):
+            return NotImplemented
+        return hash(self) == hash(other) and self._get_identity() == other._get_identity()
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            self._get_identity()
+        return self._hash
 
 
 class QuestionInstance(Question):
+    def _make_identity(self) -> tuple:
+        return (type(self), self.get_params(), self.get_user_input())
+
     @abstractmethod
     def get_user_input(self) -> str:
         """
@@ -159,26 +248,93 @@ class QuestionInstance(Question):
         """
 
 
+@functools.cache
+def base_question_type(question_type: type[Question]) -> type[Question]:
+    """
+    :param question_type: A type of question or question instance.
+    :type question_type: type[Question]
+    :return: The question type that question_type's instances are made from, or question_type
+        itself if it is not a QuestionInstance.
+    :rtype: type[Question]
+    """
+    for base in question_type.__mro__:
+        if not issubclass(base, QuestionInstance):
+            return base
+    raise TypeError(f"{question_type.__name__} is not a question type")
+
+
+@dataclass(frozen=True)
+class PendingSelection:
+    """
+    A choice of cards that the game is waiting on the hider to make. The game carries on once
+    GameState.resolve_selection is called with the selection's ID, or picks at random once the
+    deadline passes.
+
+    The cards can be split into consecutive groups, such as one per reward when several rewards
+    are given at once, and num_select cards are chosen from each group separately.
+    """
+
+    selection_id: int
+    cards: tuple[Card, ...]
+    """Cards the hider can choose from"""
+    num_select: int
+    """Number of cards the hider must choose from each group, or every card if there are fewer"""
+    reason: str
+    """What the chosen cards are for, such as keep or discard"""
+    deadline: int
+    source: Card | None = None
+    """Card being played that asked for the selection, or None for a question's reward"""
+    group_sizes: tuple[int, ...] = ()
+    """Number of cards in each group, or empty if all the cards are one group"""
+
+    def get_groups(self) -> list[range]:
+        """
+        :return: The indices of the cards in each group, in order.
+        :rtype: list[range]
+        """
+        sizes = self.group_sizes if self.group_sizes else (len(self.cards),)
+        groups = []
+        start = 0
+        for size in sizes:
+            groups.append(range(start, start + size))
+            start += size
+        return groups
+
+    def get_num_chosen(self) -> int:
+        """
+        :return: Total number of cards the hider must choose.
+        :rtype: int
+        """
+        return sum(min(self.num_select, len(group)) for group in self.get_groups())
+
+
 class Frontend(ABC):
     """
     This is the abstract class that represents any frontend.
     """
 
+    max_selection_size: int | None = None
+    """Most cards the frontend can offer in one selection, or None if there is no limit"""
+
+    @abstractmethod
+    async def request_selection(self, selection: PendingSelection):
+        """
+        Asks the hider to select cards. This must return without waiting for the hider, whose
+        choice is passed to GameState.resolve_selection whenever it is made.
+
+        :param selection: What the hider is to choose
+        :type selection: PendingSelection
+        """
+
     @abstractmethod
-    async def select_cards(
-        self, cards: list[Card], num_select: int, reason: str
-    ) -> set[Card]:
+    async def selection_expired(self, selection: PendingSelection, chosen: list[Card]):
         """
-        Asks the hider to select which cards to keep from a given list
+        Tells the hider that they ran out of time to select cards, and were given a random choice
 
-        :param cards: List of cards the hider can choose from
-        :type cards: list[Card]
-        :param num_keeping: Number of cards the hider is allowed to keep
-        :type num_keeping: int
-        :param reason: Reason why the hider is being asked
-        :type reason: str
-        :return: A set of indices of size num_keeping which represents the hider's choice
-        :rtype: set[int]
+        :param selection: The selection that expired
+        :type selection: PendingSelection
+        :param chosen: Cards chosen for the hider
+        :type chosen: list[Card]
         """
 
     @abstractmethod
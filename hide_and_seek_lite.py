@@ -1,5 +1,4 @@
-import random
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import os
 import configparser
 
@@ -9,6 +8,11 @@ from dotenv import load_dotenv
 
 from hide_and_seek_lite_deck import HiderDeck
 from hide_and_seek_lite_interfaces import Curse
+from card_embeds import CardEmbedCache
+from channel_resolver import ChannelResolver
+from hide_and_seek_rng import RandomStream
+from name_index import NameIndex
+from status_board import Payload, StatusBoard
 
 config = configparser.ConfigParser()
 config.read("hide_and_seek.cfg")
@@ -22,37 +26,105 @@ client = commands.InteractionBot()
 async def autocomp_hider_hand(
     inter: disnake.ApplicationCommandInteraction, user_input: str
 ):
-    return [
-        x.get_card_name()
-        for x in clientData.hider_deck.hand
-        if user_input.lower() in x.get_card_name().lower()
-    ]
+    return clientData.hand_index.search(user_input)
 
 async def autocomp_all_cards(
     inter: disnake.ApplicationCommandInteraction, user_input: str
 ):
-    return sorted(set([
-        x.get_card_name()
-        for x in clientData.hider_deck.cards
-        if user_input.lower() in x.get_card_name().lower()
-    ]))[:25]
+    return clientData.card_index.search(user_input)
 
 @dataclass
 class ClientData:
     hider_channel: int
     seeker_channel: int
     hider_deck: HiderDeck
+    dice: RandomStream = field(default_factory=RandomStream)
+    # Card names are indexed for autocomplete, the hand's after every change to it
+    card_index: NameIndex = field(default_factory=NameIndex)
+    hand_index: NameIndex = field(default_factory=NameIndex)
 
 
 clientData = ClientData(845462051464019998, 560022746973601792, HiderDeck())
+clientData.card_index.sync(x.get_card_name() for x in clientData.hider_deck.cards)
 
 
-async def fetch_hider_channel() -> disnake.DMChannel:
-    return await client.create_dm(await client.fetch_user(clientData.hider_channel))
+# Lite cards build their own embeds, which are kept so each one is only built once
+card_embeds = CardEmbedCache(lambda card: card.to_embed())
 
 
-async def fetch_seeker_channel() -> disnake.DMChannel:
-    return await client.create_dm(await client.fetch_user(clientData.seeker_channel))
+def sync_hand_index():
+    clientData.hand_index.sync(x.get_card_name() for x in clientData.hider_deck.hand)
+
+
+async def fetch_dm(user_id: int) -> disnake.DMChannel:
+    return await client.create_dm(await client.fetch_user(user_id))
+
+
+channel_resolver: ChannelResolver[disnake.abc.Messageable] = ChannelResolver(
+    fetch_dm,
+    config.getint("MASTER", "CHANNEL_CACHE_TTL"),
+    cache_path=config.get("MASTER", "CHANNEL_CACHE"),
+    from_channel_id=lambda channel_id: client.get_partial_messageable(
+        channel_id, type=disnake.ChannelType.private
+    ),
+)
+
+
+async def fetch_hider_channel() -> disnake.abc.Messageable:
+    return await channel_resolver.resolve(clientData.hider_channel)
+
+
+async def fetch_seeker_channel() -> disnake.abc.Messageable:
+    return await channel_resolver.resolve(clientData.seeker_channel)
+
+# Discord shows at most this many embeds on a message
+MAX_EMBEDS = 10
+
+
+def render_status(user_id: int) -> Payload:
+    """
+    Renders the status board of the hider, which shows their hand, or of the seekers, who are
+    only shown how many cards the hider holds.
+    """
+    hider_deck = clientData.hider_deck
+    hand = hider_deck.hand
+    lines = [f"**Hider's hand:** {len(hand)} card(s), {len(hider_deck.deck)} left in the deck"]
+    if user_id != clientData.hider_channel:
+        return {"content": "\n".join(lines), "embeds": []}
+    if not hider_deck.is_legal_hand():
+        lines.append("WARNING: OVER DEFAULT HAND SIZE LIMIT OF 6")
+    if len(hand) > MAX_EMBEDS:
+        lines.append(", ".join(x.get_card_name() for x in hand))
+        return {"content": "\n".join(lines), "embeds": []}
+    return {"content": "\n".join(lines), "embeds": card_embeds.get_many(hand)}
+
+
+async def post_status(user_id: int, payload: Payload) -> disnake.Message:
+    try:
+        return await (await channel_resolver.resolve(user_id)).send(**payload)
+    except disnake.HTTPException:
+        channel_resolver.invalidate(user_id)
+        raise
+
+
+async def edit_status(message: disnake.Message, payload: Payload):
+    await message.edit(**payload)
+
+
+# In status board mode, the hand is shown in one message per player that is kept up to date,
+# rather than sent again after every command
+STATUS_BOARD = config.getboolean("MASTER", "STATUS_BOARD")
+status_board: StatusBoard[disnake.Message] = StatusBoard(
+    render_status,
+    post_status,
+    edit_status,
+    debounce=config.getfloat("MASTER", "STATUS_DEBOUNCE"),
+)
+
+
+def update_status():
+    status_board.touch(clientData.hider_channel, clientData.seeker_channel)
+
 
 async def check_hider(ctx: disnake.ApplicationCommandInteraction):
     if ctx.author.id != clientData.hider_channel:
@@ -72,7 +144,7 @@ async def display_hand(ctx: disnake.ApplicationCommandInteraction):
         await ctx.response.send_message("Hand is too full.")
         return
     await ctx.response.send_message(
-        "Your hand is below.", embeds=[x.to_embed() for x in clientData.hider_deck.hand]
+        "Your hand is below.", embeds=card_embeds.get_many(clientData.hider_deck.hand)
     )
     if not clientData.hider_deck.is_legal_hand():
         await ctx.followup.send("WARNING: OVER DEFAULT HAND SIZE LIMIT OF 6")
@@ -81,8 +153,11 @@ async def display_hand(ctx: disnake.ApplicationCommandInteraction):
 async def secondary_display_hand(ctx: disnake.ApplicationCommandInteraction):
     if not await check_hider(ctx):
         return
+    if STATUS_BOARD:
+        update_status()
+        return
     await ctx.followup.send(
-        "Your hand is below.", embeds=[x.to_embed() for x in clientData.hider_deck.hand]
+        "Your hand is below.", embeds=card_embeds.get_many(clientData.hider_deck.hand)
     )
     if not clientData.hider_deck.is_legal_hand():
         await ctx.followup.send("WARNING: OVER DEFAULT HAND SIZE LIMIT OF 6")
@@ -94,6 +169,11 @@ async def draw(ctx: disnake.ApplicationCommandInteraction):
     if not await check_hider(ctx):
         return
     clientData.hider_deck.draw()
+    sync_hand_index()
+    if STATUS_BOARD:
+        update_status()
+        await ctx.response.send_message("Card drawn.", ephemeral=True)
+        return
     await display_hand(ctx)
 
 
@@ -125,14 +205,14 @@ async def reward(
     view.add_item(item)
 
     await ctx.response.send_message(f"Select {select_number} card(s).", view=view)
-    if len([x.to_embed() for x in cards if isinstance(x, Curse)]) != 0:
-        await ctx.followup.send(
-            embeds=[x.to_embed() for x in cards if isinstance(x, Curse)]
-        )
+    curse_embeds = card_embeds.get_many(x for x in cards if isinstance(x, Curse))
+    if len(curse_embeds) != 0:
+        await ctx.followup.send(embeds=curse_embeds)
 
     if not await view.wait():
         for card in [cards[int(x)] for x in item.values]:
             clientData.hider_deck.hand.append(card)
+        sync_hand_index()
         await secondary_display_hand(ctx)
     else:
         await ctx.followup.send("Timed out.")
@@ -148,13 +228,18 @@ async def play(
         return
     card = clientData.hider_deck.fetch_card_by_name(card_name)
     clientData.hider_deck.play(card)
+    sync_hand_index()
 
     if card.get_inform_seekers():
-        await (await fetch_seeker_channel()).send(
-            "Hider has played this card.", embed=card.to_embed()
-        )
-
-    await ctx.response.send_message("Card played successfully.", embed=card.to_embed())
+        try:
+            await (await fetch_seeker_channel()).send(
+                "Hider has played this card.", embed=card_embeds.get(card)
+            )
+        except disnake.HTTPException:
+            channel_resolver.invalidate(clientData.seeker_channel)
+            raise
+
+    await ctx.response.send_message("Card played successfully.", embed=card_embeds.get(card))
     await secondary_display_hand(ctx)
 
 
@@ -168,6 +253,7 @@ async def discard(
         return
     card = clientData.hider_deck.fetch_card_by_name(card_name)
     clientData.hider_deck.discard(card)
+    sync_hand_index()
 
     await ctx.response.send_message("Card discarded successfully.")
     await secondary_display_hand(ctx)
@@ -183,6 +269,11 @@ async def give_card(
     card = clientData.hider_deck.fetch_card_by_name(card_name)
     clientData.hider_deck.hand.append(card)
     clientData.hider_deck.deck = [x for x in clientData.hider_deck.deck if x != card]
+    sync_hand_index()
+    if STATUS_BOARD:
+        update_status()
+        await ctx.response.send_message("Card given.", ephemeral=True)
+        return
     await display_hand(ctx)
 
 
@@ -192,9 +283,9 @@ async def roll(
     ctx: disnake.ApplicationCommandInteraction, sides: int = 6, number: int = 1
 ):
     if number <= 1:
-        await ctx.response.send_message(f"Result is: **{random.randint(1,sides)}**")
+        await ctx.response.send_message(f"Result is: **{clientData.dice.randint(1, sides)}**")
     else:
-        res = [random.randint(1, sides) for x in range(number)]
+        res = [clientData.dice.randint(1, sides) for x in range(number)]
         await ctx.response.send_message(
             f"Result is: **{sum(res)}**\n[{', '. join([str(x) for x in res])}]"
         )
@@ -204,6 +295,9 @@ async def roll(
 @client.slash_command(description="Don't touch")
 async def reset(ctx: disnake.ApplicationCommandInteraction):
     clientData.hider_deck = HiderDeck()
+    sync_hand_index()
+    if STATUS_BOARD:
+        update_status()
 
 
 @client.slash_command(description="Don't touch")
@@ -213,6 +307,7 @@ async def change_discord_users(
     await ctx.response.defer()
     clientData.hider_channel = int(hider_id)
     clientData.seeker_channel = int(seeker_id)
+    status_board.clear()
     await (await fetch_hider_channel()).send("Testing!")
     await (await fetch_seeker_channel()).send("Testing!")
     await ctx.followup.send("All working.")
@@ -220,7 +315,7 @@ async def change_discord_users(
 
 @client.event
 async def on_ready():
-    pass
+    channel_resolver.load()
 
 
 client.run(TOKEN)
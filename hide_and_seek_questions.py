@@ -1,6 +1,7 @@
 import configparser
 
-from hide_and_seek_interfaces import Question, QuestionInstance
+from hide_and_seek_exceptions import UnknownQuestionException
+from hide_and_seek_interfaces import Question, QuestionInstance, base_question_type
 
 par = configparser.ConfigParser()
 par.read("hide_and_seek.cfg")
@@ -8,11 +9,18 @@ par.read("hide_and_seek.cfg")
 DEFAULT_ALLOCATED_PHOTO_TIME = par.getint("MASTER", "DEFAULT_ALLOCATED_PHOTO_TIME")
 TENTACLES_DISTANCE = par.getint("MASTER", "TENTACLES_DISTANCE")
 
+# Discord's limits on the choices of a slash command option
+MAX_CHOICES = 25
+MAX_CHOICE_NAME_LENGTH = 100
+
 
 class MeasuringQuestion(Question):
     def __init__(self, location: str):
         self.location = location
 
+    def get_params(self) -> tuple:
+        return (self.location,)
+
     def get_short_question(self):
         return self.location
 
@@ -45,6 +53,9 @@ class MatchingQuestion(Question):
     def __init__(self, location: str):
         self.location = location
 
+    def get_params(self) -> tuple:
+        return (self.location,)
+
     def get_short_question(self):
         return self.location
 
@@ -78,6 +89,9 @@ class TentaclesQuestion(Question):
         self.location_type = location_type
         self.tentacle_distance: int = TENTACLES_DISTANCE
 
+    def get_params(self) -> tuple:
+        return (self.location_type,)
+
     def get_short_question(self):
         return self.location_type
 
@@ -107,6 +121,9 @@ class RadarQuestion(Question):
     def __init__(self, distance_km: float):
         self.distance_km = distance_km
 
+    def get_params(self) -> tuple:
+        return (self.distance_km,)
+
     def get_short_question(self):
         return f"{self.distance_km}km"
 
@@ -133,6 +150,9 @@ class ThermometerQuestion(Question):
     def __init__(self, min_dist_km: float):
         self.min_dist_km = min_dist_km
 
+    def get_params(self) -> tuple:
+        return (self.min_dist_km,)
+
     def get_short_question(self):
         return f"{self.min_dist_km}km"
 
@@ -166,6 +186,9 @@ class PhotoQuestion(Question):
     def __init__(self, photo_type: str):
         self.photo_type = photo_type
 
+    def get_params(self) -> tuple:
+        return (self.photo_type,)
+
     def get_short_question(self):
         return self.photo_type
 
@@ -191,80 +214,233 @@ class PhotoQuestionInstance(PhotoQuestion, QuestionInstance):
         return ""
 
 
+# Every question that can be asked, created once. A question's ID is its index in QUESTIONS.
+QUESTIONS: tuple[Question, ...] = tuple(
+    [
+        MatchingQuestion(x)
+        for x in [
+            "Commercial Airport",
+            "Transit Line",
+            "Station Name Length",
+            "Local Council Area",
+            "Suburb",
+            "Park",
+            "Amusement Park",
+            "Zoo",
+            "Aquarium",
+            "Golf Course",
+            "Museum",
+            "Movie Theatre",
+            "Hospital",
+            "Library",
+            "Foreign Consulate",
+        ]
+    ]
+    + [
+        MeasuringQuestion(x)
+        for x in [
+            "Commercial Airport",
+            "Rail station",
+            "Local Council Border",
+            "Suburb Border",
+            "Body of Water",
+            "Coastline",
+            "Park",
+            "Amusement Park",
+            "Zoo",
+            "Aquarium",
+            "Golf Course",
+            "Museum",
+            "Movie Theatre",
+            "Hospital",
+            "Library",
+            "Foreign Consulate",
+        ]
+    ]
+    + [RadarQuestion(x) for x in [0.5, 1, 2, 5, 10, 15, 40, 80, 160]]
+    + [ThermometerQuestion(x) for x in [1, 5, 15]]
+    + [
+        TentaclesQuestion(x)
+        for x in ["Museums", "Libraries", "Movie Theatres", "Hospitals"]
+    ]
+    + [
+        PhotoQuestion(x)
+        for x in [
+            "a tree",
+            "the sky",
+            "you",
+            "widest street",
+            "tallest structure in your sightline",
+            "any building visible from the station",
+            "tallest building visible from the station",
+            "trace nearest path or street",
+            "two buildings",
+            "restaurant interior",
+            "park",
+            "grocery store aisle",
+        ]
+    ]
+)
+
+
+def _index_questions(questions: tuple[Question, ...]) -> dict[tuple, int]:
+    """
+    Gives each question its ID, and works out its key and hash now, so that looking a question
+    up only reads them.
+
+    :return: The ID of each question by its key.
+    :rtype: dict[tuple, int]
+    """
+    question_ids = {}
+    for question_id, question in enumerate(questions):
+        question.question_id = question_id
+        question_ids[question.get_key()] = question_id
+        hash(question)
+    return question_ids
+
+
+QUESTION_IDS: dict[tuple, int] = _index_questions(QUESTIONS)
+
+
+def get_question_id(question: Question) -> int:
+    """
+    Looks up a question in the catalog. A QuestionInstance has the ID of the question it was made
+    from, which it keeps once looked up. Raises UnknownQuestionException if the question is not in
+    the catalog.
+
+    :param question: Question to look up.
+    :type question: Question
+    :return: The question's ID.
+    :rtype: int
+    """
+    question_id = question.question_id
+    if question_id is None:
+        question_id = QUESTION_IDS.get(question.get_key())
+        if question_id is None:
+            raise UnknownQuestionException()
+        question.question_id = question_id
+    return question_id
+
+
 class QuestionManager:
+    """
+    The question catalog, indexed once when created. Lookups by type or subject, and the
+    Discord choice payloads for each type, are all built up front, so no request does any work
+    over the whole catalog.
+    """
+
     def __init__(self):
-        self.questions: list[Question] = []
-        self.questions += (
-            [
-                MatchingQuestion(x)
-                for x in [
-                    "Commercial Airport",
-                    "Transit Line",
-                    "Station Name Length",
-                    "Local Council Area",
-                    "Suburb",
-                    "Park",
-                    "Amusement Park",
-                    "Zoo",
-                    "Aquarium",
-                    "Golf Course",
-                    "Museum",
-                    "Movie Theatre",
-                    "Hospital",
-                    "Library",
-                    "Foreign Consulate",
-                ]
-            ]
-            + [
-                MeasuringQuestion(x)
-                for x in [
-                    "Commercial Airport",
-                    "Rail station",
-                    "Local Council Border",
-                    "Suburb Border",
-                    "Body of Water",
-                    "Coastline",
-                    "Park",
-                    "Amusement Park",
-                    "Zoo",
-                    "Aquarium",
-                    "Golf Course",
-                    "Museum",
-                    "Movie Theatre",
-                    "Hospital",
-                    "Library",
-                    "Foreign Consulate",
-                ]
-            ]
-            + [RadarQuestion(x) for x in [0.5, 1, 2, 5, 10, 15, 40, 80, 160]]
-            + [ThermometerQuestion(x) for x in [1, 5, 15]]
-            + [
-                TentaclesQuestion(x)
-                for x in ["Museums", "Libraries", "Movie Theatres", "Hospitals"]
-            ]
-            + [
-                PhotoQuestion(x)
-                for x in [
-                    "a tree",
-                    "the sky",
-                    "you",
-                    "widest street",
-                    "tallest structure in your sightline",
-                    "any building visible from the station",
-                    "tallest building visible from the station",
-                    "trace nearest path or street",
-                    "two buildings",
-                    "restaurant interior",
-                    "park",
-                    "grocery store aisle",
-                ]
-            ]
-        )
-
-    def get_possible_questions(self) -> set[Question]:
-        return set(self.questions)
-
-    def get_questions_of_type(self, question_type: Question.__class__) -> set[Question]:
-        return set(
-            [x for x in self.get_possible_questions() if isinstance(x, question_type)]
-        )
+        self.questions: tuple[Question, ...] = QUESTIONS
+        self._possible_questions = frozenset(QUESTIONS)
+
+        by_type: dict[type[Question], list[Question]] = {}
+        by_subject: dict[str, list[Question]] = {}
+        for question in QUESTIONS:
+            by_type.setdefault(base_question_type(type(question)), []).append(question)
+            by_subject.setdefault(question.get_short_question().casefold(), []).append(question)
+        self._questions_by_type = {
+            question_type: frozenset(type_questions)
+            for question_type, type_questions in by_type.items()
+        }
+        self._questions_by_subject = {
+            subject: frozenset(subject_questions)
+            for subject, subject_questions in by_subject.items()
+        }
+
+        # Choice names are paired with their case folded form once, for autocomplete
+        self._choices: dict[type[Question], tuple[tuple[str, str, str], ...]] = {
+            question_type: tuple(
+                (name, name.casefold(), str(get_question_id(question)))
+                for question in type_questions
+                for name in [question.get_short_question()[:MAX_CHOICE_NAME_LENGTH]]
+            )
+            for question_type, type_questions in by_type.items()
+        }
+        self._choice_pages: dict[type[Question], tuple[dict[str, str], ...]] = {
+            question_type: tuple(
+                {name: value for name, folded, value in choices[start : start + MAX_CHOICES]}
+                for start in range(0, max(len(choices), 1), MAX_CHOICES)
+            )
+            for question_type, choices in self._choices.items()
+        }
+
+    def get_possible_questions(self) -> frozenset[Question]:
+        return self._possible_questions
+
+    def get_questions_of_type(self, question_type: type[Question]) -> frozenset[Question]:
+        """
+        :param question_type: Type of question, or of its instances.
+        :type question_type: type[Question]
+        :return: Every question of that type.
+        :rtype: frozenset[Question]
+        """
+        return self._questions_by_type.get(base_question_type(question_type), frozenset())
+
+    def get_questions_about(self, subject: str) -> frozenset[Question]:
+        """
+        :param subject: What the questions are about, as given by get_short_question, in any
+            case. For example "park" gives the matching, measuring and photo questions about parks.
+        :type subject: str
+        :return: Every question about the subject.
+        :rtype: frozenset[Question]
+        """
+        return self._questions_by_subject.get(subject.casefold(), frozenset())
+
+    def get_question(self, question_id: int) -> Question:
+        """
+        Looks up a question by ID, such as the value of a choice. Raises UnknownQuestionException
+        if there is no question with the ID.
+
+        :param question_id: ID of the question.
+        :type question_id: int
+        :return: The question.
+        :rtype: Question
+        """
+        if not 0 <= question_id < len(self.questions):
+            raise UnknownQuestionException()
+        return self.questions[question_id]
+
+    def get_num_choice_pages(self, question_type: type[Question]) -> int:
+        """
+        :param question_type: Type of question.
+        :type question_type: type[Question]
+        :return: Number of pages that get_choices splits the type's questions into.
+        :rtype: int
+        """
+        return len(self._choice_pages.get(base_question_type(question_type), ({},)))
+
+    def get_choices(self, question_type: type[Question], page: int = 0) -> dict[str, str]:
+        """
+        Gets a page of slash command choices for a type of question. The same dictionary is
+        returned every time, so it must not be changed.
+
+        :param question_type: Type of question.
+        :type question_type: type[Question]
+        :param page: Which page of MAX_CHOICES choices to get.
+        :type page: int
+        :return: Each question's short name mapped to its ID, as a string.
+        :rtype: dict[str, str]
+        """
+        pages = self._choice_pages.get(base_question_type(question_type), ({},))
+        return pages[page] if 0 <= page < len(pages) else {}
+
+    def autocomplete(self, question_type: type[Question], user_input: str) -> dict[str, str]:
+        """
+        :param question_type: Type of question.
+        :type question_type: type[Question]
+        :param user_input: What the user has typed so far.
+        :type user_input: str
+        :return: Up to MAX_CHOICES choices whose name contains the input, in the same form as
+            get_choices.
+        :rtype: dict[str, str]
+        """
+        if user_input == "":
+            return self.get_choices(question_type)
+        folded_input = user_input.casefold()
+        matches: dict[str, str] = {}
+        for name, folded, value in self._choices.get(base_question_type(question_type), ()):
+            if folded_input in folded:
+                matches[name] = value
+                if len(matches) == MAX_CHOICES:
+                    break
+        return matches
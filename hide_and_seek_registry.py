@@ -0,0 +1,178 @@
+"""
+This file keeps track of every game being played by the process. Like the game state, it is not
+aware of Discord, and games can be keyed by anything that identifies where they are played.
+"""
+
+import os
+from typing import Any, Awaitable, Callable, Hashable
+
+from hide_and_seek_events import EventLog
+from hide_and_seek_game_state import GameState
+from hide_and_seek_exceptions import GameAlreadyRunningException, GameNotFoundException
+from hide_and_seek_interfaces import Frontend
+from task_scheduler import TaskScheduler, SchedulerScope
+
+
+class GameRegistry:
+    """
+    Owns many concurrent games, each looked up in O(1) by its key. Every game gets its own
+    SchedulerScope and ConditionManager, but all of them share one TaskScheduler, so a single
+    timer backend serves the whole process.
+
+    If storage_dir is given, each game's EventLog is kept in it under the game's scope name, so
+    that restore_games can bring every game back after a restart. Logs of ended games are moved
+    into its "ended" subdirectory.
+    """
+
+    def __init__(
+        self,
+        scheduler: TaskScheduler,
+        storage_dir: str | None = None,
+        snapshot_interval: int = 256,
+    ):
+        self.scheduler = scheduler
+        self.storage_dir = storage_dir
+        self.snapshot_interval = snapshot_interval
+        if storage_dir is not None:
+            os.makedirs(storage_dir, exist_ok=True)
+        self.games: dict[Hashable, GameState] = {}
+        self.scopes: dict[Hashable, SchedulerScope] = {}
+        self.keys_by_name: dict[str, Hashable] = {}
+
+    def _open_log(self, name: str) -> EventLog:
+        if self.storage_dir is None:
+            return EventLog(snapshot_interval=self.snapshot_interval)
+        return EventLog(os.path.join(self.storage_dir, name), self.snapshot_interval)
+
+    def _add_scope(self, key: Hashable) -> SchedulerScope:
+        scope = SchedulerScope(self.scheduler, str(key))
+        self.scopes[key] = scope
+        self.keys_by_name[scope.name] = key
+        return scope
+
+    def create_game(
+        self,
+        key: Hashable,
+        start_time: int,
+        players: list[str],
+        frontend: Frontend,
+        metadata: dict[str, Any] | None = None,
+        seed: int | None = None,
+    ) -> GameState:
+        """
+        Starts a new game. Raises GameAlreadyRunningException if there is already a game with
+        this key.
+
+        :param key: What identifies where the game is played, for example a guild id.
+        :type key: Hashable
+        :param start_time: The epoch time that the first round starts.
+        :type start_time: int
+        :param players: Names of the players.
+        :type players: list[str]
+        :param frontend: Frontend that the game reports to.
+        :type frontend: Frontend
+        :param metadata: JSON serialisable data that is stored with the game and handed back
+            when it is restored, such as what the frontend needs to rebuild itself.
+        :type metadata: dict[str, Any] | None
+        :param seed: 64 bit seed of the game's random numbers, or None for a fresh one.
+        :type seed: int | None
+        :return: The new game.
+        :rtype: GameState
+        """
+        if key in self.games:
+            raise GameAlreadyRunningException()
+        scope = self._add_scope(key)
+        game = GameState(
+            start_time, players, frontend, scope, self._open_log(scope.name), metadata, seed
+        )
+        self.games[key] = game
+        return game
+
+    async def restore_games(
+        self, frontend_factory: Callable[[str, dict[str, Any]], Awaitable[Frontend]]
+    ) -> int:
+        """
+        Rebuilds every game stored in storage_dir, then recovers the scheduler's journalled
+        timers and hands each one back to its game. Restored games are keyed by their scope
+        name.
+
+        :param frontend_factory: Creates the frontend for a game, from its key and metadata.
+        :type frontend_factory: Callable[[str, dict[str, Any]], Awaitable[Frontend]]
+        :return: Number of games restored.
+        :rtype: int
+        """
+        assert self.storage_dir is not None
+        restored = 0
+        for file_name in sorted(os.listdir(self.storage_dir)):
+            name, extension = os.path.splitext(file_name)
+            if extension != ".snapshot" or name in self.keys_by_name:
+                continue
+            event_log = self._open_log(name)
+            assert event_log.snapshot is not None
+            frontend = await frontend_factory(name, event_log.snapshot["metadata"])
+            scope = self._add_scope(name)
+            self.games[name] = GameState.restore(event_log, frontend, scope)
+            restored += 1
+
+        if self.scheduler.journal is not None:
+            for task in self.scheduler.recover(self.resolve_task):
+                assert task.key is not None
+                name, _, task_key = task.key.rpartition(":")
+                game_key = self.keys_by_name[name]
+                self.scopes[game_key].track(task)
+                self.games[game_key].adopt_task(task_key, task)
+        return restored
+
+    def get_game(self, key: Hashable) -> GameState:
+        """
+        Looks up a game. Raises GameNotFoundException if there is no game with this key.
+
+        :param key: Key the game was created with.
+        :type key: Hashable
+        :return: The game.
+        :rtype: GameState
+        """
+        game = self.games.get(key)
+        if game is None:
+            raise GameNotFoundException()
+        return game
+
+    def end_game(self, key: Hashable):
+        """
+        Removes a game, cancels all of its timers and archives its event log. Raises GameNotFoundException if there is
+        no game with this key.
+
+        :param key: Key the game was created with.
+        :type key: Hashable
+        """
+        if key not in self.games:
+            raise GameNotFoundException()
+        scope = self.scopes.pop(key)
+        scope.cancel_all()
+        self.keys_by_name.pop(scope.name)
+        game = self.games.pop(key)
+        if self.storage_dir is None:
+            game.event_log.close()
+        else:
+            game.event_log.move(os.path.join(self.storage_dir, "ended"))
+
+    def resolve_task(self, key: str) -> Callable[..., Any] | None:
+        """
+        Looks up the method that a journalled task should call, for TaskScheduler.recover.
+
+        :param key: Journalled key, made up of the game's scope name and the task's key.
+        :type key: str
+        :return: The method to call, or None if no game handles the key.
+        :rtype: Callable[..., Any] | None
+        """
+        name, _, task_key = key.rpartition(":")
+        game_key = self.keys_by_name.get(name)
+        if game_key is None:
+            return None
+        return self.games[game_key].resolve_task(task_key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.games
+
+    def __len__(self) -> int:
+        return len(self.games)
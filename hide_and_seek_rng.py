@@ -0,0 +1,89 @@
+"""
+This file holds the random number streams that games draw from, so that every game has its own
+reproducible sequence instead of sharing the random module's global one.
+"""
+
+import hashlib
+import random
+import secrets
+from typing import Any
+
+
+def new_seed() -> int:
+    """
+    :return: A fresh 64 bit seed from the operating system's entropy source.
+    :rtype: int
+    """
+    return secrets.randbits(64)
+
+
+class RandomStream(random.Random):
+    """
+    A deterministic random number generator that can be split into independent child streams, in
+    the same way as NumPy's SeedSequence.spawn. Each block of 64 bits is the keyed BLAKE2 hash of
+    a counter, and a child's key is the hash of its parent's key and its name, so a stream is
+    fixed entirely by its seed and the names it was spawned under. Streams never share state with
+    each other or with the random module, so no locking is needed between games or processes.
+
+    It is a random.Random, so it has all of that class's methods, such as randint and choice.
+    """
+
+    def __init__(self, seed: int | str | None = None):
+        """
+        :param seed: Seed of the stream, or None for a fresh one from new_seed.
+        :type seed: int | str | None
+        """
+        self._key = b""
+        self._counter = 0
+        super().__init__(seed)
+
+    def seed(self, a: Any = None, version: int = 2):
+        if a is None:
+            a = new_seed()
+        self._key = hashlib.blake2b(str(a).encode(), digest_size=32, person=b"jetlag-seed").digest()
+        self._counter = 0
+        self.gauss_next = None
+
+    def spawn(self, *names: str | int) -> "RandomStream":
+        """
+        Creates a child stream. Spawning with the same names always gives the same stream, and
+        spawning does not change this stream.
+
+        :param names: Names of the child, for example what it is used for. Each name is one
+            level further down.
+        :type names: str | int
+        :return: The child stream.
+        :rtype: RandomStream
+        """
+        child = RandomStream.__new__(RandomStream)
+        key = self._key
+        for name in names:
+            key = hashlib.blake2b(
+                str(name).encode(), digest_size=32, key=key, person=b"jetlag-spawn"
+            ).digest()
+        child._key = key
+        child._counter = 0
+        child.gauss_next = None
+        return child
+
+    def _block(self) -> bytes:
+        self._counter += 1
+        return hashlib.blake2b(
+            self._counter.to_bytes(8, "little"), digest_size=8, key=self._key, person=b"jetlag-block"
+        ).digest()
+
+    def getrandbits(self, k: int) -> int:
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        blocks = (k + 63) // 64
+        value = int.from_bytes(b"".join(self._block() for i in range(blocks)), "little")
+        return value >> (blocks * 64 - k)
+
+    def random(self) -> float:
+        return self.getrandbits(53) / (1 << 53)
+
+    def getstate(self) -> tuple[bytes, int, float | None]:
+        return self._key, self._counter, self.gauss_next
+
+    def setstate(self, state: tuple[bytes, int, float | None]):
+        self._key, self._counter, self.gauss_next = state
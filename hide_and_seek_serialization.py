@@ -0,0 +1,349 @@
+"""
+This file holds the compact binary encoding of game snapshots, as produced by
+GameState.to_snapshot. A whole game takes a few hundred bytes and a few microseconds to encode or
+decode, so a game can be checkpointed after every action.
+
+Every encoding starts with a magic number and a schema version, and each schema version has its
+own decoder, so snapshots written by an older version can still be read. Cards are stored as
+their ID in the registry in hide_and_seek_cards, which fixes each card's type and parameters, so
+the schema version must be bumped whenever the registry changes.
+"""
+
+import json
+import struct
+from typing import Any, Callable
+
+from hide_and_seek_conditions import Condition
+from hide_and_seek_exceptions import SnapshotFormatException
+
+MAGIC = b"JLGS"
+SCHEMA_VERSION = 4
+
+STATES = ("INACTIVE", "HIDERPHASE", "SEEKERPHASE", "HIDERDELAY")
+
+_HEADER = struct.Struct("<4sB")
+_GAME = struct.Struct("<BqqqqB")
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_I16 = struct.Struct("<h")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_U64 = struct.Struct("<Q")
+_F64 = struct.Struct("<d")
+_TIME = struct.Struct("<Bq")
+_TIMES_ANSWERED = struct.Struct("<HH")
+_SELECTION = struct.Struct("<QBqh")
+
+
+def _pack_str(parts: list[bytes], value: str):
+    encoded = value.encode()
+    parts.append(_U16.pack(len(encoded)))
+    parts.append(encoded)
+
+
+def _pack_value(parts: list[bytes], value: Any):
+    # Question fields are tagged with their type, as different questions hold different types
+    if value is None:
+        parts.append(b"n")
+    elif isinstance(value, bool):
+        parts.append(b"t" if value else b"f")
+    elif isinstance(value, int):
+        parts.append(b"i")
+        parts.append(_I64.pack(value))
+    elif isinstance(value, float):
+        parts.append(b"d")
+        parts.append(_F64.pack(value))
+    elif isinstance(value, str):
+        parts.append(b"s")
+        _pack_str(parts, value)
+    elif isinstance(value, (list, tuple)):
+        parts.append(b"l")
+        parts.append(_U16.pack(len(value)))
+        for item in value:
+            _pack_value(parts, item)
+    else:
+        raise SnapshotFormatException(f"Cannot encode {type(value).__name__}")
+
+
+def _pack_cards(parts: list[bytes], card_ids: list[int]):
+    parts.append(_U16.pack(len(card_ids)))
+    parts.append(bytes(card_ids))
+
+
+def encode_snapshot(snapshot: dict[str, Any]) -> bytes:
+    """
+    :param snapshot: Game as returned by GameState.to_snapshot.
+    :type snapshot: dict[str, Any]
+    :return: The game in the current schema version.
+    :rtype: bytes
+    """
+    parts = [_HEADER.pack(MAGIC, SCHEMA_VERSION)]
+
+    condition_mask = 0
+    for name in snapshot["conditions"]:
+        condition_mask |= 1 << (Condition[name].value - 1)
+    parts.append(
+        _GAME.pack(
+            STATES.index(snapshot["state"]),
+            snapshot["start_time"],
+            snapshot["hide_time_start"],
+            snapshot["delay_start"],
+            snapshot["hider_time_bonus"],
+            condition_mask,
+        )
+    )
+
+    players: list[str] = snapshot["players"]
+    player_indexes = {player: i for i, player in enumerate(players)}
+    parts.append(_U8.pack(len(players)))
+    for player in players:
+        _pack_str(parts, player)
+    parts.append(_I16.pack(player_indexes.get(snapshot["curr_player"], -1)))
+    parts.append(_I16.pack(player_indexes.get(snapshot["next_player"], -1)))
+    parts.append(_U8.pack(len(snapshot["times"])))
+    for player, player_time in snapshot["times"].items():
+        parts.append(_TIME.pack(player_indexes[player], player_time))
+
+    metadata = json.dumps(snapshot["metadata"], separators=(",", ":")).encode()
+    parts.append(_U32.pack(len(metadata)))
+    parts.append(metadata)
+
+    # Each distinct question is stored once, and referred to by its index everywhere else
+    book = snapshot["investigation_book"]
+    question_indexes: dict[str, int] = {}
+    question_parts: list[bytes] = []
+
+    def question_index(question: dict[str, Any]) -> int:
+        key = repr(question)
+        index = question_indexes.get(key)
+        if index is None:
+            index = question_indexes[key] = len(question_indexes)
+            _pack_str(question_parts, question["type"])
+            question_parts.append(_U8.pack(len(question["fields"])))
+            for name, value in question["fields"].items():
+                _pack_str(question_parts, name)
+                _pack_value(question_parts, value)
+        return index
+
+    current = -1 if book["current_question"] is None else question_index(book["current_question"])
+    times_answered = [
+        _TIMES_ANSWERED.pack(question_index(question), times)
+        for question, times in book["times_answered"]
+    ]
+    parts.append(_U16.pack(len(question_indexes)))
+    parts.extend(question_parts)
+    parts.append(_I16.pack(current))
+    parts.append(_U16.pack(len(times_answered)))
+    parts.extend(times_answered)
+    parts.append(_U8.pack(len(book["rewards"])))
+    parts.append(struct.pack(f"<{len(book['rewards'])}I", *book["rewards"]))
+    parts.append(_U16.pack(book["reward_count"]))
+
+    deck = snapshot["hider_deck"]
+    parts.append(_U8.pack(deck["max_hand_size"]))
+    for pile in ("hand", "deck", "discard_pile", "drawn"):
+        _pack_cards(parts, deck[pile])
+
+    parts.append(_U64.pack(snapshot["seed"]))
+
+    selection = snapshot["pending_selection"]
+    parts.append(_U8.pack(selection is not None))
+    if selection is not None:
+        parts.append(
+            _SELECTION.pack(
+                selection["selection_id"],
+                selection["num_select"],
+                selection["deadline"],
+                selection["source"],
+            )
+        )
+        _pack_str(parts, selection["reason"])
+        _pack_cards(parts, selection["cards"])
+        group_sizes = selection["group_sizes"]
+        parts.append(_U8.pack(len(group_sizes)))
+        parts.append(struct.pack(f"<{len(group_sizes)}H", *group_sizes))
+
+    return b"".join(parts)
+
+
+class _Reader:
+    """
+    Reads values in order from an encoded snapshot.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, layout: struct.Struct) -> tuple:
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def one(self, layout: struct.Struct) -> Any:
+        return self.unpack(layout)[0]
+
+    def raw(self, length: int) -> bytes:
+        value = self.data[self.offset : self.offset + length]
+        if len(value) != length:
+            raise SnapshotFormatException("Snapshot is truncated")
+        self.offset += length
+        return value
+
+    def str(self) -> str:
+        return self.raw(self.one(_U16)).decode()
+
+    def value(self) -> Any:
+        tag = self.raw(1)
+        if tag == b"n":
+            return None
+        if tag in (b"t", b"f"):
+            return tag == b"t"
+        if tag == b"i":
+            return self.one(_I64)
+        if tag == b"d":
+            return self.one(_F64)
+        if tag == b"s":
+            return self.str()
+        if tag == b"l":
+            return [self.value() for i in range(self.one(_U16))]
+        raise SnapshotFormatException(f"Unknown value tag {tag!r}")
+
+    def cards(self) -> list[int]:
+        return list(self.raw(self.one(_U16)))
+
+
+def _decode_v1(reader: _Reader) -> dict[str, Any]:
+    state, start_time, hide_time_start, delay_start, hider_time_bonus, condition_mask = (
+        reader.unpack(_GAME)
+    )
+
+    players = [reader.str() for i in range(reader.one(_U8))]
+    curr_player = reader.one(_I16)
+    next_player = reader.one(_I16)
+    times = {}
+    for i in range(reader.one(_U8)):
+        player, player_time = reader.unpack(_TIME)
+        times[players[player]] = player_time
+    metadata = json.loads(reader.raw(reader.one(_U32)))
+
+    questions = []
+    for i in range(reader.one(_U16)):
+        question_type = reader.str()
+        fields = {}
+        for j in range(reader.one(_U8)):
+            name = reader.str()
+            fields[name] = reader.value()
+        questions.append({"type": question_type, "fields": fields})
+    current = reader.one(_I16)
+    times_answered = [
+        [questions[question], count]
+        for question, count in (
+            reader.unpack(_TIMES_ANSWERED) for i in range(reader.one(_U16))
+        )
+    ]
+    num_rewards = reader.one(_U8)
+    rewards = list(reader.unpack(struct.Struct(f"<{num_rewards}I")))
+    reward_count = reader.one(_U16)
+
+    max_hand_size = reader.one(_U8)
+    hand = reader.cards()
+    deck = reader.cards()
+    discard_pile = reader.cards()
+    drawn = reader.cards()
+
+    return {
+        "state": STATES[state],
+        "start_time": start_time,
+        "players": players,
+        "curr_player": "" if curr_player == -1 else players[curr_player],
+        "next_player": "" if next_player == -1 else players[next_player],
+        "metadata": metadata,
+        "times": times,
+        "hide_time_start": hide_time_start,
+        "delay_start": delay_start,
+        "hider_time_bonus": hider_time_bonus,
+        "conditions": [
+            condition.name
+            for condition in Condition
+            if condition_mask & (1 << (condition.value - 1))
+        ],
+        "investigation_book": {
+            "current_question": None if current == -1 else questions[current],
+            "times_answered": times_answered,
+            "rewards": rewards,
+            "reward_count": reward_count,
+        },
+        "hider_deck": {
+            "hand": hand,
+            "deck": deck,
+            "discard_pile": discard_pile,
+            "drawn": drawn,
+            "max_hand_size": max_hand_size,
+        },
+    }
+
+
+def _decode_v2(reader: _Reader) -> dict[str, Any]:
+    # Version 2 added the game's seed to the end
+    snapshot = _decode_v1(reader)
+    snapshot["seed"] = reader.one(_U64)
+    return snapshot
+
+
+def _decode_v3(reader: _Reader) -> dict[str, Any]:
+    # Version 3 added the selection the hider is being asked to make, if any
+    snapshot = _decode_v2(reader)
+    snapshot["pending_selection"] = None
+    if reader.one(_U8):
+        selection_id, num_select, deadline, source = reader.unpack(_SELECTION)
+        snapshot["pending_selection"] = {
+            "selection_id": selection_id,
+            "num_select": num_select,
+            "deadline": deadline,
+            "source": source,
+            "reason": reader.str(),
+            "cards": reader.cards(),
+        }
+    return snapshot
+
+
+def _decode_v4(reader: _Reader) -> dict[str, Any]:
+    # Version 4 split the pending selection's cards into groups
+    snapshot = _decode_v3(reader)
+    selection = snapshot["pending_selection"]
+    if selection is not None:
+        num_groups = reader.one(_U8)
+        selection["group_sizes"] = list(reader.unpack(struct.Struct(f"<{num_groups}H")))
+    return snapshot
+
+
+DECODERS: dict[int, Callable[[_Reader], dict[str, Any]]] = {
+    1: _decode_v1,
+    2: _decode_v2,
+    3: _decode_v3,
+    4: _decode_v4,
+}
+
+
+def decode_snapshot(data: bytes) -> dict[str, Any]:
+    """
+    Decodes a snapshot written by any schema version. Raises SnapshotFormatException if the data
+    is not a snapshot, or was written by a newer version.
+
+    :param data: Snapshot as returned by encode_snapshot.
+    :type data: bytes
+    :return: The game, in the form that GameState.load_snapshot takes.
+    :rtype: dict[str, Any]
+    """
+    reader = _Reader(data)
+    try:
+        magic, version = reader.unpack(_HEADER)
+        if magic != MAGIC:
+            raise SnapshotFormatException("Not a game snapshot")
+        decoder = DECODERS.get(version)
+        if decoder is None:
+            raise SnapshotFormatException(f"Unknown snapshot schema version {version}")
+        return decoder(reader)
+    except (struct.error, IndexError, UnicodeDecodeError, ValueError) as error:
+        raise SnapshotFormatException("Snapshot is corrupt") from error
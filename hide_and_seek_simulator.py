@@ -0,0 +1,448 @@
+"""
+This file plays hide and seek rounds headlessly, so that values in hide_and_seek.cfg and the
+hider deck can be tuned from data rather than by feel. Each round drives a real GameState on a
+VirtualClock, with a ScriptedFrontend standing in for the players and pluggable policies deciding
+what the seekers and hider do. Rounds are split into fixed size chunks that run across a process
+pool, and each chunk is seeded from the base seed and its own index, so results do not depend on
+the number of workers.
+
+Usage: python hide_and_seek_simulator.py [--rounds 100000] [--workers 8] [--seed 0]
+    [--set HIDING_TIME=1800 --set DEFAULT_MAX_HAND_SIZE=5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+import hide_and_seek_game_state as game_state
+from clock import VirtualClock
+from hide_and_seek_game_state import GameState
+from hide_and_seek_interfaces import Card, Curse, Frontend, PendingSelection, QuestionInstance
+from hide_and_seek_questions import QuestionManager, ThermometerQuestion
+from hide_and_seek_rng import RandomStream
+from task_scheduler import TaskScheduler
+
+START_TIME = 1_700_000_000
+
+# Settings from hide_and_seek.cfg that can be overridden for a simulation
+TUNABLE_SETTINGS = ("HIDING_TIME", "PLANNING_TIME", "MAX_SEEKING_TIME", "DEFAULT_MAX_HAND_SIZE")
+
+
+class HiderPolicy(ABC):
+    """
+    Decides what the simulated hider does.
+    """
+
+    @abstractmethod
+    def select_cards(
+        self, cards: list[Card], num_select: int, reason: str, rng: random.Random
+    ) -> list[int]:
+        """
+        :return: Indices of the num_select cards chosen for a PendingSelection.
+        :rtype: list[int]
+        """
+
+    @abstractmethod
+    def answer_delay(self, question: QuestionInstance, rng: random.Random) -> float:
+        """
+        :return: Number of seconds the hider takes to answer a question.
+        :rtype: float
+        """
+
+    @abstractmethod
+    def choose_discard(self, hand: list[Card], rng: random.Random) -> Card:
+        """
+        :return: Card to discard when the hand is over the maximum size.
+        :rtype: Card
+        """
+
+
+class SeekerPolicy(ABC):
+    """
+    Decides what the simulated seekers do.
+    """
+
+    @abstractmethod
+    def catch_delay(self, rng: random.Random) -> float:
+        """
+        :return: Number of seconds after being released that the seekers catch the hider.
+        :rtype: float
+        """
+
+    @abstractmethod
+    def question_interval(self, rng: random.Random) -> float:
+        """
+        :return: Number of seconds to wait before asking the next question.
+        :rtype: float
+        """
+
+    @abstractmethod
+    def next_question(self, game: GameState, rng: random.Random) -> QuestionInstance | None:
+        """
+        :return: Question to ask next, or None to stop asking questions this round.
+        :rtype: QuestionInstance | None
+        """
+
+
+class GreedyHider(HiderPolicy):
+    """
+    Keeps the cards with the biggest time bonuses, discards the smallest, and answers at a
+    uniformly random point up to late_factor times the allocated time.
+    """
+
+    def __init__(self, late_factor: float = 1.1):
+        self.late_factor = late_factor
+
+    def select_cards(
+        self, cards: list[Card], num_select: int, reason: str, rng: random.Random
+    ) -> list[int]:
+        ranked = sorted(range(len(cards)), key=lambda i: cards[i].get_time_bonus(), reverse=True)
+        if reason == "discard":
+            ranked.reverse()
+        return ranked[:num_select]
+
+    def answer_delay(self, question: QuestionInstance, rng: random.Random) -> float:
+        return rng.uniform(0, question.get_allocated_time() * self.late_factor)
+
+    def choose_discard(self, hand: list[Card], rng: random.Random) -> Card:
+        return min(hand, key=lambda card: card.get_time_bonus())
+
+
+class RandomSeeker(SeekerPolicy):
+    """
+    Asks uniformly random questions at exponentially distributed intervals, and catches the
+    hider after an exponentially distributed time.
+    """
+
+    def __init__(self, mean_catch_time: float = 5400, mean_question_interval: float = 600):
+        self.mean_catch_time = mean_catch_time
+        self.mean_question_interval = mean_question_interval
+        self.questions = [
+            question
+            for question in QuestionManager().questions
+            if not isinstance(question, ThermometerQuestion)
+        ]
+
+    def catch_delay(self, rng: random.Random) -> float:
+        return rng.expovariate(1 / self.mean_catch_time)
+
+    def question_interval(self, rng: random.Random) -> float:
+        return rng.expovariate(1 / self.mean_question_interval)
+
+    def next_question(self, game: GameState, rng: random.Random) -> QuestionInstance | None:
+        return rng.choice(self.questions).to_instance("")
+
+
+class ScriptedFrontend(Frontend):
+    """
+    A frontend with nobody behind it. Selections are kept until make_selections answers them
+    from the hider policy, one group of cards at a time, and the result of the round is kept for
+    the simulator.
+    """
+
+    def __init__(self, hider: HiderPolicy, rng: random.Random):
+        self.hider = hider
+        self.rng = rng
+        self.last_result: int | None = None
+        self.expired_questions = 0
+        self.pending: list[PendingSelection] = []
+
+    async def request_selection(self, selection: PendingSelection):
+        self.pending.append(selection)
+
+    async def selection_expired(self, selection: PendingSelection, chosen: list[Card]):
+        self.pending.remove(selection)
+
+    async def make_selections(self, game: GameState):
+        """
+        Answers every selection the game asks for, including those asked for while answering.
+        """
+        while self.pending:
+            selection = self.pending.pop(0)
+            chosen = []
+            for group in selection.get_groups():
+                chosen.extend(
+                    group[i]
+                    for i in self.hider.select_cards(
+                        [selection.cards[i] for i in group],
+                        selection.num_select,
+                        selection.reason,
+                        self.rng,
+                    )
+                )
+            await game.resolve_selection(selection.selection_id, chosen)
+
+    async def announce_round_start(self, hiding_time_end: int):
+        pass
+
+    async def announce_seekers_released(self):
+        pass
+
+    async def pose_question(self, question: QuestionInstance):
+        pass
+
+    async def question_time_expired(self):
+        self.expired_questions += 1
+
+    async def reveal_answer(
+        self, question: QuestionInstance, answer: str, penalty: int | None = None
+    ):
+        pass
+
+    async def announce_next_player(self, next_player: str, last_result: int | None = None):
+        if last_result is not None:
+            self.last_result = last_result
+
+    async def announce_seeking_time_expired(self):
+        pass
+
+    async def announce_curse(self, card: Curse):
+        pass
+
+
+@dataclass(frozen=True)
+class RoundResult:
+    hiding_time: int
+    hand_size: int
+    time_bonus: int
+    questions: int
+    expired_questions: int
+
+
+async def play_round(
+    seeker: SeekerPolicy, hider: HiderPolicy, rng: random.Random, seed: int | None = None
+) -> RoundResult:
+    """
+    Plays a single round of a fresh game to the end.
+
+    :param seeker: What the seekers do.
+    :type seeker: SeekerPolicy
+    :param hider: What the hider does.
+    :type hider: HiderPolicy
+    :param rng: Source of randomness for the policies.
+    :type rng: random.Random
+    :param seed: Seed of the game, or None for a fresh one.
+    :type seed: int | None
+    :return: How the round went.
+    :rtype: RoundResult
+    """
+    clock = VirtualClock(START_TIME)
+    scheduler = TaskScheduler(clock=clock)
+    frontend = ScriptedFrontend(hider, rng)
+    game = GameState(START_TIME, ["hider", "next hider"], frontend, scheduler, seed=seed)
+
+    release_time = START_TIME + game_state.HIDING_TIME
+    await scheduler.run_until_idle(release_time)
+    end_time = release_time + min(seeker.catch_delay(rng), game_state.MAX_SEEKING_TIME)
+
+    questions = 0
+    while True:
+        ask_time = clock.time() + seeker.question_interval(rng)
+        if ask_time >= end_time:
+            break
+        await scheduler.run_until_idle(ask_time)
+        question = seeker.next_question(game, rng)
+        if question is None:
+            break
+        await game.ask_question(question)
+        questions += 1
+
+        answer_time = clock.time() + hider.answer_delay(question, rng)
+        if answer_time >= end_time:
+            break
+        await scheduler.run_until_idle(answer_time)
+        await game.answered_question(rng.choice(question.get_options()))
+        await frontend.make_selections(game)
+        while not game.hider_deck.is_legal_hand():
+            game.hider_deck.discard(hider.choose_discard(game.hider_deck.hand, rng))
+
+    await scheduler.run_until_idle(end_time)
+    hand_size = game.hider_deck.get_hand_size()
+    time_bonus = game.hider_deck.count_time_bonuses()
+    await game.hider_caught()
+    assert frontend.last_result is not None
+    return RoundResult(
+        frontend.last_result, hand_size, time_bonus, questions, frontend.expired_questions
+    )
+
+
+def apply_settings(settings: dict[str, int]):
+    """
+    Overrides settings from hide_and_seek.cfg in this process.
+
+    :param settings: New values, keyed by names from TUNABLE_SETTINGS.
+    :type settings: dict[str, int]
+    """
+    for name, value in settings.items():
+        if name not in TUNABLE_SETTINGS:
+            raise ValueError(f"{name} cannot be tuned, choose from {TUNABLE_SETTINGS}")
+        setattr(game_state, name, value)
+
+
+def run_chunk(
+    chunk: int,
+    num_rounds: int,
+    seed: int,
+    seeker: SeekerPolicy,
+    hider: HiderPolicy,
+    settings: dict[str, int],
+) -> list[RoundResult]:
+    """
+    Plays a chunk of rounds in this process. Runs in the pool's worker processes.
+
+    :param chunk: Index of the chunk, which together with seed fixes its randomness.
+    :type chunk: int
+    :return: The result of each round.
+    :rtype: list[RoundResult]
+    """
+    apply_settings(settings)
+    # Each game gets its own seed, and the policies their own generator
+    stream = RandomStream(seed).spawn(chunk)
+    rng = random.Random(stream.spawn("policy").getrandbits(64))
+
+    async def play_all() -> list[RoundResult]:
+        return [
+            await play_round(seeker, hider, rng, stream.spawn("game", i).getrandbits(64))
+            for i in range(num_rounds)
+        ]
+
+    return asyncio.run(play_all())
+
+
+def simulate(
+    num_rounds: int,
+    seeker: SeekerPolicy,
+    hider: HiderPolicy,
+    workers: int | None = None,
+    seed: int = 0,
+    chunk_size: int = 500,
+    settings: dict[str, int] | None = None,
+) -> list[RoundResult]:
+    """
+    Plays many rounds across a process pool.
+
+    :param num_rounds: Number of rounds to play.
+    :type num_rounds: int
+    :param seeker: What the seekers do. Must be picklable.
+    :type seeker: SeekerPolicy
+    :param hider: What the hider does. Must be picklable.
+    :type hider: HiderPolicy
+    :param workers: Number of processes, or None for one per CPU. With 1 no pool is used.
+    :type workers: int | None
+    :param seed: Base seed. The same seed, rounds and chunk size give the same results.
+    :type seed: int
+    :param chunk_size: Number of rounds each task in the pool plays.
+    :type chunk_size: int
+    :param settings: Overrides for settings from hide_and_seek.cfg.
+    :type settings: dict[str, int] | None
+    :return: The result of every round, in chunk order.
+    :rtype: list[RoundResult]
+    """
+    settings = settings if settings is not None else {}
+    chunks = [
+        (chunk, min(chunk_size, num_rounds - start))
+        for chunk, start in enumerate(range(0, num_rounds, chunk_size))
+    ]
+    if workers == 1:
+        return [
+            result
+            for chunk, size in chunks
+            for result in run_chunk(chunk, size, seed, seeker, hider, settings)
+        ]
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(run_chunk, chunk, size, seed, seeker, hider, settings)
+            for chunk, size in chunks
+        ]
+        return [result for future in futures for result in future.result()]
+
+
+def summarise(results: list[RoundResult]) -> dict[str, Any]:
+    """
+    :param results: Results of the simulated rounds.
+    :type results: list[RoundResult]
+    :return: Distributions of hiding time, hand size and time bonus, as plain data.
+    :rtype: dict[str, Any]
+    """
+    hiding_times = sorted(result.hiding_time for result in results)
+    deciles = statistics.quantiles(hiding_times, n=10) if len(results) > 1 else hiding_times
+    return {
+        "rounds": len(results),
+        "hiding_time": {
+            "mean": statistics.fmean(hiding_times),
+            "stdev": statistics.pstdev(hiding_times),
+            "min": hiding_times[0],
+            "p10": deciles[0],
+            "p50": statistics.median(hiding_times),
+            "p90": deciles[-1],
+            "max": hiding_times[-1],
+        },
+        "hand_size": dict(sorted(Counter(result.hand_size for result in results).items())),
+        "time_bonus_mean": statistics.fmean(result.time_bonus for result in results),
+        "questions_mean": statistics.fmean(result.questions for result in results),
+        "expired_questions_mean": statistics.fmean(
+            result.expired_questions for result in results
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--mean-catch-time", type=float, default=5400)
+    parser.add_argument("--mean-question-interval", type=float, default=600)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help=f"Override a setting, one of {', '.join(TUNABLE_SETTINGS)}",
+    )
+    args = parser.parse_args()
+
+    settings = {}
+    for setting in args.set:
+        name, _, value = setting.partition("=")
+        settings[name.strip()] = int(value)
+
+    start = time.perf_counter()
+    results = simulate(
+        args.rounds,
+        RandomSeeker(args.mean_catch_time, args.mean_question_interval),
+        GreedyHider(),
+        args.workers,
+        args.seed,
+        args.chunk_size,
+        settings,
+    )
+    elapsed = time.perf_counter() - start
+    summary = summarise(results)
+
+    print(f"{summary['rounds']:,} rounds in {elapsed:.1f}s with {args.workers} workers")
+    print("Hiding time (s): " + ", ".join(
+        f"{name} {value:.0f}" for name, value in summary["hiding_time"].items()
+    ))
+    print(f"Time bonus in hand (s): mean {summary['time_bonus_mean']:.0f}")
+    print(
+        f"Questions per round: mean {summary['questions_mean']:.2f}, "
+        f"expired {summary['expired_questions_mean']:.2f}"
+    )
+    print("Hand size at catch:")
+    for size, count in summary["hand_size"].items():
+        print(f"  {size:>2} | {count / len(results):>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
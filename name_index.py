@@ -0,0 +1,149 @@
+"""
+This file holds an index of names for serving autocomplete. Discord asks for suggestions on every
+character typed and gives little time to answer, so queries should not scan every name.
+"""
+
+from collections import Counter, OrderedDict
+from typing import Iterable
+
+# Substrings up to this long are indexed directly, longer queries intersect their n-grams
+NGRAM_LENGTH = 3
+
+
+class NameIndex:
+    """
+    Finds the names that contain some text, ignoring case. Each name is case folded once, when it
+    is added, and listed under every substring of it up to NGRAM_LENGTH characters long. A short
+    query is answered straight from its list, and a longer one only checks the names listed under
+    all of its n-grams, so a query costs about as much as the names it matches.
+
+    Names can be added more than once, for example a hand holding two copies of a card, and are
+    only dropped once every copy is removed. Results of recent queries are kept in a small LRU
+    cache, which is cleared whenever the names change.
+    """
+
+    def __init__(self, names: Iterable[str] = (), cache_size: int = 256):
+        """
+        :param names: Names to start with.
+        :type names: Iterable[str]
+        :param cache_size: Number of recent queries to keep the results of.
+        :type cache_size: int
+        """
+        self.cache_size = cache_size
+        self._counts: Counter[str] = Counter()
+        self._folded: dict[str, str] = {}
+        self._postings: dict[str, set[str]] = {}
+        self._cache: OrderedDict[tuple[str, int], list[str]] = OrderedDict()
+        for name in names:
+            self.add(name)
+
+    @staticmethod
+    def _ngrams(folded: str) -> set[str]:
+        return {
+            folded[start : start + length]
+            for length in range(1, NGRAM_LENGTH + 1)
+            for start in range(len(folded) - length + 1)
+        }
+
+    def add(self, name: str):
+        """
+        :param name: Name to add.
+        :type name: str
+        """
+        self._counts[name] += 1
+        if self._counts[name] > 1:
+            return
+        folded = name.casefold()
+        self._folded[name] = folded
+        for ngram in self._ngrams(folded):
+            self._postings.setdefault(ngram, set()).add(name)
+        self._cache.clear()
+
+    def remove(self, name: str):
+        """
+        Removes one copy of a name. Does nothing if the name is not in the index.
+
+        :param name: Name to remove.
+        :type name: str
+        """
+        if name not in self._counts:
+            return
+        self._counts[name] -= 1
+        if self._counts[name] > 0:
+            return
+        del self._counts[name]
+        for ngram in self._ngrams(self._folded.pop(name)):
+            postings = self._postings[ngram]
+            postings.discard(name)
+            if not postings:
+                del self._postings[ngram]
+        self._cache.clear()
+
+    def sync(self, names: Iterable[str]):
+        """
+        Adds and removes names so that the index holds exactly these, touching only the names
+        whose count changed.
+
+        :param names: Every name that should be in the index, with repeats for copies.
+        :type names: Iterable[str]
+        """
+        wanted = Counter(names)
+        for name, count in wanted.items():
+            for i in range(count - self._counts[name]):
+                self.add(name)
+        for name, count in list(self._counts.items()):
+            for i in range(count - wanted[name]):
+                self.remove(name)
+
+    def search(self, user_input: str, limit: int = 25) -> list[str]:
+        """
+        Finds names containing the input. Names that start with it come first, then the rest,
+        each in alphabetical order. The returned list is shared with the cache, so it must not be
+        changed.
+
+        :param user_input: What the user has typed.
+        :type user_input: str
+        :param limit: Most names to return.
+        :type limit: int
+        :return: Matching names, each once.
+        :rtype: list[str]
+        """
+        folded_input = user_input.casefold()
+        key = (folded_input, limit)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        if folded_input == "":
+            candidates: Iterable[str] = self._counts
+        elif len(folded_input) <= NGRAM_LENGTH:
+            candidates = self._postings.get(folded_input, ())
+        else:
+            postings = sorted(
+                (
+                    self._postings.get(folded_input[start : start + NGRAM_LENGTH], set())
+                    for start in range(len(folded_input) - NGRAM_LENGTH + 1)
+                ),
+                key=len,
+            )
+            candidates = [
+                name
+                for name in postings[0].intersection(*postings[1:])
+                if folded_input in self._folded[name]
+            ]
+        result = sorted(
+            candidates,
+            key=lambda name: (not self._folded[name].startswith(folded_input), name),
+        )[:limit]
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._counts
+
+    def __len__(self) -> int:
+        return len(self._counts)
@@ -0,0 +1,411 @@
+"""
+This file holds the queue that outgoing messages wait in between the game and the chat service.
+The game only ever adds to the queue, so it never waits on the network, while a worker delivers
+the messages as fast as the service's rate limits allow.
+"""
+
+import asyncio
+import collections
+import enum
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+from clock import Clock, SYSTEM_CLOCK
+from hide_and_seek_exceptions import OutboundQueueFullException
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+    """
+    How urgently a message should be delivered. Lower values go first.
+    """
+
+    QUESTION = 0
+    """A question being posed or answered, which the game is waiting on"""
+    INTERACTION = 1
+    """A prompt that a player has to respond to"""
+    ANNOUNCEMENT = 2
+    """Everything else"""
+
+
+class TokenBucket:
+    """
+    Allows rate sends per second on average, and up to capacity sends at once.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def ready_at(self, now: float) -> float:
+        """
+        :param now: The current time.
+        :type now: float
+        :return: When the next send is allowed, which may be now.
+        :rtype: float
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+@dataclass(eq=False)
+class OutboundMessage:
+    route: Hashable
+    content: str | None
+    kwargs: dict[str, Any]
+    priority: Priority
+    seq: int
+    future: asyncio.Future = field(repr=False)
+    taken: bool = False
+
+    @property
+    def coalescable(self) -> bool:
+        # Only plain text can be joined with other messages
+        return not self.kwargs and self.content is not None
+
+
+@dataclass(eq=False)
+class RouteQueue:
+    """
+    The messages waiting on one route, oldest first, and where the route is in the scheduling.
+    """
+
+    bucket: TokenBucket
+    messages: collections.deque[OutboundMessage] = field(default_factory=collections.deque)
+    # Heap of the messages by urgency, from which taken messages are only removed once on top
+    urgent: list[tuple[int, int, OutboundMessage]] = field(default_factory=list)
+    busy: bool = False
+    # The route's live entry in the ready or throttled heap, if it is in either
+    entry: tuple | None = None
+    throttled: bool = False
+
+    def most_urgent(self) -> tuple[int, int] | None:
+        """
+        :return: The priority and sequence number of the route's most urgent message, or None if
+            it has none.
+        :rtype: tuple[int, int] | None
+        """
+        while self.urgent and self.urgent[0][2].taken:
+            heapq.heappop(self.urgent)
+        return self.urgent[0][:2] if self.urgent else None
+
+
+class OutboundQueue:
+    """
+    Delivers each route's messages, such as a channel's, in the order they were queued, with
+    only one send in flight at a time, so they arrive in that order. Priority only decides
+    between routes: the route holding the most urgent message, oldest first within a priority,
+    sends its oldest message next. An urgent message therefore also hurries along the messages
+    queued before it on its route. Each route has its own token bucket, and there is one more
+    for all routes together, so a busy channel does not hold up the others. When a plain text
+    message is delivered, the plain text messages queued straight after it on the same route
+    are joined onto it, up to max_coalesced_length characters, and sent as one.
+
+    Adding a message never waits. Once depth reaches high_water, a warning is logged and
+    congested is set, until the queue drains to half of that. At max_depth, a new message pushes
+    out the newest queued message of a lower priority, or is refused with
+    OutboundQueueFullException if there is none.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[Hashable, str | None, dict[str, Any]], Awaitable[Any]],
+        route_rate: float = 1,
+        route_burst: float = 5,
+        global_rate: float = 50,
+        global_burst: float = 50,
+        max_in_flight: int = 8,
+        high_water: int = 100,
+        max_depth: int = 1000,
+        max_coalesced_length: int = 2000,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        """
+        :param deliver: Sends one message, given its route, content and keyword arguments.
+        :type deliver: Callable[[Hashable, str | None, dict[str, Any]], Awaitable[Any]]
+        :param route_rate: Sends per second allowed on each route.
+        :type route_rate: float
+        :param route_burst: Sends allowed at once on each route.
+        :type route_burst: float
+        :param global_rate: Sends per second allowed across all routes.
+        :type global_rate: float
+        :param global_burst: Sends allowed at once across all routes.
+        :type global_burst: float
+        :param max_in_flight: Most sends waiting on the network at once.
+        :type max_in_flight: int
+        :param high_water: Depth at which the queue counts as congested.
+        :type high_water: int
+        :param max_depth: Most messages that can be queued.
+        :type max_depth: int
+        :param max_coalesced_length: Longest message that coalescing can make.
+        :type max_coalesced_length: int
+        :param clock: Source of the time.
+        :type clock: Clock
+        """
+        self.deliver = deliver
+        self.route_rate = route_rate
+        self.route_burst = route_burst
+        self.max_in_flight = max_in_flight
+        self.high_water = high_water
+        self.max_depth = max_depth
+        self.max_coalesced_length = max_coalesced_length
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock.time())
+        self.congested = False
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._routes: dict[Hashable, RouteQueue] = {}
+        # Routes that may send, by their most urgent message, and routes waiting on their token
+        # bucket, by when they may send. Busy and empty routes are in neither.
+        self._ready: list[tuple[int, int, int, RouteQueue]] = []
+        self._throttled: list[tuple[float, int, RouteQueue]] = []
+        # Breaks ties between heap entries, so that routes are never compared
+        self._entries = itertools.count()
+        self._depth = 0
+        self._seq = itertools.count()
+        self._in_flight: set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of messages waiting to be sent.
+        """
+        return self._depth
+
+    def enqueue(
+        self,
+        route: Hashable,
+        content: str | None = None,
+        priority: Priority = Priority.ANNOUNCEMENT,
+        **kwargs,
+    ) -> asyncio.Future:
+        """
+        Queues a message without waiting. Raises OutboundQueueFullException if the queue is full
+        of messages at least as urgent.
+
+        :param route: Where the message goes, such as a channel.
+        :type route: Hashable
+        :param content: Text of the message.
+        :type content: str | None
+        :param priority: How urgent the message is.
+        :type priority: Priority
+        :param kwargs: Anything else to deliver with the message, such as embeds.
+        :return: Resolves to what deliver returned once the message is sent, or to its error.
+            Errors are also logged, so the future can be ignored.
+        :rtype: asyncio.Future
+        """
+        if self._depth >= self.max_depth:
+            self._evict(priority)
+        message = OutboundMessage(
+            route,
+            content,
+            kwargs,
+            priority,
+            next(self._seq),
+            asyncio.get_running_loop().create_future(),
+        )
+        queue = self._route(route)
+        queue.messages.append(message)
+        heapq.heappush(queue.urgent, (priority, message.seq, message))
+        if queue.busy:
+            pass  # Placed again once its send finishes
+        elif queue.entry is None:
+            self._schedule(queue, self.clock.time())
+        elif not queue.throttled and (priority, message.seq) < queue.entry[:2]:
+            # Moves the route up the ready heap, leaving its old entry behind as stale
+            self._push_ready(queue, (priority, message.seq))
+        self._depth += 1
+        self._idle.clear()
+        if not self.congested and self._depth >= self.high_water:
+            self.congested = True
+            logger.warning("Outbound queue is congested with %d messages", self._depth)
+        self._wakeup.set()
+        return message.future
+
+    def _evict(self, priority: Priority):
+        candidates = [
+            message
+            for queue in self._routes.values()
+            for message in queue.messages
+            if message.priority > priority
+        ]
+        if not candidates:
+            raise OutboundQueueFullException()
+        victim = max(candidates, key=lambda message: (message.priority, message.seq))
+        self._take(victim)
+        self.dropped += 1
+        self._fail([victim], OutboundQueueFullException())
+
+    def _take(self, message: OutboundMessage):
+        message.taken = True
+        messages = self._routes[message.route].messages
+        if messages[0] is message:
+            messages.popleft()
+        else:
+            messages.remove(message)
+        self._depth -= 1
+        if self.congested and self._depth <= self.high_water // 2:
+            self.congested = False
+
+    def _route(self, route: Hashable) -> RouteQueue:
+        queue = self._routes.get(route)
+        if queue is None:
+            queue = self._routes[route] = RouteQueue(
+                TokenBucket(self.route_rate, self.route_burst, self.clock.time())
+            )
+        return queue
+
+    def _push_ready(self, queue: RouteQueue, urgency: tuple[int, int]):
+        queue.entry = (*urgency, next(self._entries), queue)
+        queue.throttled = False
+        heapq.heappush(self._ready, queue.entry)
+
+    def _schedule(self, queue: RouteQueue, now: float):
+        """
+        Puts a route that is not busy in the ready or throttled heap, if it has messages.
+        """
+        urgency = queue.most_urgent()
+        if urgency is None:
+            queue.entry = None
+            return
+        ready_at = queue.bucket.ready_at(now)
+        if ready_at > now:
+            queue.entry = (ready_at, next(self._entries), queue)
+            queue.throttled = True
+            heapq.heappush(self._throttled, queue.entry)
+        else:
+            self._push_ready(queue, urgency)
+
+    def _next_batch(self, now: float) -> tuple[list[OutboundMessage] | None, float | None]:
+        """
+        Takes the oldest message of the route holding the most urgent message that may send now,
+        with the messages coalesced onto it. Otherwise returns when the next one could be sent.
+        """
+        global_ready = self.global_bucket.ready_at(now)
+        if global_ready > now:
+            return None, global_ready
+
+        while self._throttled and self._throttled[0][0] <= now:
+            entry = heapq.heappop(self._throttled)
+            queue = entry[2]
+            if queue.entry is entry:
+                self._schedule(queue, now)
+
+        while self._ready:
+            entry = heapq.heappop(self._ready)
+            queue = entry[3]
+            if queue.entry is not entry:
+                continue
+            urgency = queue.most_urgent()
+            if urgency != entry[:2]:
+                # Its most urgent message was pushed out, so it is placed again
+                self._schedule(queue, now)
+                continue
+            queue.entry = None
+            batch = self._coalesce(queue.messages[0])
+            queue.busy = True
+            return batch, None
+        return None, self._throttled[0][0] if self._throttled else None
+
+    def _coalesce(self, message: OutboundMessage) -> list[OutboundMessage]:
+        batch = [message]
+        if message.coalescable:
+            following = self._routes[message.route].messages
+            length = len(message.content or "")
+            for other in itertools.islice(following, 1, None):
+                if not other.coalescable:
+                    break
+                length += 1 + len(other.content or "")
+                if length > self.max_coalesced_length:
+                    break
+                batch.append(other)
+        for taken in batch:
+            self._take(taken)
+        return batch
+
+    def _fail(self, batch: list[OutboundMessage], error: BaseException):
+        for message in batch:
+            if not message.future.done():
+                message.future.set_exception(error)
+                # Nobody has to wait on the future, so the error must not go unretrieved
+                message.future.exception()
+
+    async def _send(self, batch: list[OutboundMessage]):
+        first = batch[0]
+        content = first.content
+        if len(batch) > 1:
+            content = "\n".join(message.content or "" for message in batch)
+            self.coalesced += len(batch) - 1
+        try:
+            result = await self.deliver(first.route, content, first.kwargs)
+        except Exception as error:
+            logger.warning("Could not send to %s: %r", first.route, error)
+            self._fail(batch, error)
+        else:
+            self.sent += 1
+            for message in batch:
+                if not message.future.done():
+                    message.future.set_result(result)
+        finally:
+            queue = self._routes[first.route]
+            queue.busy = False
+            self._schedule(queue, self.clock.time())
+
+    def _finished(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        self._wakeup.set()
+
+    async def run(self):
+        """
+        Delivers messages until cancelled.
+        """
+        while True:
+            self._wakeup.clear()
+            deadline = None
+            if len(self._in_flight) < self.max_in_flight:
+                now = self.clock.time()
+                batch, deadline = self._next_batch(now)
+                if batch is not None:
+                    self.global_bucket.take(now)
+                    self._routes[batch[0].route].bucket.take(now)
+                    task = asyncio.create_task(self._send(batch))
+                    self._in_flight.add(task)
+                    task.add_done_callback(self._finished)
+                    continue
+            if self._depth == 0 and not self._in_flight:
+                self._idle.set()
+            await self.clock.wait_until(deadline, self._wakeup)
+
+    def start(self):
+        """
+        Starts delivering messages in the background. Does nothing if already started.
+        """
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self.run())
+
+    async def drain(self):
+        """
+        Waits until every queued message has been sent or has failed.
+        """
+        await self._idle.wait()
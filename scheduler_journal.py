@@ -0,0 +1,155 @@
+"""
+This file holds the journal that lets the TaskScheduler recover its pending timers after the
+process restarts.
+"""
+
+import json
+import os
+from typing import Any
+
+
+class SchedulerJournal:
+    """
+    An append-only journal of timers, stored as one JSON record per line. An "add" record is
+    written when a timer is scheduled and a "done" record when it fires or is cancelled.
+
+    Records are buffered and written with a single fsync once batch_size of them are waiting, or
+    whenever flush is called. The journal also keeps the live timers in memory, and once the file
+    holds more than compaction_ratio records per live timer it is rewritten with only the live
+    ones. So the file, and therefore recovery time, stays proportional to the number of live
+    timers rather than to the length of the history.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 64,
+        compaction_ratio: int = 4,
+        min_compaction_records: int = 1024,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.compaction_ratio = compaction_ratio
+        self.min_compaction_records = min_compaction_records
+        self.live: dict[int, tuple[float, str, list[Any]]] = {}
+        self.pending: list[bytes] = []
+        self.records = self._load()
+        self.file = open(self.path, "ab")
+
+    def _load(self) -> int:
+        """
+        Rebuilds the live timers in one streaming pass over the file. A partially written final
+        record, left by a crash, is cut off.
+
+        :return: Number of records in the file.
+        :rtype: int
+        """
+        if not os.path.exists(self.path):
+            return 0
+
+        records = 0
+        valid_length = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record["op"] == "add":
+                    self.live[record["id"]] = (record["time"], record["key"], record["args"])
+                else:
+                    self.live.pop(record["id"], None)
+                records += 1
+                valid_length += len(line)
+
+        if valid_length != os.path.getsize(self.path):
+            with open(self.path, "r+b") as file:
+                file.truncate(valid_length)
+        return records
+
+    def _append(self, record: dict[str, Any]):
+        self.pending.append(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def record_add(self, task_id: int, task_time: float, key: str, args: tuple):
+        """
+        Records that a timer has been scheduled.
+
+        :param task_id: Identifier of the timer, unique within this journal.
+        :type task_id: int
+        :param task_time: The epoch time that the timer is due.
+        :type task_time: float
+        :param key: Name that the timer's function can be looked up by after a restart.
+        :type key: str
+        :param args: Arguments for the timer's function, which must be JSON serialisable.
+        :type args: tuple
+        """
+        self.live[task_id] = (task_time, key, list(args))
+        self._append({"op": "add", "id": task_id, "time": task_time, "key": key, "args": args})
+
+    def record_done(self, task_id: int):
+        """
+        Records that a timer has fired or been cancelled.
+
+        :param task_id: Identifier the timer was added with.
+        :type task_id: int
+        """
+        if self.live.pop(task_id, None) is not None:
+            self._append({"op": "done", "id": task_id})
+
+    def flush(self):
+        """
+        Writes every buffered record and waits for them to reach the disk. Compacts the journal
+        afterwards if it has grown too long.
+        """
+        if len(self.pending) == 0:
+            return
+        self.file.write(b"".join(self.pending))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records += len(self.pending)
+        self.pending = []
+
+        if self.records > max(
+            self.min_compaction_records, self.compaction_ratio * len(self.live)
+        ):
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrites the journal so that it only contains the live timers. The new file is written
+        alongside the old one and swapped in atomically.
+        """
+        # Anything still buffered is already reflected in the live timers
+        self.pending = []
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as file:
+            for task_id, (task_time, key, args) in self.live.items():
+                record = {"op": "add", "id": task_id, "time": task_time, "key": key, "args": args}
+                file.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.file.close()
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, "ab")
+        self.records = len(self.live)
+
+    def live_timers(self) -> list[tuple[int, float, str, list[Any]]]:
+        """
+        :return: Every live timer as (id, time, key, args), in the order they are due.
+        :rtype: list[tuple[int, float, str, list[Any]]]
+        """
+        return sorted(
+            ((task_id, *timer) for task_id, timer in self.live.items()),
+            key=lambda timer: (timer[1], timer[0]),
+        )
+
+    def close(self):
+        """
+        Flushes and closes the journal.
+        """
+        self.flush()
+        self.file.close()
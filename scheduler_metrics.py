@@ -0,0 +1,215 @@
+"""
+This file holds the instrumentation that the TaskScheduler records while it runs, so that an
+overloaded event loop can be spotted before players notice missed deadlines.
+"""
+
+import bisect
+import logging
+from collections import deque
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the histogram buckets. Anything above the last bound is counted
+# in a final overflow bucket.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """
+    A histogram with fixed buckets, so recording a value costs one binary search and never
+    allocates.
+    """
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        """
+        :param value: Value to add to the histogram.
+        :type value: float
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        """
+        :param percent: Percentile to find, between 0 and 100.
+        :type percent: float
+        :return: Upper bound of the bucket holding the percentile, or the largest value seen if
+            that is in the overflow bucket.
+        :rtype: float
+        """
+        target = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target and seen > 0:
+                return bound
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        :return: The histogram as plain data.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.counts)),
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+        }
+
+
+class TaskStats:
+    """
+    Runtime statistics for every task that calls the same function.
+    """
+
+    def __init__(self):
+        self.runtime = Histogram()
+        self.failures = 0
+        self.timeouts = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        :return: The statistics as plain data.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "runtime": self.runtime.snapshot(),
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+        }
+
+
+class SchedulerMetrics:
+    """
+    Keeps track of how late tasks fire, how long they run for, and how many are waiting.
+    Tasks that run for longer than slow_task_threshold seconds are logged, and the most recent
+    of them are kept in slow_tasks.
+    """
+
+    def __init__(self, slow_task_threshold: float = 1.0, slow_task_log_size: int = 100):
+        self.slow_task_threshold = slow_task_threshold
+        self.lateness = Histogram()
+        self.tasks: dict[str, TaskStats] = {}
+        self.slow_tasks: deque[tuple[str, float, float]] = deque(maxlen=slow_task_log_size)
+        self.pending = 0
+        self.max_pending = 0
+        self.running = 0
+        self.max_running = 0
+
+    def record_started(self, lateness: float):
+        """
+        Called when a task starts running.
+
+        :param lateness: Number of seconds after its due time that the task started.
+        :type lateness: float
+        """
+        self.lateness.record(max(0.0, lateness))
+
+    def record_finished(
+        self, name: str, task_time: float, runtime: float, outcome: str = "ok"
+    ):
+        """
+        Called when a task finishes running.
+
+        :param name: Name of the task's function.
+        :type name: str
+        :param task_time: The epoch time that the task was due.
+        :type task_time: float
+        :param runtime: Number of seconds the task ran for.
+        :type runtime: float
+        :param outcome: One of "ok", "failed" or "timeout".
+        :type outcome: str
+        """
+        stats = self.tasks.get(name)
+        if stats is None:
+            stats = self.tasks[name] = TaskStats()
+        stats.runtime.record(runtime)
+        if outcome == "failed":
+            stats.failures += 1
+        elif outcome == "timeout":
+            stats.timeouts += 1
+
+        if runtime > self.slow_task_threshold:
+            self.slow_tasks.append((name, task_time, runtime))
+            logger.warning("Scheduled task %s took %.3fs", name, runtime)
+
+    def set_depth(self, pending: int, running: int):
+        """
+        Updates the queue depth gauges.
+
+        :param pending: Number of tasks waiting to become due.
+        :type pending: int
+        :param running: Number of dispatched tasks that have not finished.
+        :type running: int
+        """
+        self.pending = pending
+        self.max_pending = max(self.max_pending, pending)
+        self.running = running
+        self.max_running = max(self.max_running, running)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        :return: Every metric as plain data, suitable for logging or JSON.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "lateness": self.lateness.snapshot(),
+            "tasks": {name: stats.snapshot() for name, stats in self.tasks.items()},
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "running": self.running,
+            "max_running": self.max_running,
+            "slow_tasks": [
+                {"name": name, "task_time": task_time, "runtime": runtime}
+                for name, task_time, runtime in self.slow_tasks
+            ],
+        }
+
+    def to_prometheus(self, prefix: str = "scheduler") -> str:
+        """
+        :param prefix: Prefix for every metric name.
+        :type prefix: str
+        :return: Every metric in the Prometheus text exposition format.
+        :rtype: str
+        """
+        lines = []
+
+        def add_histogram(name: str, histogram: Histogram, labels: str = ""):
+            seen = 0
+            for bound, count in zip([*map(str, histogram.bounds), "+Inf"], histogram.counts):
+                seen += count
+                lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {seen}')
+            label_set = f"{{{labels.rstrip(',')}}}" if labels else ""
+            lines.append(f"{name}_sum{label_set} {histogram.total}")
+            lines.append(f"{name}_count{label_set} {histogram.count}")
+
+        lines.append(f"# TYPE {prefix}_lateness_seconds histogram")
+        add_histogram(f"{prefix}_lateness_seconds", self.lateness)
+        lines.append(f"# TYPE {prefix}_task_runtime_seconds histogram")
+        for task_name, stats in self.tasks.items():
+            add_histogram(
+                f"{prefix}_task_runtime_seconds", stats.runtime, f'task="{task_name}",'
+            )
+        for gauge in ("pending", "max_pending", "running", "max_running"):
+            lines.append(f"# TYPE {prefix}_{gauge} gauge")
+            lines.append(f"{prefix}_{gauge} {getattr(self, gauge)}")
+        for counter in ("failures", "timeouts"):
+            lines.append(f"# TYPE {prefix}_task_{counter}_total counter")
+            for task_name, stats in self.tasks.items():
+                lines.append(
+                    f'{prefix}_task_{counter}_total{{task="{task_name}"}} '
+                    f"{getattr(stats, counter)}"
+                )
+        return "\n".join(lines) + "\n"
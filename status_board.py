@@ -0,0 +1,177 @@
+"""
+This file holds a status board, which keeps one message per recipient showing their current
+status, edited in place whenever it changes rather than sent again. Like the channel resolver, it
+is not aware of Discord: the bot passes in how to render, post and edit a status message.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+from clock import Clock, SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+Message = TypeVar("Message")
+
+# Keyword arguments that a status message is posted or edited with, such as content and embeds
+Payload = dict[str, Any]
+
+
+def fingerprint(payload: Payload) -> bytes:
+    """
+    :param payload: A rendered status.
+    :type payload: Payload
+    :return: A hash of the payload, which is equal for payloads that would look the same.
+        Values that are not plain data, such as embeds, are hashed by their to_dict.
+    :rtype: bytes
+    """
+    encoded = json.dumps(
+        payload,
+        sort_keys=True,
+        default=lambda value: value.to_dict() if hasattr(value, "to_dict") else repr(value),
+    )
+    return hashlib.blake2b(encoded.encode(), digest_size=16).digest()
+
+
+class StatusBoard(Generic[Message]):
+    """
+    Keeps a status message up to date for each recipient. touch marks recipients' statuses as
+    changed and returns straight away. Each recipient's status is then rendered once the changes
+    have stopped for debounce seconds, or max_delay seconds after the first of them, so a burst of
+    changes costs one edit. The message is only posted or edited if the rendered status hashes
+    differently to the one last shown.
+
+    The first status of a recipient is posted, and later ones edit that message. If editing fails,
+    for example because the message was deleted, a new message is posted instead.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[Hashable], Payload],
+        post: Callable[[Hashable, Payload], Awaitable[Message]],
+        edit: Callable[[Message, Payload], Awaitable[Any]],
+        debounce: float = 1,
+        max_delay: float = 5,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        """
+        :param render: Renders the current status of a recipient.
+        :type render: Callable[[Hashable], Payload]
+        :param post: Posts a new status message to a recipient, returning the message.
+        :type post: Callable[[Hashable, Payload], Awaitable[Message]]
+        :param edit: Replaces what a status message shows.
+        :type edit: Callable[[Message, Payload], Awaitable[Any]]
+        :param debounce: Seconds without changes to wait before updating a status.
+        :type debounce: float
+        :param max_delay: Most seconds to hold back an update while changes keep coming.
+        :type max_delay: float
+        :param clock: Source of the time.
+        :type clock: Clock
+        """
+        self.render = render
+        self.post = post
+        self.edit = edit
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.clock = clock
+        self.messages: dict[Hashable, Message] = {}
+        self._shown: dict[Hashable, bytes] = {}
+        self._first_change: dict[Hashable, float] = {}
+        self._last_change: dict[Hashable, float] = {}
+        self._wakeups: dict[Hashable, asyncio.Event] = {}
+        self._workers: dict[Hashable, asyncio.Task] = {}
+        self.posted = 0
+        self.edited = 0
+        self.skipped = 0
+
+    def touch(self, *recipients: Hashable):
+        """
+        Marks recipients' statuses as changed, so that their messages are updated soon.
+
+        :param recipients: Recipients whose status changed.
+        :type recipients: Hashable
+        """
+        now = self.clock.time()
+        for recipient in recipients:
+            self._first_change.setdefault(recipient, now)
+            self._last_change[recipient] = now
+            if recipient in self._workers:
+                self._wakeups[recipient].set()
+            else:
+                self._wakeups[recipient] = asyncio.Event()
+                self._workers[recipient] = asyncio.create_task(self._run(recipient))
+
+    def _due(self, recipient: Hashable) -> float:
+        return min(
+            self._last_change[recipient] + self.debounce,
+            self._first_change[recipient] + self.max_delay,
+        )
+
+    async def _run(self, recipient: Hashable):
+        wakeup = self._wakeups[recipient]
+        try:
+            while recipient in self._first_change:
+                while self.clock.time() < self._due(recipient):
+                    wakeup.clear()
+                    await self.clock.wait_until(self._due(recipient), wakeup)
+                # Changes made while this update is in flight start a new round
+                del self._first_change[recipient]
+                await self.flush(recipient)
+        finally:
+            del self._workers[recipient]
+            del self._wakeups[recipient]
+
+    async def flush(self, recipient: Hashable):
+        """
+        Updates a recipient's status message now, if what it shows has changed.
+
+        :param recipient: Recipient to update.
+        :type recipient: Hashable
+        """
+        payload = self.render(recipient)
+        digest = fingerprint(payload)
+        if self._shown.get(recipient) == digest:
+            self.skipped += 1
+            return
+
+        message = self.messages.get(recipient)
+        if message is not None:
+            try:
+                await self.edit(message, payload)
+            except Exception as error:
+                logger.warning("Could not edit status of %s, reposting: %r", recipient, error)
+            else:
+                self._shown[recipient] = digest
+                self.edited += 1
+                return
+
+        try:
+            self.messages[recipient] = await self.post(recipient, payload)
+        except Exception as error:
+            # Nothing is recorded as shown, so the next change tries again
+            logger.warning("Could not post status of %s: %r", recipient, error)
+            self.messages.pop(recipient, None)
+            self._shown.pop(recipient, None)
+            return
+        self._shown[recipient] = digest
+        self.posted += 1
+
+    def invalidate(self, recipient: Hashable):
+        """
+        Forgets a recipient's status message, so that their next update posts a new one.
+
+        :param recipient: Recipient whose message to forget.
+        :type recipient: Hashable
+        """
+        self.messages.pop(recipient, None)
+        self._shown.pop(recipient, None)
+
+    def clear(self):
+        """
+        Forgets every status message.
+        """
+        self.messages.clear()
+        self._shown.clear()
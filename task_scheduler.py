@@ -1,84 +1,434 @@
 """This file is a custom event manager"""
 
+from __future__ import annotations
+import asyncio
+import inspect
+import itertools
+import logging
 import time
-from typing import Coroutine, Callable
+from typing import Any, Callable, Coroutine
+
+from timer_queues import TimerQueue, HeapTimerQueue
+from scheduler_journal import SchedulerJournal
+from clock import Clock, VirtualClock, SYSTEM_CLOCK
+from scheduler_metrics import SchedulerMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledTask:
+    """
+    An opaque handle to a task in the scheduler. The coroutine is only created from the
+    callable and its arguments when the task fires, so a pending task holds no coroutine frame.
+    """
+
+    def __init__(
+        self,
+        scheduler: TaskScheduler,
+        task_time: int,
+        func: Callable[..., Any],
+        args: tuple,
+        is_coroutine: bool,
+        timeout: float | None = None,
+        key: str | None = None,
+    ):
+        self.scheduler = scheduler
+        self.task_time = task_time
+        self.func = func
+        self.args = args
+        self.is_coroutine = is_coroutine
+        self.timeout = timeout
+        self.key = key
+        self.active = True
+        self.seq = 0
+
+    @property
+    def name(self) -> str:
+        """
+        Name of the function this task calls, used when reporting on the task.
+        """
+        return getattr(self.func, "__qualname__", repr(self.func))
+
+    def cancel(self):
+        """
+        Stops the task from running. Does nothing if the task has already run or been cancelled.
+        """
+        self.scheduler.cancel(self)
 
 
 class TaskScheduler:
     """
-    This scheduler is designed to have tasks added to it over time, but for check_tasks to be
-    called about once every second
+    This scheduler keeps its tasks in a TimerQueue, by default a min-heap keyed on the time they
+    are due. Either await run once, which sleeps until the earliest deadline, or call check_tasks
+    regularly.
+
+    Due coroutines are dispatched as their own asyncio tasks, at most max_concurrency of them
+    running at once, so a slow task never delays any other timer.
+
+    If given a journal, every task added with a key is journalled so that it can be recovered
+    after a restart.
+
+    All times are read from the scheduler's clock, which the game state also uses. With a
+    VirtualClock, run_until_idle plays out every pending task without waiting in real time.
+
+    How late tasks start, how long they run and how many are waiting is recorded in metrics.
     """
 
-    def __init__(self):
-        # TODO Coroutine subtyping
-        self.tasks: list[tuple[int, Coroutine]] = []
-        self.functions: list[tuple[int, Callable[[], None]]] = []
+    def __init__(
+        self,
+        max_concurrency: int = 64,
+        queue: TimerQueue | None = None,
+        journal: SchedulerJournal | None = None,
+        clock: Clock = SYSTEM_CLOCK,
+        metrics: SchedulerMetrics | None = None,
+    ):
+        self.clock = clock
+        self.metrics = metrics if metrics is not None else SchedulerMetrics()
+        # Each task is numbered in insertion order, so that tasks due at the same time run in
+        # the order added. Cancelled handles are left in the queue and skipped when they are due.
+        self.queue: TimerQueue = queue if queue is not None else HeapTimerQueue()
+        self.journal = journal
+        self._journal_flush_pending = False
+        # Numbering carries on from the journal so that new tasks never reuse a live task's id
+        first_seq = 0 if journal is None else max(journal.live, default=-1) + 1
+        self._counter = itertools.count(first_seq)
+        self._cancelled = 0
+        self._wakeup: asyncio.Event | None = None
+        self._sleeping_until: float | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.running: set[asyncio.Task] = set()
 
     async def check_tasks(self):
         """
-        Must be called regularly (around once a second) to ensure that all tasks are completed
-        and removed as required.
+        Starts every task that is due and removes it from the scheduler. Tasks that are not due
+        yet are left to the queue, so with the heap each due task costs O(log n). This does not
+        wait for coroutines to finish, use join for that.
         """
-        starting_time = time.time()
-        for task in self.tasks:
-            if starting_time >= task[0]:
-                await task[1]
+        for task in self.queue.pop_due(self.clock.time()):
+            if not task.active:
+                self._cancelled -= 1
+                continue
+            task.active = False
+            self._journal_done(task)
+            if task.is_coroutine:
+                running = asyncio.create_task(self._supervise(task))
+                self.running.add(running)
+                running.add_done_callback(self._task_finished)
+            else:
+                self.metrics.record_started(self.clock.time() - task.task_time)
+                start = time.perf_counter()
+                outcome = "ok"
+                try:
+                    task.func(*task.args)
+                except Exception:
+                    logger.exception("Scheduled function %s failed", task.name)
+                    outcome = "failed"
+                self.metrics.record_finished(
+                    task.name, task.task_time, time.perf_counter() - start, outcome
+                )
+        self._update_depth()
+
+    async def _supervise(self, task: ScheduledTask):
+        """
+        Runs a single due coroutine, making sure that its failure or timeout is logged rather
+        than propagated to the rest of the scheduler.
+        """
+        async with self._semaphore:
+            self.metrics.record_started(self.clock.time() - task.task_time)
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                await asyncio.wait_for(task.func(*task.args), task.timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Scheduled task %s timed out after %ss", task.name, task.timeout)
+                outcome = "timeout"
+            except Exception:
+                logger.exception("Scheduled task %s failed", task.name)
+                outcome = "failed"
+            self.metrics.record_finished(
+                task.name, task.task_time, time.perf_counter() - start, outcome
+            )
+
+    def _task_finished(self, running: asyncio.Task):
+        self.running.discard(running)
+        self._update_depth()
+
+    def _update_depth(self):
+        self.metrics.set_depth(self.pending_count(), len(self.running))
+
+    async def join(self):
+        """
+        Waits until every coroutine that has been dispatched, including any dispatched while
+        waiting, has finished.
+        """
+        while len(self.running) > 0:
+            await asyncio.wait(list(self.running))
+
+    async def run(self):
+        """
+        Runs the scheduler forever. Rather than waking up at a fixed rate, this sleeps until the
+        earliest deadline, or until a task is added that is due sooner than that.
+        """
+        self._wakeup = asyncio.Event()
+        while True:
+            await self.check_tasks()
+            self._wakeup.clear()
+            self._sleeping_until = self.queue.next_deadline()
+            await self.clock.wait_until(self._sleeping_until, self._wakeup)
+
+    async def run_until_idle(self, end_time: float | None = None):
+        """
+        Plays out the scheduler on a VirtualClock. Runs every due task to completion, then jumps
+        the clock to the next deadline, until nothing is left or the next deadline is after
+        end_time.
 
-        for func in self.functions:
-            if starting_time >= func[0]:
-                func[1]()
-        self.tasks = [task for task in self.tasks if starting_time < task[0]]
-        self.functions = [func for func in self.functions if starting_time < func[0]]
+        :param end_time: Epoch time to stop at, or None to run until no tasks are left.
+        :type end_time: float | None
+        """
+        assert isinstance(self.clock, VirtualClock)
+        while True:
+            await self.check_tasks()
+            await self.join()
+            deadline = self.queue.next_deadline()
+            if deadline is None or (end_time is not None and deadline > end_time):
+                break
+            self.clock.advance_to(deadline)
+        if end_time is not None:
+            self.clock.advance_to(end_time)
+
+    def _journal_changed(self):
+        """
+        Flushes the journal once the current pass of the event loop is over, so that everything
+        journalled in that pass shares a single fsync.
+        """
+        if self._journal_flush_pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # The journal flushes itself once enough records are buffered
+            return
+        self._journal_flush_pending = True
+        loop.call_soon(self._flush_journal)
+
+    def _flush_journal(self):
+        self._journal_flush_pending = False
+        assert self.journal is not None
+        self.journal.flush()
+
+    def _journal_done(self, task: ScheduledTask):
+        if task.key is not None and self.journal is not None:
+            self.journal.record_done(task.seq)
+            self._journal_changed()
+
+    def _push(
+        self,
+        task_time: int,
+        func: Callable[..., Any],
+        args: tuple,
+        is_coroutine: bool,
+        timeout: float | None = None,
+        key: str | None = None,
+    ) -> ScheduledTask:
+        task = ScheduledTask(self, task_time, func, args, is_coroutine, timeout, key)
+        task.seq = next(self._counter)
+        self._enqueue(task)
+        if key is not None and self.journal is not None:
+            self.journal.record_add(task.seq, task_time, key, args)
+            self._journal_changed()
+        self._update_depth()
+        return task
+
+    def _enqueue(self, task: ScheduledTask):
+        self.queue.push(task, self.clock.time())
+        if self._wakeup is not None and (
+            self._sleeping_until is None or task.task_time < self._sleeping_until
+        ):
+            self._wakeup.set()
 
-    def add_task(self, task_time: int, task: Coroutine):
+    def add_task(
+        self,
+        task_time: int,
+        task: Callable[..., Coroutine],
+        *args: Any,
+        timeout: float | None = None,
+        key: str | None = None,
+    ) -> ScheduledTask:
         """
-        Add a coroutine to the list of tasks to be completed.
+        Add a coroutine function to the list of tasks to be completed. It is only called, and
+        the coroutine created, once the task is due.
 
         :param task_time: The epoch time that the task should be executed at.
         :type task_time: int
-        :param task: Coroutine that should be executed at that time.
-        :type task: Coroutine
+        :param task: Coroutine function that should be awaited at that time.
+        :type task: Callable[..., Coroutine]
+        :param args: Arguments to call the coroutine function with.
+        :param timeout: Number of seconds the coroutine may run for before it is cancelled, or
+            None if it may run forever.
+        :type timeout: float | None
+        :param key: Name that the coroutine function can be looked up by when recovering from
+            the journal, or None if the task should not be journalled. The arguments of a
+            journalled task must be JSON serialisable.
+        :type key: str | None
+        :return: A handle that can be used to cancel the task.
+        :rtype: ScheduledTask
         """
-        self.tasks.append((task_time, task))
+        return self._push(task_time, task, args, True, timeout, key)
 
-    def add_function(self, task_time: int, func: Callable[[], None]):
+    def add_function(
+        self,
+        task_time: int,
+        func: Callable[..., None],
+        *args: Any,
+        key: str | None = None,
+    ) -> ScheduledTask:
         """
         Add a function to the list of tasks to be completed.
 
         :param task_time: The epoch time that the task should be executed at.
         :type task_time: int
-        :param task: Function that should be executed at that time.
-        :type task: Function
+        :param func: Function that should be called at that time.
+        :type func: Callable[..., None]
+        :param args: Arguments to call the function with.
+        :param key: Name that the function can be looked up by when recovering from the
+            journal, or None if the task should not be journalled.
+        :type key: str | None
+        :return: A handle that can be used to cancel the task.
+        :rtype: ScheduledTask
         """
-        self.functions.append((task_time, func))
+        return self._push(task_time, func, args, False, key=key)
 
-    def remove_function(self, func: Callable[[], None]):
+    def cancel(self, task: ScheduledTask):
         """
-        If there are any functions matching the passed func in the scheduler, they are all removed.
+        Cancels a task in O(1). The entry is dropped lazily when it is due, or when cancelled
+        entries make up most of the queue.
 
-        :param func: A copy of the function that must be removed.
-        :type func: Callable[[], None]
+        :param task: Handle returned by add_task or add_function.
+        :type task: ScheduledTask
         """
-        to_delete = []
-        for ind, time_func in enumerate(self.functions):
-            if time_func[1].__code__.co_code == func.__code__.co_code:
-                to_delete.append(ind)
+        if not task.active:
+            return
+        task.active = False
+        self._journal_done(task)
+        self._cancelled += 1
+        if self._cancelled > len(self.queue) // 2:
+            self.queue.compact()
+            self._cancelled = 0
 
-        for item in sorted(to_delete, reverse=True):
-            self.functions.pop(item)
+    def recover(
+        self, resolver: Callable[[str], Callable[..., Any] | None]
+    ) -> list[ScheduledTask]:
+        """
+        Reschedules every live task from the journal, with its original due time. Tasks that
+        became due while the process was down run on the next check, in the order they were due.
 
-    def remove_task(self, func: Coroutine):
+        :param resolver: Looks up the function for a journalled key, or returns None if the task
+            should be dropped.
+        :type resolver: Callable[[str], Callable[..., Any] | None]
+        :return: The recovered tasks, so that their owners can keep handles to them.
+        :rtype: list[ScheduledTask]
         """
-        If there are any coroutines matching the passed func in the scheduler, they are all removed.
+        assert self.journal is not None
+        recovered = []
+        for task_id, task_time, key, args in self.journal.live_timers():
+            func = resolver(key)
+            if func is None:
+                logger.warning("Dropping journalled task %s as nothing handles it", key)
+                self.journal.record_done(task_id)
+                continue
+            task = ScheduledTask(
+                self, task_time, func, tuple(args), inspect.iscoroutinefunction(func), key=key
+            )
+            task.seq = task_id
+            self._enqueue(task)
+            recovered.append(task)
+        self._journal_changed()
+        return recovered
 
-        :param func: A copy of the coroutine that must be removed.
-        :type func: Coroutine
+    def pending_count(self) -> int:
+        """
+        :return: Number of tasks that have not yet run or been cancelled.
+        :rtype: int
         """
-        to_delete = []
-        for ind, time_func in enumerate(self.tasks):
-            if str(time_func[1]) == str(func):
-                to_delete.append(ind)
+        return len(self.queue) - self._cancelled
+
+
+class SchedulerScope:
+    """
+    A view of a shared TaskScheduler that belongs to a single game. Keys of journalled tasks are
+    prefixed with the scope's name, so that games sharing a journal cannot collide, and every
+    task added through the scope can be cancelled at once when the game ends.
+    """
 
-        for item in sorted(to_delete, reverse=True):
-            self.functions.pop(item)
+    def __init__(self, scheduler: TaskScheduler, name: str):
+        self.scheduler = scheduler
+        self.clock = scheduler.clock
+        self.name = name
+        self.tasks: set[ScheduledTask] = set()
+        self._prune_size = 32
+
+    def track(self, task: ScheduledTask) -> ScheduledTask:
+        """
+        Makes a task part of this scope, so that cancel_all cancels it. Tasks added through the
+        scope are tracked already, so this is only needed for recovered tasks.
+
+        :param task: Task to track.
+        :type task: ScheduledTask
+        :return: The same task.
+        :rtype: ScheduledTask
+        """
+        self.tasks.add(task)
+        if len(self.tasks) > self._prune_size:
+            # Tasks that have run or been cancelled are forgotten in bulk, keeping this O(1)
+            # amortised per task
+            self.tasks = {tracked for tracked in self.tasks if tracked.active}
+            self._prune_size = max(32, 2 * len(self.tasks))
+        return task
+
+    def scoped_key(self, key: str | None) -> str | None:
+        """
+        :param key: Key of a task within this scope.
+        :type key: str | None
+        :return: The key that the task is journalled under.
+        :rtype: str | None
+        """
+        return None if key is None else f"{self.name}:{key}"
+
+    def add_task(
+        self,
+        task_time: int,
+        task: Callable[..., Coroutine],
+        *args: Any,
+        timeout: float | None = None,
+        key: str | None = None,
+    ) -> ScheduledTask:
+        """
+        Same as TaskScheduler.add_task, for a task that belongs to this scope.
+        """
+        return self.track(
+            self.scheduler.add_task(
+                task_time, task, *args, timeout=timeout, key=self.scoped_key(key)
+            )
+        )
+
+    def add_function(
+        self,
+        task_time: int,
+        func: Callable[..., None],
+        *args: Any,
+        key: str | None = None,
+    ) -> ScheduledTask:
+        """
+        Same as TaskScheduler.add_function, for a function that belongs to this scope.
+        """
+        return self.track(
+            self.scheduler.add_function(task_time, func, *args, key=self.scoped_key(key))
+        )
+
+    def cancel_all(self):
+        """
+        Cancels every task in this scope that has not yet run.
+        """
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = set()
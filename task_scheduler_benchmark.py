@@ -0,0 +1,100 @@
+"""
+This file benchmarks the TimerQueue implementations that the TaskScheduler can use. For each
+backend and number of pending timers it reports the cost of adding a timer, the cost of one
+scheduler tick and the memory used by the queue.
+
+Usage: python task_scheduler_benchmark.py [--sizes 10000 100000 1000000] [--backends wheel heap]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from task_scheduler import ScheduledTask
+from timer_queues import TIMER_QUEUES
+
+START_TIME = 1_700_000_000
+
+
+def make_tasks(num_tasks: int, horizon: int, seed: int) -> list[ScheduledTask]:
+    """
+    Creates timers spread evenly over the horizon, as many concurrent games would create.
+    """
+    rng = random.Random(seed)
+    tasks = []
+    for seq in range(num_tasks):
+        task = ScheduledTask(None, START_TIME + rng.randint(1, horizon), print, (), False)
+        task.seq = seq
+        tasks.append(task)
+    return tasks
+
+
+def measure_memory(backend: str, tasks: list[ScheduledTask]) -> int:
+    """
+    :return: Number of bytes allocated by the queue itself, not counting the tasks.
+    :rtype: int
+    """
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    queue = TIMER_QUEUES[backend]()
+    for task in tasks:
+        queue.push(task, START_TIME)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return used
+
+
+def measure_timing(
+    backend: str, tasks: list[ScheduledTask], num_ticks: int
+) -> tuple[float, float, float, int]:
+    """
+    :return: Mean seconds per push, mean and worst seconds per one second tick, and the number
+        of timers that fired.
+    :rtype: tuple[float, float, float, int]
+    """
+    queue = TIMER_QUEUES[backend]()
+    start = time.perf_counter()
+    for task in tasks:
+        queue.push(task, START_TIME)
+    push_time = (time.perf_counter() - start) / len(tasks)
+
+    tick_times = []
+    fired = 0
+    for tick in range(1, num_ticks + 1):
+        start = time.perf_counter()
+        fired += len(queue.pop_due(START_TIME + tick))
+        queue.next_deadline()
+        tick_times.append(time.perf_counter() - start)
+    return push_time, sum(tick_times) / len(tick_times), max(tick_times), fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", default=list(TIMER_QUEUES))
+    parser.add_argument("--ticks", type=int, default=60, help="Number of one second ticks")
+    parser.add_argument(
+        "--horizon", type=int, default=12600, help="Seconds that timers are spread over"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'BACKEND':<8} | {'TIMERS':>9} | {'PUSH (us)':>9} | {'TICK MEAN (us)':>14} | "
+        f"{'TICK MAX (us)':>13} | {'FIRED':>7} | {'MEMORY (MiB)':>12}"
+    )
+    for num_tasks in args.sizes:
+        tasks = make_tasks(num_tasks, args.horizon, args.seed)
+        for backend in args.backends:
+            memory = measure_memory(backend, tasks)
+            push_time, tick_mean, tick_max, fired = measure_timing(backend, tasks, args.ticks)
+            print(
+                f"{backend:<8} | {num_tasks:>9,} | {push_time * 1e6:>9.2f} | "
+                f"{tick_mean * 1e6:>14.1f} | {tick_max * 1e6:>13.1f} | {fired:>7,} | "
+                f"{memory / 2**20:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules are imported from the top of the repository, and read hide_and_seek.cfg from the
+# working directory when imported
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
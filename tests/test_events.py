@@ -0,0 +1,166 @@
+import asyncio
+import json
+import random
+
+from clock import VirtualClock
+from hide_and_seek_conditions import Condition
+from hide_and_seek_events import (
+    EVENT_TYPES,
+    BookEvent,
+    CardCopied,
+    CardDiscarded,
+    CardDrawn,
+    CardPlayed,
+    CardsDrawn,
+    CardsKept,
+    ConditionAdded,
+    ConditionRemoved,
+    DeckEvent,
+    DeckReshuffled,
+    EventLog,
+    HandExpanded,
+    HiderCaught,
+    NextPlayerChosen,
+    QuestionAnswered,
+    QuestionAsked,
+    QuestionClosed,
+    QuestionExpired,
+    RewardMultiplied,
+    RewardsEarned,
+    RewardTaken,
+    RoundStarted,
+    SeekersReleased,
+    SelectionMade,
+    SelectionRequested,
+    decode_event,
+    encode_event,
+)
+import hide_and_seek_game_state as game_state
+from hide_and_seek_game_state import GameState
+from hide_and_seek_questions import MatchingQuestion, RadarQuestion
+from hide_and_seek_simulator import START_TIME, GreedyHider, ScriptedFrontend
+from task_scheduler import TaskScheduler
+
+QUESTION = MatchingQuestion("Park").to_instance("Central")
+
+SAMPLE_EVENTS = [
+    RoundStarted("Alice"),
+    SeekersReleased(START_TIME),
+    QuestionExpired(START_TIME + 600),
+    QuestionAnswered("Yes", None),
+    QuestionAnswered("No", 30),
+    HiderCaught(START_TIME + 3600, 180),
+    NextPlayerChosen("Bob"),
+    ConditionAdded(Condition.HAND_LOCK),
+    ConditionRemoved(Condition.ACTIVEQUESTION),
+    SelectionRequested(7, (0, 11, 3, 4, 5, 6), 1, "keep", START_TIME + 300, -1, (3, 3)),
+    SelectionMade(),
+    DeckReshuffled(),
+    CardsDrawn((4, 2, 0)),
+    CardsKept((1,)),
+    CardDrawn(5),
+    CardPlayed(0),
+    CardDiscarded(1),
+    CardCopied(0),
+    HandExpanded(1),
+    QuestionAsked(QUESTION),
+    QuestionAsked(RadarQuestion(0.5).to_instance("")),
+    RewardMultiplied(2, 3),
+    RewardsEarned(),
+    RewardTaken(2),
+    QuestionClosed(),
+]
+
+
+def test_samples_cover_every_event_type():
+    # DeckEvent and BookEvent are only base classes
+    event_types = set(EVENT_TYPES.values()) - {DeckEvent, BookEvent}
+    assert {type(event) for event in SAMPLE_EVENTS} == event_types
+
+
+def test_every_event_round_trips():
+    interned = {}
+    for event in SAMPLE_EVENTS:
+        # Through JSON, as the event log stores them
+        record = json.loads(json.dumps(encode_event(event)))
+        assert decode_event(record, interned) == event
+
+
+def test_decoded_questions_are_interned():
+    interned = {}
+    record = encode_event(QuestionAsked(QUESTION))
+    first = decode_event(record, interned)
+    second = decode_event(json.loads(json.dumps(record)), interned)
+    assert first.question is second.question
+
+
+def test_fields_added_later_take_their_defaults():
+    assert decode_event({"type": "RewardTaken"}, {}) == RewardTaken(1)
+    record = encode_event(SelectionRequested(1, (0, 1), 1, "keep", START_TIME, -1))
+    del record["group_sizes"]
+    assert decode_event(record, {}).group_sizes == ()
+
+
+async def play(
+    game: GameState, frontend: ScriptedFrontend, scheduler: TaskScheduler, rounds: int
+):
+    """
+    Asks and answers questions, keeping the hand legal, so that most kinds of event are logged.
+    """
+    await scheduler.run_until_idle(START_TIME + game_state.HIDING_TIME)
+    question = QUESTION
+    for i in range(rounds):
+        await game.ask_question(question)
+        await scheduler.run_until_idle(scheduler.clock.time() + 60)
+        await game.answered_question(question.get_options()[0])
+        await frontend.make_selections(game)
+        while not game.hider_deck.is_legal_hand():
+            game.hider_deck.discard(game.hider_deck.hand[0])
+
+
+def test_restore_after_partially_written_event(tmp_path):
+    path = str(tmp_path / "game")
+
+    async def run():
+        scheduler = TaskScheduler(clock=VirtualClock(START_TIME))
+        frontend = ScriptedFrontend(GreedyHider(), random.Random(0))
+        log = EventLog(path, snapshot_interval=10)
+        game = GameState(START_TIME, ["Alice", "Bob"], frontend, scheduler, log, seed=5)
+        await play(game, frontend, scheduler, 4)
+        log.close()
+        live = game.to_snapshot()
+
+        # A crash partway through writing the next event leaves half a line
+        with open(path + ".events", "ab") as file:
+            file.write(b'{"seq":' + str(log.seq + 1).encode() + b',"time":1,"type":"Card')
+
+        reopened = EventLog(path, snapshot_interval=10)
+        assert reopened.seq == log.seq
+        restored = GameState.restore(reopened, frontend, scheduler)
+        assert restored.to_snapshot() == live
+
+        *_, (record, replayed) = GameState.replay(reopened, frontend, scheduler)
+        assert record["seq"] == log.seq
+        assert replayed.to_snapshot() == live
+
+        # The half line was cut off, so events logged after the restart are read back
+        reopened.append(scheduler.clock.time(), NextPlayerChosen("Alice"))
+        reopened.close()
+        after = EventLog(path, snapshot_interval=10)
+        assert after.seq == log.seq + 1
+        assert GameState.restore(after, frontend, scheduler).next_player == "Alice"
+        after.close()
+
+    asyncio.run(run())
+
+
+def test_restored_game_equals_live_game():
+    async def run():
+        scheduler = TaskScheduler(clock=VirtualClock(START_TIME))
+        frontend = ScriptedFrontend(GreedyHider(), random.Random(0))
+        log = EventLog(snapshot_interval=7)
+        game = GameState(START_TIME, ["Alice", "Bob"], frontend, scheduler, log, seed=5)
+        await play(game, frontend, scheduler, 3)
+        assert GameState.restore(log, frontend, scheduler).to_snapshot() == game.to_snapshot()
+
+    asyncio.run(run())
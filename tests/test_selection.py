@@ -0,0 +1,151 @@
+import asyncio
+import glob
+import os
+import random
+import shutil
+
+import pytest
+
+from clock import VirtualClock
+from hide_and_seek_conditions import Condition
+from hide_and_seek_events import EventLog
+from hide_and_seek_exceptions import InvalidSelectionException, SelectionNotPendingException
+import hide_and_seek_game_state as game_state
+from hide_and_seek_game_state import GameState
+from hide_and_seek_questions import MatchingQuestion
+from hide_and_seek_simulator import START_TIME, GreedyHider, ScriptedFrontend
+from task_scheduler import TaskScheduler
+
+QUESTION = MatchingQuestion("Park").to_instance("Central")
+
+
+async def answered_game(
+    seed: int = 5, event_log: EventLog | None = None
+) -> tuple[GameState, ScriptedFrontend, TaskScheduler]:
+    """
+    Starts a game and answers a question, which leaves the hider to choose a reward.
+    """
+    scheduler = TaskScheduler(clock=VirtualClock(START_TIME))
+    frontend = ScriptedFrontend(GreedyHider(), random.Random(0))
+    game = GameState(START_TIME, ["Alice", "Bob"], frontend, scheduler, event_log, seed=seed)
+    await scheduler.run_until_idle(START_TIME + game_state.HIDING_TIME)
+    await game.ask_question(QUESTION)
+    await game.answered_question(QUESTION.get_options()[0])
+    return game, frontend, scheduler
+
+
+def test_answer_asks_for_a_selection_without_waiting():
+    async def run():
+        game, frontend, scheduler = await answered_game()
+        selection = game.pending_selection
+        assert selection is not None
+        assert frontend.pending == [selection]
+        assert selection.reason == "keep"
+        assert selection.deadline == int(scheduler.clock.time()) + game_state.SELECTION_TIME
+        assert game.conditions.has_condition(Condition.HAND_LOCK)
+
+    asyncio.run(run())
+
+
+def test_resolving_keeps_the_choice_and_lifts_the_hand_lock():
+    async def run():
+        game, frontend, scheduler = await answered_game()
+        selection = game.pending_selection
+        hand = list(game.hider_deck.hand)
+        await game.resolve_selection(selection.selection_id, [1])
+        assert game.pending_selection is None
+        assert game.hider_deck.hand == [*hand, selection.cards[1]]
+        assert game.investigation_book.current_question is None
+        assert not game.conditions.has_condition(Condition.HAND_LOCK)
+
+        # The expiry timer was cancelled with the selection
+        await scheduler.run_until_idle(selection.deadline + 1)
+        assert game.hider_deck.hand == [*hand, selection.cards[1]]
+
+    asyncio.run(run())
+
+
+def test_expired_selection_is_made_at_random():
+    async def run(seed: int) -> int:
+        game, frontend, scheduler = await answered_game(seed)
+        selection = game.pending_selection
+        hand = list(game.hider_deck.hand)
+        await scheduler.run_until_idle(selection.deadline)
+        assert game.pending_selection is None
+        assert frontend.pending == []
+        assert not game.conditions.has_condition(Condition.HAND_LOCK)
+        kept = game.hider_deck.hand[len(hand) :]
+        assert len(kept) == selection.num_select
+        assert kept[0] in selection.cards
+        return selection.cards.index(kept[0])
+
+    # The choice comes from the game's seed, so it is repeatable but not always the same card
+    assert asyncio.run(run(5)) == asyncio.run(run(5))
+    assert len({asyncio.run(run(seed)) for seed in range(20)}) > 1
+
+
+def test_stale_and_repeated_selections_are_refused():
+    async def run():
+        game, frontend, scheduler = await answered_game()
+        selection_id = game.pending_selection.selection_id
+        with pytest.raises(SelectionNotPendingException):
+            await game.resolve_selection(selection_id + 1, [0])
+        await game.resolve_selection(selection_id, [0])
+        with pytest.raises(SelectionNotPendingException):
+            await game.resolve_selection(selection_id, [0])
+
+    asyncio.run(run())
+
+
+def test_expired_selection_cannot_be_made():
+    async def run():
+        game, frontend, scheduler = await answered_game()
+        selection = game.pending_selection
+        await scheduler.run_until_idle(selection.deadline)
+        with pytest.raises(SelectionNotPendingException):
+            await game.resolve_selection(selection.selection_id, [0])
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("chosen", [[], [0, 1], [0, 0], [3], [-1]])
+def test_invalid_choices_are_refused(chosen):
+    async def run():
+        game, frontend, scheduler = await answered_game()
+        selection = game.pending_selection
+        with pytest.raises(InvalidSelectionException):
+            await game.resolve_selection(selection.selection_id, chosen)
+        # The selection is still waiting on a valid choice
+        assert game.pending_selection is selection
+        await game.resolve_selection(selection.selection_id, [2])
+        assert game.pending_selection is None
+
+    asyncio.run(run())
+
+
+def test_restored_game_resolves_its_selection_like_the_live_game(tmp_path):
+    live_path = str(tmp_path / "live")
+    restored_path = str(tmp_path / "restored")
+
+    async def run():
+        live_log = EventLog(live_path)
+        live, frontend, scheduler = await answered_game(event_log=live_log)
+        selection = live.pending_selection
+        # Every event is flushed as it is logged, so the files are what a restart would find
+        for file in glob.glob(live_path + ".*"):
+            shutil.copy(file, restored_path + os.path.splitext(file)[1])
+
+        restored_log = EventLog(restored_path)
+        restored = GameState.restore(restored_log, frontend, TaskScheduler(clock=scheduler.clock))
+        assert restored.pending_selection == selection
+        assert restored.to_snapshot() == live.to_snapshot()
+
+        for game in (live, restored):
+            await game.resolve_selection(selection.selection_id, [1])
+            assert not game.conditions.has_condition(Condition.HAND_LOCK)
+        assert restored.to_snapshot() == live.to_snapshot()
+        assert list(restored_log.read_all()) == list(live_log.read_all())
+        live_log.close()
+        restored_log.close()
+
+    asyncio.run(run())
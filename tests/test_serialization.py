@@ -0,0 +1,129 @@
+import asyncio
+import copy
+import os
+import random
+
+import pytest
+
+from clock import VirtualClock
+from hide_and_seek_events import EventLog
+from hide_and_seek_exceptions import SnapshotFormatException
+from hide_and_seek_game_state import GameState
+from hide_and_seek_serialization import SCHEMA_VERSION, decode_snapshot, encode_snapshot
+from hide_and_seek_simulator import GreedyHider, ScriptedFrontend
+from task_scheduler import TaskScheduler
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# What every fixture holds. Each was written by the encoder of its own schema version, from this
+# game plus whatever that version added.
+V1_SNAPSHOT = {
+    "state": "SEEKERPHASE",
+    "start_time": 1700000000,
+    "players": ["Alice", "Bob"],
+    "curr_player": "Alice",
+    "next_player": "Bob",
+    "metadata": {"hider_id": 1, "seeker_ids": [2]},
+    "times": {"Bob": 3600},
+    "hide_time_start": 1700001800,
+    "delay_start": 0,
+    "hider_time_bonus": 180,
+    "conditions": ["HAND_LOCK"],
+    "investigation_book": {
+        "current_question": {
+            "type": "MatchingQuestionInstance",
+            "fields": {"user_input": "Central", "location": "Park"},
+        },
+        "times_answered": [[{"type": "MatchingQuestion", "fields": {"location": "Park"}}, 2]],
+        "rewards": [2],
+        "reward_count": 1,
+    },
+    "hider_deck": {
+        "hand": [0, 7],
+        "deck": [1, 2, 3, 4, 5, 6],
+        "discard_pile": [9],
+        "drawn": [0, 11, 3],
+        "max_hand_size": 6,
+    },
+}
+SELECTION = {
+    "selection_id": 42,
+    "num_select": 1,
+    "deadline": 1700002100,
+    "source": -1,
+    "reason": "keep",
+    "cards": [0, 11, 3],
+}
+
+
+def expected_snapshot(version: int) -> dict:
+    snapshot = copy.deepcopy(V1_SNAPSHOT)
+    if version >= 2:
+        snapshot["seed"] = 123456789
+    if version >= 3:
+        snapshot["pending_selection"] = dict(SELECTION)
+    if version >= 4:
+        snapshot["pending_selection"]["group_sizes"] = [3]
+    return snapshot
+
+
+def read_fixture(version: int) -> bytes:
+    with open(os.path.join(FIXTURES, f"snapshot_v{version}.bin"), "rb") as file:
+        return file.read()
+
+
+def test_every_version_has_a_fixture():
+    assert all(
+        os.path.exists(os.path.join(FIXTURES, f"snapshot_v{version}.bin"))
+        for version in range(1, SCHEMA_VERSION + 1)
+    )
+
+
+@pytest.mark.parametrize("version", range(1, SCHEMA_VERSION + 1))
+def test_decode_fixture(version):
+    data = read_fixture(version)
+    assert data[4] == version
+    assert decode_snapshot(data) == expected_snapshot(version)
+
+
+@pytest.mark.parametrize("version", range(1, SCHEMA_VERSION + 1))
+def test_fixture_loads_into_a_game(version):
+    async def run():
+        scheduler = TaskScheduler(clock=VirtualClock(1700002000))
+        frontend = ScriptedFrontend(GreedyHider(), random.Random(0))
+        log = EventLog()
+        log.write_snapshot(decode_snapshot(read_fixture(version)))
+        game = GameState.restore(log, frontend, scheduler)
+        assert [card.get_card_name() for card in game.hider_deck.hand] == [
+            "3 Minute Time Bonus",
+            "Duplicate Card",
+        ]
+        assert game.investigation_book.get_times_answered(
+            game.investigation_book.current_question
+        ) == 2
+        if version >= 3:
+            assert game.pending_selection.selection_id == 42
+            assert len(game.pending_selection.get_groups()) == 1
+        else:
+            assert game.pending_selection is None
+        # Saved again, the game is in the current version
+        assert decode_snapshot(encode_snapshot(game.to_snapshot())) == game.to_snapshot()
+
+    asyncio.run(run())
+
+
+def test_current_version_round_trips():
+    snapshot = expected_snapshot(SCHEMA_VERSION)
+    assert decode_snapshot(encode_snapshot(snapshot)) == snapshot
+    snapshot["pending_selection"] = None
+    assert decode_snapshot(encode_snapshot(snapshot)) == snapshot
+
+
+def test_bad_snapshots_are_refused():
+    data = read_fixture(SCHEMA_VERSION)
+    with pytest.raises(SnapshotFormatException):
+        decode_snapshot(b"NOPE" + data[4:])
+    with pytest.raises(SnapshotFormatException):
+        decode_snapshot(data[:4] + bytes([SCHEMA_VERSION + 1]) + data[5:])
+    with pytest.raises(SnapshotFormatException):
+        decode_snapshot(data[:-3])
@@ -0,0 +1,282 @@
+"""
+This file holds the data structures that the TaskScheduler can use to keep track of pending
+timers. They all hold ScheduledTask handles, and leave cancelled handles in place until they are
+popped or compacted away.
+"""
+
+from __future__ import annotations
+import heapq
+import math
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from task_scheduler import ScheduledTask
+
+
+class TimerQueue(ABC):
+    """
+    This is the abstract class that represents a collection of pending timers.
+    """
+
+    @abstractmethod
+    def push(self, task: ScheduledTask, now: float):
+        """
+        Adds a task to the queue.
+
+        :param task: Task to add, due at task.task_time.
+        :type task: ScheduledTask
+        :param now: The current epoch time.
+        :type now: float
+        """
+
+    @abstractmethod
+    def pop_due(self, now: float) -> list[ScheduledTask]:
+        """
+        Removes every task that is due.
+
+        :param now: The current epoch time.
+        :type now: float
+        :return: The due tasks, in the order they were due.
+        :rtype: list[ScheduledTask]
+        """
+
+    @abstractmethod
+    def next_deadline(self) -> float | None:
+        """
+        :return: The time that the earliest task is due, or None if the queue is empty.
+        :rtype: float | None
+        """
+
+    @abstractmethod
+    def compact(self):
+        """
+        Drops every task that is no longer active.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class ListTimerQueue(TimerQueue):
+    """
+    Keeps timers in an unsorted list. Pushing is O(1), but every tick scans the whole list.
+    """
+
+    def __init__(self):
+        self.tasks: list[ScheduledTask] = []
+
+    def push(self, task: ScheduledTask, now: float):
+        self.tasks.append(task)
+
+    def pop_due(self, now: float) -> list[ScheduledTask]:
+        due = [task for task in self.tasks if task.task_time <= now]
+        if len(due) > 0:
+            self.tasks = [task for task in self.tasks if task.task_time > now]
+            due.sort(key=lambda task: (task.task_time, task.seq))
+        return due
+
+    def next_deadline(self) -> float | None:
+        if len(self.tasks) == 0:
+            return None
+        return min(task.task_time for task in self.tasks)
+
+    def compact(self):
+        self.tasks = [task for task in self.tasks if task.active]
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+
+class HeapTimerQueue(TimerQueue):
+    """
+    Keeps timers in a min-heap keyed on due time. Pushing and popping are O(log n).
+    """
+
+    def __init__(self):
+        self.heap: list[tuple[float, int, ScheduledTask]] = []
+
+    def push(self, task: ScheduledTask, now: float):
+        heapq.heappush(self.heap, (task.task_time, task.seq, task))
+
+    def pop_due(self, now: float) -> list[ScheduledTask]:
+        due = []
+        while len(self.heap) > 0 and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap)[2])
+        return due
+
+    def next_deadline(self) -> float | None:
+        if len(self.heap) == 0:
+            return None
+        return self.heap[0][0]
+
+    def compact(self):
+        self.heap = [entry for entry in self.heap if entry[2].active]
+        heapq.heapify(self.heap)
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+
+class TimingWheelTimerQueue(TimerQueue):
+    """
+    Keeps timers in a hierarchical timing wheel. Pushing is O(1), and each tick only looks at
+    the slot for that tick, plus a cascade from a coarser wheel once every num_slots ticks.
+
+    Time is split into ticks of resolution seconds. Level 0 has one slot per tick, and each
+    level above it has slots num_slots times wider. Timers further away than the top level
+    covers wait in an overflow list. Timers never fire early, but may fire up to one resolution
+    late.
+    """
+
+    def __init__(self, resolution: float = 1.0, slot_bits: int = 6, levels: int = 4):
+        self.resolution = resolution
+        self.slot_bits = slot_bits
+        self.num_slots = 1 << slot_bits
+        self.mask = self.num_slots - 1
+        self.levels = levels
+        self.wheels: list[list[list[ScheduledTask]]] = [
+            [[] for _ in range(self.num_slots)] for _ in range(levels)
+        ]
+        self.level_counts = [0] * levels
+        self.overflow: list[ScheduledTask] = []
+        self.ready: list[ScheduledTask] = []
+        self.current_tick: int | None = None
+        self.count = 0
+
+    def _due_tick(self, task: ScheduledTask) -> int:
+        return math.ceil(task.task_time / self.resolution)
+
+    def _place(self, task: ScheduledTask):
+        assert self.current_tick is not None
+        due_tick = self._due_tick(task)
+        delta = due_tick - self.current_tick
+        if delta <= 0:
+            self.ready.append(task)
+            return
+        for level in range(self.levels):
+            if delta < 1 << (self.slot_bits * (level + 1)):
+                slot = (due_tick >> (self.slot_bits * level)) & self.mask
+                self.wheels[level][slot].append(task)
+                self.level_counts[level] += 1
+                return
+        self.overflow.append(task)
+
+    def _cascade(self, level: int, slot: int):
+        tasks = self.wheels[level][slot]
+        if len(tasks) == 0:
+            return
+        self.wheels[level][slot] = []
+        self.level_counts[level] -= len(tasks)
+        for task in tasks:
+            self._place(task)
+
+    def _process_tick(self, tick: int):
+        if tick & self.mask == 0:
+            if tick & ((1 << (self.slot_bits * self.levels)) - 1) == 0 and self.overflow:
+                overflow = self.overflow
+                self.overflow = []
+                for task in overflow:
+                    self._place(task)
+            for level in range(self.levels - 1, 0, -1):
+                if tick & ((1 << (self.slot_bits * level)) - 1) == 0:
+                    self._cascade(level, (tick >> (self.slot_bits * level)) & self.mask)
+
+        bucket = self.wheels[0][tick & self.mask]
+        if len(bucket) > 0:
+            self.wheels[0][tick & self.mask] = []
+            self.level_counts[0] -= len(bucket)
+            self.ready.extend(bucket)
+
+    def _advance(self, target_tick: int):
+        assert self.current_tick is not None
+        while self.current_tick < target_tick:
+            if len(self.ready) == self.count:
+                # Nothing is waiting in the wheels, so there is nothing to visit on the way
+                self.current_tick = target_tick
+                return
+            if self.level_counts[0] == 0:
+                # Nothing can fire before the next cascade, so skip straight to it
+                next_tick = min(target_tick, (self.current_tick | self.mask) + 1)
+                self.current_tick = next_tick
+                if next_tick & self.mask == 0:
+                    self._process_tick(next_tick)
+                continue
+            self.current_tick += 1
+            self._process_tick(self.current_tick)
+
+    def push(self, task: ScheduledTask, now: float):
+        if self.current_tick is None:
+            self.current_tick = math.floor(now / self.resolution)
+        self._place(task)
+        self.count += 1
+
+    def pop_due(self, now: float) -> list[ScheduledTask]:
+        if self.current_tick is None:
+            return []
+        self._advance(math.floor(now / self.resolution))
+        due = self.ready
+        self.ready = []
+        self.count -= len(due)
+        due.sort(key=lambda task: (task.task_time, task.seq))
+        return due
+
+    def next_deadline(self) -> float | None:
+        """
+        Rather than searching a coarse slot for its earliest timer, this returns the time that
+        slot is next cascaded. So this may be earlier than the earliest timer, but never later,
+        and costs O(levels * num_slots) however many timers are pending.
+        """
+        if self.count == 0:
+            return None
+        assert self.current_tick is not None
+        candidates = [task.task_time for task in self.ready]
+        for level in range(self.levels):
+            if self.level_counts[level] == 0:
+                continue
+            current_slot = self.current_tick >> (self.slot_bits * level)
+            # Slots are visited in the order they will be reached, so stop at the first
+            # non-empty one
+            for offset in range(1, self.num_slots + 1):
+                if len(self.wheels[level][(current_slot + offset) & self.mask]) > 0:
+                    tick = (current_slot + offset) << (self.slot_bits * level)
+                    candidates.append(tick * self.resolution)
+                    break
+        if len(self.overflow) > 0:
+            top_bits = self.slot_bits * self.levels
+            tick = ((self.current_tick >> top_bits) + 1) << top_bits
+            candidates.append(tick * self.resolution)
+        return min(candidates)
+
+    def compact(self):
+        self.level_counts = [0] * self.levels
+        for level, wheel in enumerate(self.wheels):
+            for slot, tasks in enumerate(wheel):
+                wheel[slot] = [task for task in tasks if task.active]
+                self.level_counts[level] += len(wheel[slot])
+        self.overflow = [task for task in self.overflow if task.active]
+        self.ready = [task for task in self.ready if task.active]
+        self.count = sum(self.level_counts) + len(self.overflow) + len(self.ready)
+
+    def __len__(self) -> int:
+        return self.count
+
+
+TIMER_QUEUES: dict[str, type[TimerQueue]] = {
+    "list": ListTimerQueue,
+    "heap": HeapTimerQueue,
+    "wheel": TimingWheelTimerQueue,
+}
+
+
+def create_timer_queue(name: str) -> TimerQueue:
+    """
+    Creates a timer queue from its configured name.
+
+    :param name: One of "list", "heap" or "wheel".
+    :type name: str
+    :return: An empty timer queue.
+    :rtype: TimerQueue
+    """
+    return TIMER_QUEUES[name]()